@@ -0,0 +1,90 @@
+import os
+import re
+import time
+from collections import deque
+
+ERROR_WINDOW = int(os.getenv('ERROR_WINDOW', 3600))
+
+NUMBER_PATTERN = re.compile(r'\d+')
+HEX_PATTERN = re.compile(r'0x[0-9a-fA-F]+')
+QUOTED_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"")
+
+
+def _number(match):
+    number = match.group()
+    if len(number) == 3 and 100 <= int(number) < 600:
+        return number
+    return 'N'
+
+
+def fingerprint(error):
+    """Отпечаток ошибки: класс и сообщение без изменчивых деталей.
+
+    Адреса, числа и строки в кавычках заменяются заглушками, так что
+    «таймаут 5.01 с» и «таймаут 5.3 с» считаются одной ошибкой, а
+    статусы 500 и 401 — нет: коды ответа HTTP сохраняются.
+    """
+    message = HEX_PATTERN.sub('0x?', str(error))
+    message = QUOTED_PATTERN.sub("'?'", message)
+    message = NUMBER_PATTERN.sub(_number, message)
+    return f'{type(error).__name__}: {message}'
+
+
+class _Entry:
+    __slots__ = ('started', 'count', 'sample')
+
+    def __init__(self, started, sample):
+        self.started = started
+        self.count = 1
+        self.sample = sample
+
+
+class ErrorThrottle:
+    """Дедупликация и прореживание уведомлений об ошибках.
+
+    О первой ошибке с данным отпечатком сообщается сразу, повторы
+    в течение window секунд только подсчитываются. Когда окно
+    закрывается, уходит сводка «ошибка × N за окно», если повторы
+    были. Ошибки учитываются отдельно для каждого scope, например
+    для каждого чата.
+    """
+
+    def __init__(self, window=ERROR_WINDOW, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._entries = {}
+        self._windows = deque()
+        self._messages = []
+
+    def report(self, error, scope=None):
+        """Учитывает ошибку; возвращает True, если она новая в окне."""
+        self._close_windows()
+        key = (scope, fingerprint(error))
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.count += 1
+            return False
+        now = self.clock()
+        self._entries[key] = _Entry(now, str(error))
+        self._windows.append((now + self.window, key))
+        self._messages.append((scope, f'Хьюстон, у нас проблемы: {error}'))
+        return True
+
+    def pop_messages(self):
+        """Забирает накопленные уведомления: пары (scope, текст)."""
+        self._close_windows()
+        messages, self._messages = self._messages, []
+        return messages
+
+    def _close_windows(self):
+        now = self.clock()
+        while self._windows and self._windows[0][0] <= now:
+            _, key = self._windows.popleft()
+            entry = self._entries.pop(key)
+            if entry.count > 1:
+                self._messages.append((key[0], self._summary(entry)))
+
+    def _summary(self, entry):
+        minutes = round(self.window / 60)
+        return (f'Ошибка повторилась {entry.count} раз '
+                f'за последние {minutes} мин: {entry.sample}')
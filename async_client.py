@@ -0,0 +1,359 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import aiohttp
+
+import homework
+import json_backend
+from exceptions import APIrequestError
+from homework import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+from json_stream import AnswerParser
+from metrics import API_JOINED, observe_api_request
+from response_cache import NOT_MODIFIED, ResponseCache
+from schema import Answer
+
+logger = logging.getLogger(__name__)
+
+API_CONCURRENCY = int(os.getenv('API_CONCURRENCY', 100))
+SEND_CONCURRENCY = int(os.getenv('SEND_CONCURRENCY', 30))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 100))
+HTTP_KEEPALIVE = float(os.getenv('HTTP_KEEPALIVE', 75))
+STREAM_THRESHOLD = int(os.getenv('STREAM_THRESHOLD', 64 * 1024))
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class RequestStats:
+    """Время запросов и переиспользование соединений из пула."""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.total_time = 0.0
+        self.last_time = None
+        self.last_reused = None
+
+    @property
+    def reuse_ratio(self):
+        """Доля запросов, выполненных по уже открытому соединению."""
+        connections = self.new_connections + self.reused_connections
+        if not connections:
+            return 0.0
+        return self.reused_connections / connections
+
+    def trace_config(self):
+        """Трассировка запросов aiohttp, которая заполняет статистику."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.start = asyncio.get_event_loop().time()
+            context.reused = None
+
+        async def on_connection_create_end(session, context, params):
+            context.reused = False
+
+        async def on_connection_reuseconn(session, context, params):
+            context.reused = True
+
+        async def on_request_end(session, context, params):
+            elapsed = asyncio.get_event_loop().time() - context.start
+            self.record(elapsed, context.reused)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    def record(self, elapsed, reused):
+        """Учитывает один завершённый запрос."""
+        self.requests += 1
+        self.total_time += elapsed
+        self.last_time = elapsed
+        self.last_reused = reused
+        if reused:
+            self.reused_connections += 1
+        elif reused is not None:
+            self.new_connections += 1
+        logger.debug('Запрос к API за %.3f с, соединение %s',
+                     elapsed, 'из пула' if reused else 'новое')
+
+
+def create_session(stats=None, pool_size=HTTP_POOL_SIZE,
+                   keepalive=HTTP_KEEPALIVE,
+                   connect_timeout=HTTP_CONNECT_TIMEOUT,
+                   read_timeout=HTTP_READ_TIMEOUT):
+    """Сессия aiohttp с пулом keep-alive соединений к API.
+
+    Заголовки HEADERS выставлены по умолчанию, так что запросы
+    от имени PRACTICUM_TOKEN можно делать без явных заголовков.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=pool_size,
+        limit_per_host=pool_size,
+        keepalive_timeout=keepalive
+    )
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=connect_timeout,
+        sock_read=read_timeout
+    )
+    trace_configs = [stats.trace_config()] if stats is not None else None
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers=homework.HEADERS if homework.PRACTICUM_TOKEN else None,
+        trace_configs=trace_configs
+    )
+
+
+def cache_key(headers):
+    """Ключ кэша ответов: заголовок авторизации запроса."""
+    return (headers or {}).get('Authorization')
+
+
+def retry_after(headers):
+    """Пауза в секундах из заголовка Retry-After или None."""
+    value = headers.get('Retry-After', '')
+    return int(value) if value.isdigit() else None
+
+
+class _Flight:
+    """Выполняющийся запрос к API, которого дожидаются такие же запросы.
+
+    Работы из потокового ответа копятся в buffer, только если кто-то
+    присоединился до первой из них: без присоединившихся память не
+    растёт с размером ответа.
+    """
+
+    __slots__ = ('future', 'started', 'buffer')
+
+    def __init__(self):
+        self.future = asyncio.get_event_loop().create_future()
+        self.started = False
+        self.buffer = None
+
+    def join(self):
+        """Присоединяет ждущего; False, если работы уже пошли мимо буфера."""
+        if self.buffer is None:
+            if self.started:
+                return False
+            self.buffer = []
+        return True
+
+    def record(self, hw):
+        """Отмечает прочитанную работу потокового ответа."""
+        self.started = True
+        if self.buffer is not None:
+            self.buffer.append(hw)
+
+
+class AsyncClient:
+    """Общий для цикла asyncio HTTP-клиент с ограничением параллельности.
+
+    Все запросы к API идут через одну сессию aiohttp, одновременно
+    выполняется не больше api_concurrency запросов к Практикуму и не
+    больше send_concurrency отправок в телеграм. Если use_cache,
+    запросы к API условные, а повтор прошлого ответа возвращается
+    как NOT_MODIFIED без разбора JSON. Одновременные запросы с одним
+    токеном и from_date объединяются: к API уходит только первый,
+    остальные дожидаются его ответа.
+    """
+
+    def __init__(self, api_concurrency=API_CONCURRENCY,
+                 send_concurrency=SEND_CONCURRENCY, use_cache=True):
+        self.api_concurrency = api_concurrency
+        self.send_concurrency = send_concurrency
+        self.session = None
+        self.stats = RequestStats()
+        self.cache = ResponseCache() if use_cache else None
+        self._api_limit = None
+        self._send_limit = None
+        self._executor = None
+        self._flights = {}
+
+    async def start(self):
+        """Создаёт сессию и семафоры в текущем цикле событий."""
+        if self.session is None:
+            self.session = create_session(self.stats)
+        self._api_limit = asyncio.Semaphore(self.api_concurrency)
+        self._send_limit = asyncio.Semaphore(self.send_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.send_concurrency,
+            thread_name_prefix='telegram'
+        )
+
+    async def close(self):
+        """Закрывает сессию и пул потоков отправки."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def get_api_answer(self, timestamp, headers=None,
+                             on_homework=None, to_date=None):
+        """Асинхронный запрос к API, аналог homework.get_api_answer.
+
+        Возвращает NOT_MODIFIED, если ответ не изменился с прошлого
+        запроса с тем же токеном. Если передан on_homework, ответ
+        длиннее STREAM_THRESHOLD байт разбирается потоково: каждая
+        работа передаётся в on_homework сразу после чтения, а в
+        возвращённом ответе список homeworks пуст. С to_date
+        запрашиваются изменения до этого момента, а кэш ответов
+        не используется.
+
+        Если такой же запрос уже выполняется, новый к API не уходит:
+        вызов получает тот же ответ или ту же ошибку. Исключение —
+        потоковый ответ, работы которого уже начали поступать: тогда
+        делается отдельный запрос мимо кэша ответов.
+        """
+        flight_key = (cache_key(headers), timestamp, to_date)
+        flight = self._flights.get(flight_key)
+        if flight is not None:
+            if not flight.join():
+                return await self._request(
+                    timestamp, headers, on_homework, to_date, cached=False
+                )
+            API_JOINED.inc()
+            answer = await asyncio.shield(flight.future)
+            streamed = flight.buffer
+            if not streamed:
+                return answer
+            if on_homework is None:
+                return Answer(homeworks=list(streamed),
+                              current_date=answer.current_date,
+                              skipped=answer.skipped)
+            for hw in streamed:
+                on_homework(hw)
+            return answer
+        flight = self._flights[flight_key] = _Flight()
+
+        def record(hw):
+            flight.record(hw)
+            on_homework(hw)
+
+        try:
+            answer = await self._request(
+                timestamp, headers,
+                record if on_homework is not None else None, to_date
+            )
+        except Exception as error:
+            # exception() помечает ошибку полученной: если никто не
+            # присоединился, asyncio не будет жаловаться на неё в логе.
+            flight.future.set_exception(error)
+            flight.future.exception()
+            raise
+        except BaseException:
+            flight.future.set_exception(
+                APIrequestError('Запрос к API прерван')
+            )
+            flight.future.exception()
+            raise
+        else:
+            flight.future.set_result(answer)
+            return answer
+        finally:
+            del self._flights[flight_key]
+
+    async def _request(self, timestamp, headers, on_homework, to_date,
+                       cached=True):
+        key = cache_key(headers)
+        params = {'from_date': timestamp}
+        cache = self.cache if cached else None
+        if to_date is not None:
+            params['to_date'] = to_date
+            cache = None
+        if cache is not None:
+            headers = dict(headers or {},
+                           **cache.conditional_headers(key, timestamp))
+        async with self._api_limit:
+            started = time.perf_counter()
+            try:
+                async with self.session.get(
+                    homework.ENDPOINT,
+                    headers=headers,
+                    params=params
+                ) as response:
+                    observe_api_request(response.status, started)
+                    if (response.status == HTTPStatus.NOT_MODIFIED
+                            and cache is not None):
+                        return NOT_MODIFIED
+                    if response.status != HTTPStatus.OK:
+                        message = (f'Ошибка при запросе к API, '
+                                   f'статус ответа: {response.status}')
+                        raise APIrequestError(
+                            message, response.status,
+                            retry_after(response.headers)
+                        )
+                    if on_homework is not None and not (
+                            response.content_length is not None
+                            and response.content_length <= STREAM_THRESHOLD):
+                        if cache is not None:
+                            cache.remember(key, response.headers, timestamp)
+                        return await self._stream_answer(
+                            response, on_homework
+                        )
+                    body = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                observe_api_request('error', started)
+                raise APIrequestError('Ошибка модуля aiohttp')
+        if cache is not None and cache.is_unchanged(
+                key, response.headers, body, timestamp):
+            return NOT_MODIFIED
+        try:
+            return json_backend.loads(body)
+        except json_backend.DECODE_ERRORS:
+            self.invalidate(headers)
+            raise APIrequestError('Ответ API не в JSON формате',
+                                  HTTPStatus.OK)
+
+    @staticmethod
+    async def _stream_answer(response, on_homework):
+        """Потоковый разбор тела ответа с выдачей работ по одной."""
+        parser = AnswerParser()
+        try:
+            async for chunk in response.content.iter_chunked(
+                    STREAM_CHUNK_SIZE):
+                for hw in parser.feed(chunk):
+                    on_homework(hw)
+            return parser.close()
+        except ValueError:
+            raise APIrequestError('Ответ API не в JSON формате',
+                                  HTTPStatus.OK)
+
+    def invalidate(self, headers=None):
+        """Забывает последний ответ для токена из headers.
+
+        Нужно, когда ответ не прошёл проверку: иначе его точный
+        повтор был бы принят за «изменений нет».
+        """
+        if self.cache is not None:
+            self.cache.forget(cache_key(headers))
+
+    async def run_sync(self, func, *args):
+        """Выполняет блокирующий вызов в пуле потоков отправки.
+
+        Клиент python-telegram-bot синхронный, поэтому обращения
+        к нему не должны выполняться в цикле событий.
+        """
+        async with self._send_limit:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def send_message(self, bot, chat_id, message):
+        """Отправка сообщения в телеграм без блокировки цикла событий."""
+        return await self.run_sync(
+            homework.send_to_chat, bot, chat_id, message
+        )
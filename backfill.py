@@ -0,0 +1,146 @@
+"""Догрузка изменений за долгий перерыв окнами по времени.
+
+После запуска или простоя курсор подписчика может отставать на дни,
+и один запрос с таким from_date возвращает большой и медленный ответ.
+Backfill делит промежуток на окна по BACKFILL_WINDOW секунд и
+запрашивает их параллельно, не больше BACKFILL_CONCURRENCY
+одновременно. Результаты окон сводятся: повторы одной и той же
+смены статуса отбрасываются, а работы упорядочиваются по
+date_updated, так что уведомления уходят в хронологическом порядке.
+
+Конец окна передаётся в API параметром to_date. Работы, обновлённые
+позже конца окна, отбрасываются ещё и по date_updated: если сервер
+to_date не учитывает, результат остаётся верным, хоть и без выигрыша
+во времени.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import homework
+from response_cache import NOT_MODIFIED
+from schema import Answer
+from state import homework_key
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_AFTER = int(os.getenv('BACKFILL_AFTER', 24 * 60 * 60))
+BACKFILL_WINDOW = int(os.getenv('BACKFILL_WINDOW', 0))
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', 4))
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def parse_date(value):
+    """Момент из поля date_updated в секундах или None."""
+    try:
+        moment = datetime.strptime(value, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    return int(moment.replace(tzinfo=timezone.utc).timestamp())
+
+
+def windows(start, end, size):
+    """Окна (from_date, to_date), покрывающие промежуток от start.
+
+    Последнее окно открыто (to_date None), чтобы в него попали
+    изменения, случившиеся уже во время догрузки.
+    """
+    result = []
+    while end - start > size:
+        result.append((start, start + size))
+        start += size
+    result.append((start, None))
+    return result
+
+
+def merge(answers):
+    """Сводит ответы окон в один ответ API.
+
+    Одинаковые пары (работа, date_updated) остаются в одном экземпляре,
+    работы упорядочены по date_updated, а работы без даты идут
+    последними. current_date — наибольший из ответов, skipped —
+    пропущенные работы всех окон. Окна с ответом NOT_MODIFIED
+    пропускаются; если таковы все, возвращается NOT_MODIFIED.
+    """
+    answers = [answer for answer in answers if answer is not NOT_MODIFIED]
+    if not answers:
+        return NOT_MODIFIED
+    seen = set()
+    homeworks = []
+    for answer in answers:
+        for hw in answer.homeworks:
+            key = (homework_key(hw), hw.get('date_updated'))
+            if key not in seen:
+                seen.add(key)
+                homeworks.append(hw)
+    homeworks.sort(key=_chronological)
+    return Answer(
+        homeworks=homeworks,
+        current_date=max(answer.current_date for answer in answers),
+        skipped=[error for answer in answers for error in answer.skipped],
+    )
+
+
+def _chronological(hw):
+    updated = parse_date(hw.get('date_updated'))
+    return (updated is None, updated or 0)
+
+
+def _before(hw, end):
+    updated = parse_date(hw.get('date_updated'))
+    return updated is None or updated < end
+
+
+class Backfill:
+    """Догрузка окнами для курсоров старше after секунд.
+
+    clock — часы в секундах эпохи, как timestamp подписчика. С нулевым
+    window догрузка выключена.
+    """
+
+    def __init__(self, after=BACKFILL_AFTER, window=BACKFILL_WINDOW,
+                 concurrency=BACKFILL_CONCURRENCY, clock=time.time):
+        self.after = after
+        self.window = window
+        self.concurrency = concurrency
+        self.clock = clock
+
+    def needed(self, timestamp):
+        """Отстаёт ли курсор настолько, что нужна догрузка окнами."""
+        return bool(self.window) and self.clock() - timestamp > self.after
+
+    async def fetch(self, client, timestamp, headers=None):
+        """Изменения с timestamp, запрошенные окнами через client.
+
+        Возвращает ответ в формате API или NOT_MODIFIED, как
+        client.get_api_answer. Ошибка любого окна отменяет остальные
+        и передаётся вызывающему.
+        """
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_window(start, end):
+            async with limit:
+                answer = await client.get_api_answer(
+                    start, headers, to_date=end
+                )
+            if answer is NOT_MODIFIED:
+                return answer
+            answer = homework.check_response(answer)
+            if end is not None:
+                answer.homeworks = [hw for hw in answer.homeworks
+                                    if _before(hw, end)]
+            return answer
+
+        spans = windows(timestamp, int(self.clock()), self.window)
+        logger.debug('Догрузка с %s: окон %s', timestamp, len(spans))
+        tasks = [asyncio.ensure_future(fetch_window(start, end))
+                 for start, end in spans]
+        try:
+            answers = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return merge(answers)
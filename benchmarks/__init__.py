@@ -0,0 +1 @@
+"""Бенчмарки горячего пути бота."""
@@ -0,0 +1,131 @@
+import json
+import platform
+import time
+
+TOLERANCE = 0.25
+
+
+def percentile(ordered, fraction):
+    """Перцентиль по отсортированной выборке."""
+    if not ordered:
+        return 0.0
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples, operations=None):
+    """Сводка по длительностям отдельных повторов в секундах.
+
+    operations — сколько операций выполнено за все повторы, по
+    умолчанию по одной на повтор.
+    """
+    ordered = sorted(samples)
+    total = sum(ordered)
+    operations = operations or len(ordered)
+    return {
+        'repeats': len(ordered),
+        'throughput': operations / total if total else 0.0,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def measure(func, repeat, batch=1):
+    """Длительности repeat вызовов func.
+
+    Для очень быстрых функций каждый замер охватывает batch вызовов
+    и делится на batch, чтобы не мерить накладные расходы таймера.
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(batch):
+            func()
+        samples.append((time.perf_counter() - started) / batch)
+    return samples
+
+
+class Results:
+    """Результаты прогона: имя замера → сводка."""
+
+    def __init__(self):
+        self.benchmarks = {}
+
+    def add(self, name, summary):
+        """Добавляет замер и печатает его."""
+        self.benchmarks[name] = summary
+        print(f'{name:<45} {summary["throughput"]:>12.1f} оп/с '
+              f'p50 {summary["p50_ms"]:8.3f} мс '
+              f'p99 {summary["p99_ms"]:8.3f} мс')
+
+    def as_dict(self):
+        """Результаты в виде словаря для JSON."""
+        return {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'benchmarks': self.benchmarks,
+        }
+
+    def save(self, path):
+        """Сохраняет результаты в JSON."""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.as_dict(), file, ensure_ascii=False, indent=2)
+
+    def compare(self, path, tolerance=TOLERANCE):
+        """Регрессии относительно сохранённого базового прогона.
+
+        Замер считается регрессией, если пропускная способность упала
+        или p99 вырос больше чем на tolerance.
+        """
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['benchmarks']
+        regressions = []
+        for name, summary in self.benchmarks.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if summary['throughput'] < base['throughput'] * (1 - tolerance):
+                regressions.append(
+                    f'{name}: {summary["throughput"]:.1f} оп/с '
+                    f'против {base["throughput"]:.1f}'
+                )
+            if summary['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p99 {summary["p99_ms"]:.3f} мс '
+                    f'против {base["p99_ms"]:.3f}'
+                )
+        return regressions
+
+
+def add_arguments(parser, baseline):
+    """Общие параметры командной строки для бенчмарков."""
+    parser.add_argument('--quick', action='store_true',
+                        help='меньше повторов и размеров')
+    parser.add_argument('--output', help='куда сохранить результаты JSON')
+    parser.add_argument('--baseline', default=baseline,
+                        help='файл базового прогона для сравнения')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='записать результаты как базовый прогон')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+
+
+def finish(results, args):
+    """Сохраняет результаты и сравнивает их с базовыми.
+
+    Возвращает код выхода: 1, если найдены регрессии.
+    """
+    if args.output:
+        results.save(args.output)
+    if args.save_baseline:
+        results.save(args.baseline)
+        return 0
+    try:
+        regressions = results.compare(args.baseline, args.tolerance)
+    except FileNotFoundError:
+        print(f'Базовый прогон {args.baseline} не найден')
+        return 0
+    for regression in regressions:
+        print(f'РЕГРЕССИЯ {regression}')
+    return 1 if regressions else 0
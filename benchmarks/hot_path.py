@@ -0,0 +1,148 @@
+"""Бенчмарк цепочки опрос → разбор → уведомление.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.hot_path --quick
+
+Результаты сравниваются с benchmarks/baseline.json; при регрессии
+больше чем на --tolerance команда завершается с кодом 1.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import telegram
+from telegram.utils.request import Request
+
+import engine
+import homework
+from async_client import AsyncClient
+from benchmarks.common import (
+    Results, add_arguments, finish, measure, summarize
+)
+from fake_practicum import FakeConfig, FakePracticum
+from fake_telegram import FakeTelegram
+from send_queue import SendQueue
+from subscribers import SubscriberRegistry
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+RESPONSE_SIZES = (0, 10, 100, 1000)
+SUBSCRIBER_COUNTS = (1, 100, 1000)
+QUICK_RESPONSE_SIZES = (0, 100)
+QUICK_SUBSCRIBER_COUNTS = (1, 100)
+
+
+def practicum(size):
+    """Фейковый API, у каждого токена которого size готовых работ."""
+    config = FakeConfig(homeworks=size, review_delay=0.001,
+                        verdict_delay=0.001, seed=1)
+    return FakePracticum(config)
+
+
+def ready_answer(server, token='token'):
+    """Ответ API, в котором все работы токена уже получили вердикт."""
+    server.timeline(token)
+    return {
+        'homeworks': server.homeworks(token, 0, time.time() + 3600),
+        'current_date': int(time.time()),
+    }
+
+
+def bench_get_api_answer(results, size, repeat):
+    """Синхронный запрос к API через requests."""
+    server = practicum(size)
+    with server.in_thread():
+        endpoint, homework.ENDPOINT = homework.ENDPOINT, server.url
+        try:
+            homework.get_api_answer(0)
+            time.sleep(0.1)
+            samples = measure(lambda: homework.get_api_answer(0), repeat)
+        finally:
+            homework.ENDPOINT = endpoint
+    results.add(f'get_api_answer[size={size}]', summarize(samples))
+
+
+def bench_check_response(results, size, repeat):
+    """Проверка структуры ответа."""
+    answer = ready_answer(practicum(size))
+    samples = measure(
+        lambda: homework.check_response(answer), repeat, batch=100
+    )
+    results.add(f'check_response[size={size}]', summarize(samples))
+
+
+def bench_parse_status(results, size, repeat):
+    """Формирование сообщений для всех работ ответа."""
+    homeworks = ready_answer(practicum(max(size, 1)))['homeworks']
+
+    def parse_all():
+        for hw in homeworks:
+            homework.parse_status(hw)
+
+    samples = measure(parse_all, repeat)
+    results.add(f'parse_status[size={len(homeworks)}]',
+                summarize(samples, operations=repeat * len(homeworks)))
+
+
+async def loop_iteration(subscribers, api_url, bot):
+    """Один проход движка по всем лентам с отправкой сообщений."""
+    registry = SubscriberRegistry()
+    for number in range(subscribers):
+        registry.add(f'token{number}', number, timestamp=0)
+    client = AsyncClient()
+    poller = engine.PollingEngine(registry, bot, client=client)
+    poller.sender = SendQueue(bot, client, global_rate=0, chat_rate=0)
+    endpoint, homework.ENDPOINT = homework.ENDPOINT, api_url
+    try:
+        async with client, poller.sender:
+            started = time.perf_counter()
+            await asyncio.gather(*(poller.poll(feed)
+                                   for feed in registry.feeds()))
+            await poller.sender.join()
+            return time.perf_counter() - started
+    finally:
+        homework.ENDPOINT = endpoint
+
+
+def bench_loop_iteration(results, subscribers, repeat):
+    """Полный проход: запросы к API, разбор и отправка в телеграм."""
+    api = practicum(3)
+    tg = FakeTelegram()
+    with api.in_thread(), tg.in_thread():
+        bot = telegram.Bot(
+            token='1234:abcdefg', base_url=tg.base_url,
+            request=Request(con_pool_size=engine.SEND_CONCURRENCY)
+        )
+        for number in range(subscribers):
+            api.timeline(f'token{number}')
+        time.sleep(0.1)
+        samples = [
+            asyncio.run(loop_iteration(subscribers, api.url, bot))
+            for _ in range(repeat)
+        ]
+    results.add(f'loop_iteration[subscribers={subscribers}]',
+                summarize(samples, operations=repeat * subscribers))
+
+
+def main():
+    """Запуск бенчмарков из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser, BASELINE)
+    args = parser.parse_args()
+    sizes = QUICK_RESPONSE_SIZES if args.quick else RESPONSE_SIZES
+    counts = QUICK_SUBSCRIBER_COUNTS if args.quick else SUBSCRIBER_COUNTS
+    repeat = 50 if args.quick else 300
+    results = Results()
+    for size in sizes:
+        bench_get_api_answer(results, size, repeat)
+        bench_check_response(results, size, repeat)
+        bench_parse_status(results, size, repeat)
+    for count in counts:
+        bench_loop_iteration(results, count, 3 if args.quick else 10)
+    return finish(results, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Бенчмарк разбора ответа API разными библиотеками JSON.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.json_decode --quick
+
+Сравниваются все установленные библиотеки из json_backend на
+ответах фейкового API разного размера.
+"""
+import argparse
+import json
+import os
+import sys
+
+import json_backend
+from benchmarks.common import (
+    Results, add_arguments, finish, measure, summarize
+)
+from benchmarks.hot_path import practicum, ready_answer
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'json_baseline.json')
+RESPONSE_SIZES = (0, 10, 100, 1000)
+QUICK_RESPONSE_SIZES = (10, 1000)
+REVIEWER_COMMENT = 'Отличная работа! Поправь, пожалуйста, docstring ' * 3
+
+
+def payload(size):
+    """Тело ответа API с size работами и комментариями ревьюера."""
+    answer = ready_answer(practicum(size))
+    for hw in answer['homeworks']:
+        hw['reviewer_comment'] = REVIEWER_COMMENT
+    return json.dumps(answer, ensure_ascii=False).encode('utf-8')
+
+
+def bench_decode(results, name, body, size, repeat):
+    """Разбор одного тела ответа библиотекой name."""
+    _, loads, _ = json_backend.load_backend(name)
+    assert loads(body) == json.loads(body)
+    batch = 100 if size <= 10 else 1
+    samples = measure(lambda: loads(body), repeat, batch=batch)
+    results.add(f'decode[{name},size={size}]', summarize(samples))
+
+
+def main():
+    """Запуск бенчмарков из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser, BASELINE)
+    args = parser.parse_args()
+    sizes = QUICK_RESPONSE_SIZES if args.quick else RESPONSE_SIZES
+    repeat = 50 if args.quick else 300
+    results = Results()
+    for size in sizes:
+        body = payload(size)
+        for name in json_backend.available():
+            bench_decode(results, name, body, size, repeat)
+    return finish(results, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Автоматический выключатель для запросов к API Практикума.
+
+Пока API отвечает ошибками 5xx, 429 или не отвечает вовсе, опрашивать
+его всеми подписчиками бессмысленно. После threshold таких ошибок
+подряд выключатель размыкается: опросы откладываются, и лишь по
+истечении паузы один пробный запрос проверяет, ожил ли API. Паузы
+растут экспоненциально и выбираются случайно от нуля до предела
+(full jitter), чтобы подписчики не возвращались к API одновременно.
+"""
+import os
+import random
+from http import HTTPStatus
+
+from exceptions import APIrequestError
+from metrics import BREAKER_STATE, BREAKER_TRANSITIONS
+from scheduler import Clock
+
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', 5))
+BREAKER_BASE_DELAY = float(os.getenv('BREAKER_BASE_DELAY', 30))
+BREAKER_MAX_DELAY = float(os.getenv('BREAKER_MAX_DELAY', 1800))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+# Что делать после ошибки запроса к API.
+STOP = 'stop'  # токен отклонён: опрос подписчика прекращается
+BACKOFF = 'backoff'  # сбой на стороне API: учитывается выключателем
+FAIL = 'fail'  # ошибка этого запроса: опрос продолжается как обычно
+
+
+def full_jitter(attempt, base=BREAKER_BASE_DELAY, cap=BREAKER_MAX_DELAY,
+                random=random.random):
+    """Случайная пауза от 0 до min(cap, base * 2 ** attempt)."""
+    return random() * min(cap, base * 2 ** attempt)
+
+
+def policy(error):
+    """Реакция на ошибку запроса к API по статусу ответа.
+
+    401 и 403 — токен недействителен, 429 и 5xx — API перегружен
+    или неисправен, как и отсутствие ответа (status None).
+    """
+    if not isinstance(error, APIrequestError):
+        return FAIL
+    status = error.status
+    if status in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
+        return STOP
+    if (status is None or status == HTTPStatus.TOO_MANY_REQUESTS
+            or status >= HTTPStatus.INTERNAL_SERVER_ERROR):
+        return BACKOFF
+    return FAIL
+
+
+class CircuitBreaker:
+    """Выключатель с состояниями closed, open и half_open.
+
+    В состоянии closed запросы идут свободно. В open они запрещены
+    до истечения паузы, после чего выключатель переходит в half_open
+    и пропускает один пробный запрос: успех замыкает выключатель,
+    ошибка снова размыкает его с удвоенным пределом паузы.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, base=BREAKER_BASE_DELAY,
+                 cap=BREAKER_MAX_DELAY, clock=None, random=random.random):
+        self.threshold = threshold
+        self.base = base
+        self.cap = cap
+        self.clock = clock or Clock()
+        self.random = random
+        self.state = CLOSED
+        self.failures = 0
+        self.attempt = 0
+        self.opened_until = 0.0
+        self._probing = False
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            BREAKER_TRANSITIONS.labels(state).inc()
+
+    def _backoff(self, attempt):
+        return full_jitter(attempt, self.base, self.cap, self.random)
+
+    def allow(self):
+        """Можно ли сейчас отправить запрос к API."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.clock.now() >= self.opened_until:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def delay(self):
+        """Через сколько секунд повторить запрос, которому отказано.
+
+        Кроме оставшейся паузы добавляется случайная задержка, чтобы
+        отложенные опросы не вернулись к API в один момент. Пока идёт
+        пробный запрос, откладывается хотя бы на секунду.
+        """
+        remaining = max(self.opened_until - self.clock.now(), 1)
+        return remaining + self._backoff(self.attempt)
+
+    def record_success(self):
+        """Учитывает успешный ответ API."""
+        self.failures = 0
+        self.attempt = 0
+        self._probing = False
+        self._set_state(CLOSED)
+
+    def record_failure(self, retry_after=None):
+        """Учитывает сбой API; retry_after — пауза, которую просит API."""
+        self.failures += 1
+        if self.state == CLOSED and self.failures < self.threshold:
+            return
+        if self.state == HALF_OPEN:
+            self.attempt += 1
+        self._probing = False
+        pause = max(self._backoff(self.attempt), retry_after or 0)
+        self.opened_until = self.clock.now() + pause
+        self._set_state(OPEN)
+
+    def export_metrics(self):
+        """Привязывает датчик состояния к этому выключателю."""
+        BREAKER_STATE.set_function(lambda: STATES.index(self.state))
@@ -0,0 +1,515 @@
+import asyncio
+import logging
+import os
+import time
+from functools import partial
+
+from dotenv import load_dotenv
+import telegram
+from telegram.utils.request import Request
+
+import homework
+from alerts import ErrorThrottle
+from async_client import AsyncClient, SEND_CONCURRENCY
+from backfill import BACKFILL_WINDOW, Backfill
+from breaker import BACKOFF, STOP, CircuitBreaker, policy
+from exceptions import ParseStatusError, TokenMissingError
+from logs import setup_logging
+from response_cache import NOT_MODIFIED
+import metrics
+from scheduler import AdaptiveInterval, Clock, TimingWheel, request_budget
+from send_queue import SendQueue
+from shutdown import SHUTDOWN_TIMEOUT, SIGNALS
+from state import STATE_FILE, StateStore, homework_key
+from status_index import StatusIndex
+from subscribers import SubscriberRegistry
+from templates import escape
+from webhook import WEBHOOK_PORT, WebhookReceiver
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+SUBSCRIBERS_FILE = os.getenv('SUBSCRIBERS_FILE', 'subscribers.json')
+WEBHOOK_QUIET = int(os.getenv('WEBHOOK_QUIET', 900))
+WEBHOOK_POLL_INTERVAL = int(os.getenv('WEBHOOK_POLL_INTERVAL', 3600))
+OUTBOX_RETRY_INTERVAL = int(os.getenv('OUTBOX_RETRY_INTERVAL', 300))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+
+
+class PollingEngine:
+    """Опрос API для всех подписчиков в одном процессе.
+
+    API опрашивается один раз на токен: ответ рассылается во все
+    чаты ленты Feed, подписанные на этот токен, так что число
+    запросов зависит от числа токенов, а не чатов. Опросы запускаются
+    задачами asyncio в свой срок и выполняются параллельно в пределах
+    лимитов AsyncClient. Следующий опрос ленты назначается после
+    завершения текущего, с интервалом от AdaptiveInterval, а общий
+    темп запросов ограничен budget.
+    Сообщения уходят через очередь SendQueue. Если передано
+    хранилище store, курсоры, доставленные статусы и ещё не
+    отправленные сообщения из outbox переживают перезапуск процесса.
+    Сообщения, которые телеграм отклонил, повторяются из outbox раз
+    в OUTBOX_RETRY_INTERVAL секунд, но не больше OUTBOX_MAX_ATTEMPTS
+    раз.
+
+    С приёмником webhook изменения приходят от источника сами,
+    и опрос подписчика, для которого недавно были вебхуки, идёт
+    редко — раз в WEBHOOK_POLL_INTERVAL. Если вебхуков нет дольше
+    WEBHOOK_QUIET, подписчик снова опрашивается в обычном темпе.
+
+    После stop() новые опросы не начинаются, а начатые опросы
+    и очередь отправки дорабатываются в пределах SHUTDOWN_TIMEOUT.
+
+    Сбои API учитывает общий для всех подписчиков breaker: пока он
+    разомкнут, созревшие опросы откладываются на случайный срок.
+    Подписчик, чей токен API отклонил, больше не опрашивается.
+
+    С backfill изменения для курсора, отставшего после запуска или
+    простоя, запрашиваются параллельно окнами по времени, а не
+    одним большим запросом.
+    """
+
+    def __init__(self, registry, bot, client=None, scheduler=None,
+                 store=None, intervals=None, budget=None, clock=None,
+                 webhook=None, breaker=None, backfill=None):
+        self.registry = registry
+        self.bot = bot
+        self.client = client or AsyncClient()
+        self.clock = clock or Clock()
+        self.scheduler = scheduler or TimingWheel(clock=self.clock)
+        self.store = store
+        self.statuses = StatusIndex()
+        self.intervals = intervals or AdaptiveInterval()
+        self.budget = budget or request_budget(self.clock)
+        self.sender = SendQueue(bot, self.client, clock=self.clock)
+        self.alerts = ErrorThrottle(clock=self.clock.now)
+        self.breaker = breaker or CircuitBreaker(clock=self.clock)
+        self.suspended = set()
+        self.webhook = webhook
+        self.pushes = {}
+        self.backfill = backfill
+        self._tasks = set()
+        self._wakeup = None
+        self._stopping = False
+        self._resent_at = None
+        self._dead_letters = 0
+
+    def export_metrics(self):
+        """Привязывает датчики метрик к очередям этого движка."""
+        metrics.SEND_QUEUE_DEPTH.set_function(lambda: len(self.sender))
+        metrics.SCHEDULED_POLLS.set_function(lambda: len(self.scheduler))
+        metrics.POLLS_IN_FLIGHT.set_function(lambda: len(self._tasks))
+        metrics.SUSPENDED_SUBSCRIBERS.set_function(
+            lambda: len(self.suspended)
+        )
+        self.breaker.export_metrics()
+
+    def restore(self):
+        """Восстанавливает курсоры подписчиков из хранилища."""
+        if self.store is None:
+            return
+        for subscriber in self.registry:
+            self._restore_cursor(subscriber)
+
+    def _restore_cursor(self, subscriber):
+        timestamp = self.store.load_cursor(subscriber.key)
+        if timestamp is not None:
+            subscriber.timestamp = timestamp
+
+    def add(self, token, chat_id, locale=None):
+        """Добавляет подписчика на ходу.
+
+        Новому токену сразу назначается опрос, а чат уже опрашиваемого
+        токена получит изменения с ближайшим опросом его ленты.
+        """
+        subscriber = self.registry.get(token, chat_id)
+        if subscriber is not None:
+            return subscriber
+        subscriber = self.registry.add(token, chat_id, locale=locale)
+        if self.store is not None:
+            self._restore_cursor(subscriber)
+        feed = self.registry.feed(token)
+        if len(feed) == 1:
+            self.scheduler.push(feed, self.clock.now())
+            if self._wakeup is not None:
+                self._wakeup.set()
+        return subscriber
+
+    def remove(self, token, chat_id):
+        """Убирает подписчика; опрос опустевшей ленты отменяется."""
+        feed = self.registry.feed(token)
+        subscriber = self.registry.remove(token, chat_id)
+        if subscriber is not None and self.registry.feed(token) is None:
+            self.scheduler.cancel(feed)
+            self.intervals.forget(feed.key)
+        return subscriber
+
+    def is_active(self, feed):
+        """Опрашивается ли ещё лента этим движком."""
+        return self.registry.feed(feed.token) is feed and any(
+            subscriber.key not in self.suspended for subscriber in feed
+        )
+
+    def notify(self, subscriber, hw):
+        """Ставит в очередь отправки новый статус работы."""
+        hw_id, status = homework_key(hw), hw.get('status')
+        index_key = (subscriber.chat_id, hw_id)
+        if self.statuses.is_unchanged(index_key, status):
+            return
+        info = homework.format_status(hw, subscriber.locale,
+                                      self.sender.parse_mode)
+        self.statuses.set(index_key, status)
+        logger.debug('Новый статус работы: %s', status, extra={
+            'chat_id': subscriber.chat_id, 'homework_id': hw_id
+        })
+        on_sent = None
+        if self.store:
+            if not self.store.enqueue(subscriber.key, hw_id, status, info):
+                return
+            on_sent = partial(
+                self.store.mark_delivered, subscriber.key, hw_id, status
+            )
+        self.sender.put(subscriber.chat_id, info, on_sent)
+
+    def resend(self):
+        """Ставит в очередь сообщения, оставшиеся в outbox хранилища.
+
+        Это уведомления, не отправленные до прошлой остановки или
+        отклонённые телеграмом; их статусы уже не придут в ответах
+        API, потому что курсор сохранён после записи в outbox.
+        Берутся только подписчики этого движка: процессы супервизора
+        делят одно хранилище. Чаты, сообщения которым ещё в очереди
+        отправки, пропускаются, чтобы не отправить их дважды. Каждая
+        повторная отправка учитывается; исчерпавшие OUTBOX_MAX_ATTEMPTS
+        попыток сообщения больше не повторяются.
+        """
+        if self.store is None:
+            return
+        self._resent_at = self.clock.now()
+        busy = self.sender.chats()
+        pending = [
+            message
+            for message in self.store.outbox(max_attempts=OUTBOX_MAX_ATTEMPTS)
+            if message[0][1] not in busy
+            and self.registry.get(*message[0]) is not None
+        ]
+        self.store.record_attempts(pending)
+        for key, hw_id, status, text in pending:
+            self.sender.put(key[1], text, partial(
+                self.store.mark_delivered, key, hw_id, status
+            ))
+        if pending:
+            logger.info(f'Из outbox в очередь отправки: {len(pending)}')
+        dead = self.store.dead_letters(OUTBOX_MAX_ATTEMPTS)
+        if dead > self._dead_letters:
+            logger.error(f'Сообщений в outbox, не доставленных за '
+                         f'{OUTBOX_MAX_ATTEMPTS} попыток: {dead}')
+        self._dead_letters = dead
+
+    def maybe_resend(self):
+        """Повторяет outbox, если с прошлого раза прошло достаточно времени."""
+        if (self._resent_at is None or self.clock.now() - self._resent_at
+                >= OUTBOX_RETRY_INTERVAL):
+            self.resend()
+
+    def advance(self, subscribers, timestamp):
+        """Сдвигает курсоры подписчиков вперёд до timestamp."""
+        for subscriber in subscribers:
+            if timestamp <= subscriber.timestamp:
+                continue
+            subscriber.timestamp = timestamp
+            if self.store:
+                self.store.save_cursor(subscriber.key, timestamp)
+
+    async def poll(self, feed):
+        """Один запрос к API для токена и уведомления всем его чатам.
+
+        Большие ответы клиент разбирает потоково, и уведомления
+        ставятся в очередь по мере чтения работ. Работа с неизвестным
+        статусом или не прошедшая проверку схемой пропускается
+        с уведомлением об ошибке, а курсор сдвигается: иначе она
+        останавливала бы опрос ленты навсегда.
+        Если ответ не изменился, курсор сдвигается на момент запроса,
+        чтобы у тихой ленты он не устаревал до догрузки окнами.
+        Возвращает статусы работ из ответа или None при сбое.
+        """
+        started = int(time.time())
+        statuses = []
+        failures = []
+        subscribers = list(feed)
+        chats = ','.join(subscriber.chat_id for subscriber in subscribers)
+
+        def on_homework(hw):
+            try:
+                for subscriber in subscribers:
+                    self.notify(subscriber, hw)
+            except ParseStatusError as error:
+                failures.append(error)
+                return
+            statuses.append(hw.get('status'))
+
+        try:
+            if self.backfill is not None and self.backfill.needed(
+                    feed.timestamp):
+                answer = await self.backfill.fetch(
+                    self.client, feed.timestamp, feed.headers
+                )
+            else:
+                answer = await self.client.get_api_answer(
+                    feed.timestamp, feed.headers, on_homework
+                )
+            self.breaker.record_success()
+            if answer is NOT_MODIFIED:
+                logger.debug('Ответ API не изменился.',
+                             extra={'chat_id': chats})
+                self.advance(subscribers, started)
+                return []
+            answer = homework.check_response(answer)
+            failures.extend(answer.skipped)
+            for hw in answer.homeworks:
+                on_homework(hw)
+            if not statuses:
+                logger.debug('Список домашек пуст, изменений нет.',
+                             extra={'chat_id': chats})
+            self.advance(subscribers, answer.current_date)
+            for error in failures:
+                for subscriber in subscribers:
+                    self.alerts.report(error, subscriber.chat_id)
+                logger.error(f'Пропущена работа для чатов {chats}: {error}',
+                             extra={'chat_id': chats})
+            return statuses
+        except Exception as error:
+            self.client.invalidate(feed.headers)
+            action = policy(error)
+            if action == BACKOFF:
+                self.breaker.record_failure(error.retry_after)
+            else:
+                self.breaker.record_success()
+            if action == STOP:
+                self.suspend(feed, error)
+                return None
+            new = [self.alerts.report(error, subscriber.chat_id)
+                   for subscriber in subscribers]
+            logger.error(
+                f'Сбой при опросе для чатов {chats}: {error}',
+                exc_info=any(new), extra={'chat_id': chats}
+            )
+        finally:
+            self.flush_alerts()
+
+    def push(self, feed_id, answer):
+        """Обрабатывает изменения, присланные вебхуком для ленты.
+
+        Тело проверяется так же, как ответ API, но битая работа
+        отклоняет его целиком, статусы работ проверяются по шаблонам
+        до первого уведомления, и новые статусы уходят во все чаты
+        ленты. Курсор опроса не сдвигается: пропущенное вебхуком
+        найдёт следующий опрос. Возвращает False, если ленты нет
+        в реестре.
+        """
+        feed = self.registry.find_feed(feed_id)
+        if feed is None:
+            return False
+        answer = homework.check_response(answer)
+        if answer.skipped:
+            raise answer.skipped[0]
+        for hw in answer.homeworks:
+            if hw.status not in homework.TEMPLATES:
+                raise ParseStatusError(
+                    f'неожиданный статус домашней работы: {hw.status}'
+                )
+        for hw in answer.homeworks:
+            for member in feed:
+                self.notify(member, hw)
+        self.pushes[feed.key] = self.clock.now()
+        return True
+
+    def relaxed(self, feed):
+        """Приходили ли вебхуки для ленты в последние WEBHOOK_QUIET."""
+        pushed = self.pushes.get(feed.key)
+        return (pushed is not None
+                and self.clock.now() - pushed < WEBHOOK_QUIET)
+
+    def suspend(self, feed, error):
+        """Прекращает опрос ленты, чей токен отклонил API."""
+        for subscriber in feed:
+            if subscriber.key in self.suspended:
+                continue
+            self.suspended.add(subscriber.key)
+            logger.critical(
+                f'API отклонил токен чата {subscriber.chat_id}, '
+                f'опрос остановлен: {error}',
+                extra={'chat_id': subscriber.chat_id}
+            )
+            self.sender.put(subscriber.chat_id, escape(
+                'Токен Практикума отклонён API, проверка статусов '
+                'остановлена. Обновите токен.', self.sender.parse_mode
+            ))
+
+    def flush_alerts(self):
+        """Ставит в очередь уведомления и сводки об ошибках."""
+        for chat_id, text in self.alerts.pop_messages():
+            self.sender.put(chat_id, escape(text, self.sender.parse_mode))
+
+    async def cycle(self, feed, due):
+        """Опрос ленты и назначение следующего опроса."""
+        statuses = await self.poll(feed)
+        if self.is_active(feed):
+            interval = self.intervals.update(feed.key, statuses)
+            if self.webhook is not None and self.relaxed(feed):
+                interval = max(interval, WEBHOOK_POLL_INTERVAL)
+            self.scheduler.reschedule(feed, due, interval)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def spawn(self, coro):
+        """Запускает задачу и держит ссылку на неё до завершения."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def tick(self):
+        """Запускает созревший опрос либо ждёт ближайшего срока."""
+        self._wakeup.clear()
+        delay = self.scheduler.delay() if len(self.scheduler) else None
+        if delay is None or delay > 0:
+            await self.clock.wait(self._wakeup, delay)
+            return
+        feed, due = self.scheduler.pop()
+        if not self.is_active(feed):
+            return
+        if not self.breaker.allow():
+            self.scheduler.push(feed, self.clock.now()
+                                + self.breaker.delay())
+            return
+        await self.budget.acquire()
+        metrics.POLL_LAG.observe(max(self.clock.now() - due, 0))
+        self.spawn(self.cycle(feed, due))
+
+    def stop(self):
+        """Прекращает запуск новых опросов; run() перейдёт к завершению."""
+        if not self._stopping:
+            logger.info('Остановка: дорабатываем начатые опросы.')
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def drain(self, timeout=SHUTDOWN_TIMEOUT):
+        """Дорабатывает начатые опросы и отправляет очередь сообщений.
+
+        Если за timeout секунд это не удалось, неотправленные
+        сообщения остаются в outbox хранилища и уйдут после
+        перезапуска.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f'Прервано опросов: {len(pending)}')
+                await asyncio.gather(*pending, return_exceptions=True)
+        await self.sender.close(max(deadline - loop.time(), 0))
+
+    async def run(self, until=None, signals=(), wait_idle=False):
+        """Цикл опроса по расписанию.
+
+        Работает до stop() либо, если задано until, до этого момента
+        по часам движка. На сигналы из signals вызывается stop().
+        Без wait_idle цикл завершается, когда опрашивать некого;
+        с ним ждёт подписчиков, добавленных через add().
+        """
+        self.restore()
+        self.scheduler.spread(self.registry.feeds())
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in signals:
+            loop.add_signal_handler(signum, self.stop)
+        try:
+            async with self.client, self.sender:
+                self.resend()
+                if self.webhook is not None:
+                    await self.webhook.start(self.push)
+                try:
+                    while not self._stopping and (
+                            wait_idle or len(self.scheduler) or self._tasks):
+                        if until is not None and self.clock.now() >= until:
+                            break
+                        self.maybe_resend()
+                        await self.tick()
+                finally:
+                    if self.webhook is not None:
+                        await self.webhook.stop()
+                await self.drain()
+        finally:
+            for signum in signals:
+                loop.remove_signal_handler(signum)
+            if self.store:
+                self.store.close()
+
+
+def load_registry():
+    """Реестр из SUBSCRIBERS_FILE либо из переменных окружения."""
+    if os.path.exists(SUBSCRIBERS_FILE):
+        return SubscriberRegistry.from_file(SUBSCRIBERS_FILE)
+    registry = SubscriberRegistry()
+    if homework.PRACTICUM_TOKEN and homework.TELEGRAM_CHAT_ID:
+        registry.add(homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID)
+    return registry
+
+
+def check_token():
+    """Проверяет, что задан токен бота."""
+    if not TELEGRAM_TOKEN:
+        message = ('отсутствует обязательная переменная окружения: '
+                   'TELEGRAM_TOKEN')
+        logger.critical(message)
+        raise TokenMissingError(message)
+
+
+def build_poller(registry, webhook=None):
+    """Движок с ботом телеграма и хранилищем из STATE_FILE."""
+    bot = telegram.Bot(
+        token=TELEGRAM_TOKEN,
+        request=Request(con_pool_size=SEND_CONCURRENCY)
+    )
+    store = StateStore(STATE_FILE) if STATE_FILE else None
+    backfill = Backfill() if BACKFILL_WINDOW else None
+    return PollingEngine(registry, bot, store=store, webhook=webhook,
+                         backfill=backfill)
+
+
+def main():
+    """Запуск бота для всех подписчиков из реестра."""
+    setup_logging()
+    check_token()
+    registry = load_registry()
+    logger.info(f'Подписчиков в реестре: {len(registry)}')
+    webhook = None
+    if WEBHOOK_PORT:
+        try:
+            webhook = WebhookReceiver()
+        except ValueError as error:
+            logger.critical(error)
+            raise TokenMissingError(str(error))
+    poller = build_poller(registry, webhook=webhook)
+    if metrics.METRICS_PORT:
+        poller.export_metrics()
+        metrics.start_http_server()
+        logger.info(f'Метрики доступны на порту {metrics.METRICS_PORT}')
+    asyncio.run(poller.run(signals=SIGNALS))
+    logger.info('Бот остановлен.')
+
+
+if __name__ == '__main__':
+    main()
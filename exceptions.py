@@ -1,7 +1,14 @@
 class APIrequestError(Exception):
-    """Ошибка при запросе к API."""
+    """Ошибка при запросе к API.
 
-    pass
+    status — код ответа или None, если ответа не было; retry_after —
+    пауза в секундах из заголовка Retry-After, если API её прислал.
+    """
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
 
 
 class TokenMissingError(Exception):
@@ -14,3 +21,25 @@ class ParseStatusError(Exception):
     """Ошибка при получении статуса домашней работы."""
 
     pass
+
+
+class SchemaError(TypeError):
+    """Ответ API не соответствует схеме.
+
+    path — путь к полю с ошибкой, например homeworks[3].status.
+    """
+
+    def __init__(self, reason, path=''):
+        self.reason = reason
+        self.path = path
+        super().__init__(
+            'ответ API не соответствует документации: '
+            f'{path or "ответ"}: {reason}'
+        )
+
+    def within(self, prefix):
+        """Та же ошибка с путём, вложенным в поле prefix."""
+        if not self.path:
+            return SchemaError(self.reason, prefix)
+        separator = '' if self.path.startswith('[') else '.'
+        return SchemaError(self.reason, f'{prefix}{separator}{self.path}')
@@ -0,0 +1,291 @@
+"""Локальная замена API Практикума для нагрузочных тестов.
+
+Запуск из консоли:
+
+    python fake_practicum.py --port 8080 --homeworks 20 --error-rate 0.01
+
+После этого бота можно направить на сервер переменной окружения
+PRACTICUM_ENDPOINT=http://127.0.0.1:8080/api/user_api/homework_statuses/
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+PATH = '/api/user_api/homework_statuses/'
+VERDICTS = ('approved', 'rejected')
+
+
+@contextmanager
+def serve_in_thread(server):
+    """Держит сервер с методами start/stop в отдельном потоке."""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+        loop.run_until_complete(server.stop())
+        loop.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait()
+    try:
+        yield server
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+class FakeConfig:
+    """Параметры поведения сервера.
+
+    homeworks — число работ у каждого токена; review_delay и
+    verdict_delay — среднее время (в секундах) до взятия работы на
+    ревью и до вердикта; latency — распределение задержки ответа:
+    'fixed', 'uniform' или 'lognormal' со средним latency_mean;
+    error_rate, unauthorized_rate и malformed_rate — доли ответов
+    с кодом 500, 401 и с битым JSON. Токены из bad_tokens всегда
+    получают 401. Если etag, ответы несут ETag, а запрос
+    с совпавшим If-None-Match получает 304.
+    """
+
+    def __init__(self, homeworks=5, review_delay=60, verdict_delay=300,
+                 latency='fixed', latency_mean=0.0, error_rate=0.0,
+                 unauthorized_rate=0.0, malformed_rate=0.0,
+                 bad_tokens=(), etag=False, seed=None):
+        self.homeworks = homeworks
+        self.review_delay = review_delay
+        self.verdict_delay = verdict_delay
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.error_rate = error_rate
+        self.unauthorized_rate = unauthorized_rate
+        self.malformed_rate = malformed_rate
+        self.bad_tokens = set(bad_tokens)
+        self.etag = etag
+        self.seed = seed
+
+
+def isoformat(timestamp):
+    """Время в формате поля date_updated."""
+    moment = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FakePracticum:
+    """HTTP-сервер, отвечающий как homework_statuses/.
+
+    Для каждого нового токена сервер создаёт config.homeworks работ,
+    которые со временем переходят в статус reviewing, а затем
+    получают вердикт. В ответ попадают работы, статус которых
+    менялся после from_date, а если задан to_date — только до него,
+    и статус работы берётся на этот момент.
+    """
+
+    def __init__(self, config=None, host='127.0.0.1', port=0,
+                 clock=time.time):
+        self.config = config or FakeConfig()
+        self.host = host
+        self.port = port
+        self.clock = clock
+        self.random = random.Random(self.config.seed)
+        self.requests = 0
+        self._timelines = {}
+        self._next_id = 1
+        self._runner = None
+
+    @property
+    def url(self):
+        """Полный адрес эндпоинта."""
+        return f'http://{self.host}:{self.port}{PATH}'
+
+    def timeline(self, token):
+        """История статусов работ токена: список (работа, переходы)."""
+        timeline = self._timelines.get(token)
+        if timeline is None:
+            timeline = []
+            started = self.clock()
+            for _ in range(self.config.homeworks):
+                reviewing = started + self.random.expovariate(
+                    1 / self.config.review_delay
+                )
+                verdict = reviewing + self.random.expovariate(
+                    1 / self.config.verdict_delay
+                )
+                homework = {
+                    'id': self._next_id,
+                    'homework_name': f'student__hw{self._next_id}.zip',
+                    'lesson_name': f'Спринт {self._next_id}',
+                    'reviewer_comment': '',
+                }
+                transitions = [
+                    (reviewing, 'reviewing'),
+                    (verdict, self.random.choice(VERDICTS)),
+                ]
+                timeline.append((homework, transitions))
+                self._next_id += 1
+            self._timelines[token] = timeline
+        return timeline
+
+    def homeworks(self, token, from_date, now, to_date=None):
+        """Работы токена, сменившие статус в интервале [from_date, now].
+
+        С to_date интервал заканчивается раньше: [from_date, to_date).
+        """
+        result = []
+        for homework, transitions in self.timeline(token):
+            changed = [item for item in transitions if item[0] <= now
+                       and (to_date is None or item[0] < to_date)]
+            if not changed or changed[-1][0] < from_date:
+                continue
+            updated, status = changed[-1]
+            result.append(dict(
+                homework, status=status, date_updated=isoformat(updated)
+            ))
+        return result
+
+    def delay(self):
+        """Случайная задержка ответа по заданному распределению."""
+        mean = self.config.latency_mean
+        if not mean:
+            return 0
+        if self.config.latency == 'uniform':
+            return self.random.uniform(0, 2 * mean)
+        if self.config.latency == 'lognormal':
+            return self.random.lognormvariate(0, 1) * mean / 1.6487
+        return mean
+
+    async def handle(self, request):
+        """Обработчик запроса к homework_statuses/."""
+        self.requests += 1
+        await asyncio.sleep(self.delay())
+        config = self.config
+        token = request.headers.get('Authorization', '')
+        if not token.startswith('OAuth ') or token[6:] in config.bad_tokens:
+            return self.unauthorized()
+        roll = self.random.random()
+        if roll < config.error_rate:
+            return web.json_response({}, status=500)
+        roll -= config.error_rate
+        if roll < config.unauthorized_rate:
+            return self.unauthorized()
+        roll -= config.unauthorized_rate
+        if roll < config.malformed_rate:
+            return web.Response(text='{"homeworks": [', status=200,
+                                content_type='application/json')
+        try:
+            from_date = int(request.query.get('from_date', 0))
+            to_date = request.query.get('to_date')
+            to_date = int(to_date) if to_date is not None else None
+        except ValueError:
+            return web.json_response({'code': 'bad_request'}, status=400)
+        now = self.clock()
+        homeworks = self.homeworks(token[6:], from_date, now, to_date)
+        headers = {}
+        if config.etag:
+            etag = self.etag(homeworks)
+            if request.headers.get('If-None-Match') == etag:
+                return web.Response(status=304, headers={'ETag': etag})
+            headers['ETag'] = etag
+        return web.json_response({
+            'homeworks': homeworks,
+            'current_date': int(now),
+        }, headers=headers)
+
+    @staticmethod
+    def etag(homeworks):
+        """Значение ETag для списка работ без учёта current_date."""
+        body = json.dumps(homeworks, sort_keys=True).encode('utf-8')
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    @staticmethod
+    def unauthorized():
+        """Ответ 401 в формате API."""
+        return web.json_response({
+            'code': 'not_authenticated',
+            'message': 'Учетные данные не были предоставлены.',
+            'source': '__response__'
+        }, status=401)
+
+    def application(self):
+        """Приложение aiohttp с единственным маршрутом."""
+        app = web.Application()
+        app.router.add_get(PATH, self.handle)
+        return app
+
+    async def start(self):
+        """Запускает сервер в текущем цикле событий."""
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        """Останавливает сервер."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def in_thread(self):
+        """Запускает сервер в отдельном потоке для синхронного кода."""
+        return serve_in_thread(self)
+
+
+def main():
+    """Запуск сервера из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--homeworks', type=int, default=5)
+    parser.add_argument('--review-delay', type=float, default=60)
+    parser.add_argument('--verdict-delay', type=float, default=300)
+    parser.add_argument('--latency', default='fixed',
+                        choices=('fixed', 'uniform', 'lognormal'))
+    parser.add_argument('--latency-mean', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--unauthorized-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--bad-token', action='append', default=[])
+    parser.add_argument('--etag', action='store_true')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    config = FakeConfig(
+        homeworks=args.homeworks,
+        review_delay=args.review_delay,
+        verdict_delay=args.verdict_delay,
+        latency=args.latency,
+        latency_mean=args.latency_mean,
+        error_rate=args.error_rate,
+        unauthorized_rate=args.unauthorized_rate,
+        malformed_rate=args.malformed_rate,
+        bad_tokens=args.bad_token,
+        etag=args.etag,
+        seed=args.seed,
+    )
+    server = FakePracticum(config, args.host, args.port)
+    print(f'Фейковый API Практикума: {server.url}')
+    web.run_app(server.application(), host=args.host, port=args.port,
+                print=None)
+
+
+if __name__ == '__main__':
+    main()
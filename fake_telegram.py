@@ -0,0 +1,94 @@
+"""Локальная замена Bot API телеграма для нагрузочных тестов.
+
+Бот направляется на сервер параметром base_url:
+
+    telegram.Bot(token=TELEGRAM_TOKEN, base_url=server.base_url)
+"""
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+from fake_practicum import serve_in_thread
+
+
+class FakeTelegram:
+    """HTTP-сервер, принимающий sendMessage.
+
+    Отправленные сообщения копятся в messages как пары (chat_id, text).
+    Доля flood_rate ответов — 429 с retry_after секундами ожидания,
+    latency — задержка каждого ответа.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0,
+                 flood_rate=0.0, retry_after=1, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.messages = []
+        self._runner = None
+
+    @property
+    def base_url(self):
+        """Значение base_url для telegram.Bot."""
+        return f'http://{self.host}:{self.port}/bot'
+
+    async def handle(self, request):
+        """Обработчик метода sendMessage."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.random.random() < self.flood_rate:
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': 'Too Many Requests: retry after '
+                               f'{self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }, status=429)
+        if request.content_type == 'application/json':
+            data = json.loads(await request.text())
+        else:
+            data = dict(await request.post())
+        self.messages.append((str(data['chat_id']), data['text']))
+        return web.json_response({'ok': True, 'result': {
+            'message_id': len(self.messages),
+            'date': int(time.time()),
+            'chat': {'id': int(data['chat_id']), 'type': 'private'},
+            'text': data['text'],
+        }})
+
+    def application(self):
+        """Приложение aiohttp с маршрутом sendMessage."""
+        app = web.Application()
+        app.router.add_post('/bot{token}/sendMessage', self.handle)
+        return app
+
+    async def start(self):
+        """Запускает сервер в текущем цикле событий."""
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        """Останавливает сервер."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def in_thread(self):
+        """Запускает сервер в отдельном потоке."""
+        return serve_in_thread(self)
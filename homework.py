@@ -1,7 +1,6 @@
 import json
 import logging
 import os
-import sys
 import time
 from http import HTTPStatus
 
@@ -9,29 +8,37 @@ from dotenv import load_dotenv
 import requests
 import telegram
 
-from exceptions import ParseStatusError, APIrequestError, TokenMissingError
+from alerts import ErrorThrottle
+from exceptions import (
+    APIrequestError, ParseStatusError, SchemaError, TokenMissingError
+)
+from logs import setup_logging
+from metrics import (
+    PARSED, RESPONSE_INVALID, SEND_FAILURES, SEND_LATENCY, observe_api_request
+)
+from schema import Answer
+from shutdown import GracefulExit
+from state import STATE_FILE, StateStore, homework_key
+from status_index import StatusIndex
+from templates import MessageTemplates
 
 load_dotenv()
 
-logging.basicConfig(
-    filename='main.log',
-    filemode='w',
-    format='%(asctime)s [%(levelname)s] %(message)s %(name)s'
-)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
-handler = logging.StreamHandler(sys.stdout)
-logger.addHandler(handler)
-formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
-handler.setFormatter(formatter)
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
 RETRY_PERIOD = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+)
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
 
 
 HOMEWORK_VERDICTS = {
@@ -39,6 +46,22 @@ HOMEWORK_VERDICTS = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+MESSAGE_TEMPLATE = (
+    'Изменился статус проверки работы "{homework_name}". {verdict}'
+)
+LOCALES = {
+    'ru': (MESSAGE_TEMPLATE, HOMEWORK_VERDICTS),
+    'en': ('Review status of "{homework_name}" has changed. {verdict}', {
+        'approved': 'The reviewer liked everything. Hooray!',
+        'reviewing': 'The reviewer has started the review.',
+        'rejected': 'The reviewer has left some comments.',
+    }),
+}
+TEMPLATES = MessageTemplates(LOCALES)
+PARSED_BY_STATUS = {
+    status: PARSED.labels(status)
+    for _, verdicts in LOCALES.values() for status in verdicts
+}
 
 
 def check_tokens():
@@ -57,11 +80,23 @@ def check_tokens():
 
 def send_message(bot, message):
     """Отправка сообщения в телеграм."""
+    return send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_to_chat(bot, chat_id, message):
+    """Отправка сообщения в произвольный чат телеграма.
+
+    Возвращает True, если сообщение доставлено.
+    """
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        with SEND_LATENCY.time():
+            bot.send_message(chat_id, message)
         logger.debug('Бот отправил сообщение.')
-    except telegram.error.TelegramError:
+        return True
+    except telegram.error.TelegramError as error:
+        SEND_FAILURES.labels(type(error).__name__).inc()
         logger.error('Не удалось отправить сообщение в ТГ')
+        return False
 
 
 def get_api_answer(timestamp):
@@ -75,89 +110,175 @@ def get_api_answer(timestamp):
     пуст, если за выбранный интервал времени ни у одной из домашних работ
     не появился новый статус.
     """
+    return request_homeworks(timestamp, HEADERS)
+
+
+def request_homeworks(timestamp, headers):
+    """Запрос к API с заголовками конкретного владельца токена."""
+    started = time.perf_counter()
     try:
         response = requests.get(
             ENDPOINT,
-            headers=HEADERS,
-            params={'from_date': timestamp}
+            headers=headers,
+            params={'from_date': timestamp},
+            timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
         )
     except requests.RequestException:
+        observe_api_request('error', started)
         raise APIrequestError('Ошибка модуля requests')
+    observe_api_request(response.status_code, started)
     if response.status_code != HTTPStatus.OK:
         message = (f'Ошибка при запросе к API, '
                    f'статус ответа: {response.status_code}')
-        raise APIrequestError(message)
+        raise APIrequestError(message, response.status_code)
     try:
         response = response.json()
     except json.decoder.JSONDecodeError:
-        raise APIrequestError('Ответ API не в JSON формате')
+        raise APIrequestError('Ответ API не в JSON формате', HTTPStatus.OK)
     return response
 
 
 def check_response(response):
-    """Проверяет ответ API на соответствие документации."""
-    message = 'ответ API не соответствует документации'
-    if not isinstance(response, dict):
-        raise TypeError(message)
-    if 'homeworks' not in response:
-        raise TypeError(message)
-    if 'current_date' not in response:
-        raise TypeError(message)
-    if not isinstance(response.get('homeworks'), list):
-        raise TypeError(message)
-    if not isinstance(response.get('current_date'), int):
-        raise TypeError(message)
+    """Проверяет ответ API на соответствие документации.
+
+    Возвращает ответ в виде записи Answer с работами Homework. При
+    несоответствии схеме выбрасывает SchemaError — подкласс TypeError
+    с путём к ошибочному полю. Работы, не прошедшие проверку,
+    пропускаются, их ошибки — в answer.skipped. Уже разобранный
+    ответ Answer, например из потокового разбора, возвращается как есть.
+    """
+    if isinstance(response, Answer):
+        return response
+    try:
+        answer = Answer.decode(response)
+    except SchemaError:
+        RESPONSE_INVALID.inc()
+        raise
+    if answer.skipped:
+        RESPONSE_INVALID.inc(len(answer.skipped))
+    return answer
 
 
 def parse_status(homework):
-    """Извлекает статус конкретной домашней работы."""
-    if 'homework_name' not in homework:
-        raise ParseStatusError('нет ключа homework_name')
+    """Извлекает статус конкретной домашней работы.
+
+    Принимает словарь из ответа API или запись Homework; у записи
+    наличие homework_name уже проверено схемой.
+    """
+    return format_status(homework)
+
+
+def format_status(homework, locale=None, parse_mode=None):
+    """Сообщение о статусе работы на языке locale.
+
+    parse_mode — режим разметки телеграма ('HTML' или 'MarkdownV2'),
+    под который экранируется название работы.
+    """
     homework_name = homework.get('homework_name')
+    if homework_name is None:
+        PARSED.labels('no_homework_name').inc()
+        raise ParseStatusError('нет ключа homework_name')
     status = homework.get('status')
-    if status not in HOMEWORK_VERDICTS:
+    try:
+        message = TEMPLATES.render(status, str(homework_name), locale,
+                                   parse_mode)
+    except KeyError:
+        PARSED.labels('unknown').inc()
         logger.error('неожиданный статус домашней работы')
         raise ParseStatusError('неожиданный статус домашней работы')
-    verdict = HOMEWORK_VERDICTS.get(status)
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    PARSED_BY_STATUS[status].inc()
+    return message
+
+
+def enqueue_statuses(answer, statuses, store, key):
+    """Кладёт новые статусы работ ответа answer в outbox хранилища store.
+
+    Работа с неизвестным статусом или не прошедшая проверку схемой
+    пропускается, чтобы не задерживать остальные и сдвиг курсора;
+    её ошибка ParseStatusError или SchemaError возвращается, иначе
+    возвращается None.
+    """
+    failure = answer.skipped[-1] if answer.skipped else None
+    for homework in answer.homeworks:
+        homework_id = homework_key(homework)
+        status = homework.get('status')
+        if statuses.is_unchanged(homework_id, status):
+            continue
+        try:
+            info = parse_status(homework)
+        except ParseStatusError as error:
+            failure = error
+            continue
+        store.enqueue(key, homework_id, status, info)
+        statuses.set(homework_id, status)
+    return failure
+
+
+def deliver(bot, store, key):
+    """Отправляет сообщения из outbox хранилища store.
+
+    Доставленные отмечаются в хранилище и записываются одной
+    транзакцией; неотправленные остаются в outbox до следующей
+    итерации.
+    """
+    for _, homework_id, status, text in store.outbox(key):
+        if send_message(bot, text):
+            store.mark_delivered(key, homework_id, status)
+        else:
+            logger.warning(f'Статус работы {homework_id} не отправлен, '
+                           'повторим на следующей итерации')
+    store.flush()
 
 
 def main():
-    """Основная логика работы бота."""
+    """Основная логика работы бота.
+
+    Новые статусы сначала записываются в outbox хранилища, и только
+    вместе с ними сохраняется сдвинутый курсор. Отправка идёт из
+    outbox, так что сбой телеграма не теряет уведомление. Без
+    STATE_FILE хранилище живёт в памяти процесса.
+    """
     check_tokens()
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    store = StateStore(STATE_FILE or ':memory:')
+    key = (PRACTICUM_TOKEN, str(TELEGRAM_CHAT_ID))
     timestamp = int(time.time()) - 7 * 24 * 60 * 60  # задаём интервал (неделя)
-    message_last_status = ''
-    errors = []
-    while True:
+    saved = store.load_cursor(key)
+    if saved is not None:
+        timestamp = saved
+    statuses = StatusIndex()
+    alerts = ErrorThrottle()
+    with GracefulExit() as shutdown:
         try:
-            answer = get_api_answer(timestamp)
-            check_response(answer)
-            homework_list = answer.get('homeworks')
-            if not homework_list:
-                logger.debug('Список домашек пуст, изменений нет.')
-            else:
-                for homework in homework_list:
-                    info = parse_status(homework)
-                    if message_last_status != info:
-                        send_message(bot, info)
-                    message_last_status = info
-        except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            logger.error(message, exc_info=True)
-            if error not in errors:
-                errors.append(error)
+            while True:
+                try:
+                    answer = check_response(get_api_answer(timestamp))
+                    if not answer.homeworks:
+                        logger.debug('Список домашек пуст, изменений нет.')
+                    failure = enqueue_statuses(answer, statuses, store, key)
+                    store.save_cursor(key, answer.current_date)
+                    store.flush()
+                    timestamp = answer.current_date
+                    if failure:
+                        raise failure
+                except Exception as error:
+                    message = f'Сбой в работе программы: {error}'
+                    if alerts.report(error):
+                        logger.error(message, exc_info=True)
+                    else:
+                        logger.error(message)
+                finally:
+                    deliver(bot, store, key)
+                    for _, text in alerts.pop_messages():
+                        send_message(bot, text)
+                    logger.debug('Спим 600 секунд')
+                    with shutdown.sleeping():
+                        time.sleep(RETRY_PERIOD)
         finally:
-            timestamp = answer.get('current_date')
-            for error in errors:
-                bot.send_message(
-                    TELEGRAM_CHAT_ID,
-                    f'Хьюстон, у нас проблемы: {error}'
-                )
-            errors = []
-            logger.debug('Спим 600 секунд')
-            time.sleep(RETRY_PERIOD)
+            store.close()
+    logger.info('Бот остановлен.')
 
 
 if __name__ == '__main__':
+    setup_logging()
     main()
@@ -0,0 +1,74 @@
+"""Разбор JSON самой быстрой из установленных библиотек.
+
+Порядок выбора — orjson, msgspec, ujson, стандартный json; его можно
+переопределить переменной JSON_BACKEND. Ни одна из сторонних
+библиотек не обязательна: без них используется json из stdlib.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+JSON_BACKEND = os.getenv('JSON_BACKEND')
+PREFERRED = ('orjson', 'msgspec', 'ujson', 'json')
+
+
+def _orjson():
+    import orjson
+    return orjson.loads, (orjson.JSONDecodeError,)
+
+
+def _msgspec():
+    import msgspec
+    return msgspec.json.decode, (msgspec.DecodeError,)
+
+
+def _ujson():
+    import ujson
+    return ujson.loads, (ujson.JSONDecodeError,)
+
+
+def _stdlib():
+    return json.loads, (json.JSONDecodeError, UnicodeDecodeError)
+
+
+BACKENDS = {
+    'orjson': _orjson,
+    'msgspec': _msgspec,
+    'ujson': _ujson,
+    'json': _stdlib,
+}
+
+
+def available():
+    """Имена установленных библиотек в порядке предпочтения."""
+    names = []
+    for name in PREFERRED:
+        try:
+            BACKENDS[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def load_backend(name=None):
+    """Имя, функция разбора и её исключения для библиотеки name.
+
+    Без name берётся первая установленная из PREFERRED.
+    Неизвестное или не установленное имя — ValueError.
+    """
+    if name is not None:
+        if name not in BACKENDS:
+            raise ValueError(f'неизвестная библиотека JSON: {name}')
+        try:
+            return (name,) + BACKENDS[name]()
+        except ImportError:
+            raise ValueError(f'библиотека JSON не установлена: {name}')
+    name = available()[0]
+    return (name,) + BACKENDS[name]()
+
+
+NAME, loads, DECODE_ERRORS = load_backend(JSON_BACKEND)
+logger.debug(f'Разбор JSON: {NAME}')
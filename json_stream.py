@@ -0,0 +1,177 @@
+"""Потоковый разбор ответа homework_statuses/.
+
+Тело ответа подаётся кусками, работы из массива homeworks
+возвращаются по мере того, как каждая из них прочитана целиком,
+так что в памяти одновременно находится одна работа и один кусок
+тела, а не всё дерево объектов ответа.
+"""
+import codecs
+import json
+import re
+
+from exceptions import SchemaError
+from metrics import RESPONSE_INVALID
+from schema import Answer, Homework
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+VALUE_START = frozenset('["-0123456789tfn')
+
+_START, _KEY, _COLON, _VALUE, _NEXT_FIELD, _ITEM, _NEXT_ITEM, _DONE = range(8)
+_INCOMPLETE = object()
+_decoder = json.JSONDecoder()
+_DELIMITERS = frozenset(', \t\n\r}]')
+
+
+class AnswerParser:
+    """Инкрементальный парсер ответа API с проверкой его структуры.
+
+    feed() принимает очередной кусок байтов и возвращает работы,
+    законченные в нём, в виде записей Homework. close() завершает
+    разбор и возвращает запись Answer без уже выданных работ.
+    Работа, не прошедшая проверку схемой, пропускается, а её
+    SchemaError попадает в skipped этой записи, как в check_response.
+    Нарушение структуры самого ответа — SchemaError, битый JSON —
+    ValueError.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.count = 0
+        self.skipped = []
+        self._text = ''
+        self._pos = 0
+        self._state = _START
+        self._first = True
+        self._key = None
+        self._has_homeworks = False
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+
+    def feed(self, data):
+        """Разбирает очередной кусок тела ответа."""
+        return self._parse(self._utf8.decode(data), final=False)
+
+    def close(self):
+        """Завершает разбор и проверяет обязательные поля."""
+        self._parse(self._utf8.decode(b'', final=True), final=True)
+        if self._state != _DONE:
+            raise json.JSONDecodeError(
+                'неожиданный конец ответа', self._text, self._pos
+            )
+        if not (self._has_homeworks
+                and isinstance(self.fields.get('current_date'), int)):
+            self._invalid()
+        return Answer(homeworks=[], current_date=self.fields['current_date'],
+                      skipped=self.skipped)
+
+    def _parse(self, text, final):
+        self._text = self._text[self._pos:] + text
+        self._pos = 0
+        homeworks = []
+        while self._step(homeworks, final):
+            pass
+        return homeworks
+
+    def _step(self, homeworks, final):
+        text = self._text
+        pos = WHITESPACE.match(text, self._pos).end()
+        self._pos = pos
+        if pos >= len(text):
+            return False
+        char, state = text[pos], self._state
+        if state == _START:
+            if char in VALUE_START:
+                self._invalid()
+            if char != '{':
+                raise json.JSONDecodeError('ожидался объект', text, pos)
+            self._advance(pos + 1, _KEY, first=True)
+        elif state == _KEY:
+            if char == '}' and self._first:
+                self._advance(pos + 1, _DONE)
+                return True
+            key, end = self._decode(pos, final)
+            if key is _INCOMPLETE:
+                return False
+            if not isinstance(key, str):
+                raise json.JSONDecodeError('ожидалось имя поля', text, pos)
+            self._key = key
+            self._advance(end, _COLON)
+        elif state == _COLON:
+            if char != ':':
+                raise json.JSONDecodeError('ожидалось «:»', text, pos)
+            self._advance(pos + 1, _VALUE)
+        elif state == _VALUE:
+            if self._key == 'homeworks':
+                if char != '[':
+                    RESPONSE_INVALID.inc()
+                    raise SchemaError('ожидался list', 'homeworks')
+                self._has_homeworks = True
+                self._advance(pos + 1, _ITEM, first=True)
+                return True
+            value, end = self._decode(pos, final)
+            if value is _INCOMPLETE:
+                return False
+            self.fields[self._key] = value
+            self._advance(end, _NEXT_FIELD)
+        elif state == _NEXT_FIELD:
+            self._separator(char, pos, '}', _KEY, _DONE)
+        elif state == _ITEM:
+            if char == ']' and self._first:
+                self._advance(pos + 1, _NEXT_FIELD)
+                return True
+            item, end = self._decode(pos, final)
+            if item is _INCOMPLETE:
+                return False
+            try:
+                homeworks.append(Homework.decode(item))
+            except SchemaError as error:
+                RESPONSE_INVALID.inc()
+                self.skipped.append(error.within(f'homeworks[{self.count}]'))
+            self.count += 1
+            self._advance(end, _NEXT_ITEM)
+        elif state == _NEXT_ITEM:
+            self._separator(char, pos, ']', _ITEM, _NEXT_FIELD)
+        else:
+            raise json.JSONDecodeError('лишние данные', text, pos)
+        return True
+
+    def _advance(self, pos, state, first=False):
+        self._pos = pos
+        self._state = state
+        self._first = first
+
+    def _separator(self, char, pos, closing, next_state, closed_state):
+        if char == ',':
+            self._advance(pos + 1, next_state)
+        elif char == closing:
+            self._advance(pos + 1, closed_state)
+        else:
+            raise json.JSONDecodeError(
+                f'ожидалось «,» или «{closing}»', self._text, pos
+            )
+
+    def _decode(self, pos, final):
+        """Значение с позиции pos либо _INCOMPLETE, если данных мало.
+
+        Значение принимается, только если за ним уже есть символ, а число —
+        только если за ним идёт разделитель: иначе «12» или «150.»
+        в конце куска могли бы оказаться началом «123» или «150.5».
+        """
+        try:
+            value, end = _decoder.raw_decode(self._text, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return _INCOMPLETE, pos
+        if final:
+            return value, end
+        if end >= len(self._text):
+            return _INCOMPLETE, pos
+        if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                and self._text[end] not in _DELIMITERS):
+            return _INCOMPLETE, pos
+        return value, end
+
+    @staticmethod
+    def _invalid(reason='ожидался объект с полями homeworks и current_date'):
+        RESPONSE_INVALID.inc()
+        raise SchemaError(reason)
@@ -0,0 +1,131 @@
+"""Неблокирующая запись логов.
+
+Записи из рабочих потоков и цикла asyncio только кладутся в очередь
+QueueHandler; форматирование и запись в файл и stdout выполняет
+отдельный поток QueueListener. Файл ротируется по размеру либо,
+если задан LOG_ROTATE_WHEN, по времени.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+LOG_FILE = os.getenv('LOG_FILE', 'main.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN')
+LOG_DEBUG_SAMPLE = int(os.getenv('LOG_DEBUG_SAMPLE', 10))
+LOG_SAMPLE_WINDOW = 60
+LOG_SAMPLE_KEYS = 10_000
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s %(name)s'
+CONTEXT_FIELDS = ('chat_id', 'homework_id')
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON.
+
+    Кроме времени, уровня и текста в запись попадают поля из
+    CONTEXT_FIELDS, переданные через extra, например
+    logger.error(..., extra={'chat_id': chat_id}).
+    """
+
+    def format(self, record):
+        """Сериализует запись в JSON."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS + ('suppressed',):
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Пропускает каждую every-ю одинаковую запись уровня DEBUG.
+
+    Одинаковыми считаются записи с одним шаблоном сообщения, поэтому
+    частые DEBUG-строки передают значения аргументами в %-стиле,
+    а не подставляют их f-строкой. Первая
+    запись в окне window секунд проходит всегда; в пропущенной
+    дальше записи поле suppressed хранит число отброшенных повторов.
+    """
+
+    def __init__(self, every=LOG_DEBUG_SAMPLE, window=LOG_SAMPLE_WINDOW,
+                 clock=time.monotonic):
+        super().__init__()
+        self.every = every
+        self.window = window
+        self.clock = clock
+        self._seen = {}
+
+    def filter(self, record):
+        """True, если запись нужно записать."""
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.name, record.msg)
+        now = self.clock()
+        if key not in self._seen and len(self._seen) >= LOG_SAMPLE_KEYS:
+            self._seen.clear()
+        started, count = self._seen.get(key, (now, 0))
+        if now - started >= self.window:
+            started, count = now, 0
+        self._seen[key] = (started, count + 1)
+        if count % self.every:
+            return False
+        if count:
+            record.suppressed = self.every - 1
+        return True
+
+
+def file_handler(path):
+    """Обработчик файла с ротацией по времени или по размеру."""
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+
+
+def setup_logging(path=LOG_FILE, level=LOG_LEVEL, fmt=LOG_FORMAT,
+                  stream=sys.stdout):
+    """Подключает очередь логов к корневому логгеру.
+
+    Возвращает запущенный QueueListener; он останавливается и
+    дописывает очередь при выходе из процесса.
+    """
+    formatter = (JsonFormatter() if fmt == 'json'
+                 else logging.Formatter(TEXT_FORMAT))
+    handlers = [logging.StreamHandler(stream)]
+    if path:
+        handlers.append(file_handler(path))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(DebugSampler())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(
+        records, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,367 @@
+"""Метрики в текстовом формате Prometheus.
+
+Счётчики, гистограммы и датчики с метками живут в общем реестре
+REGISTRY; start_http_server отдаёт их по адресу /metrics.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\')
+            .replace('\n', r'\n').replace('"', r'\"'))
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"'
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, *values, **kwargs):
+        """Дочерняя метрика для конкретных значений меток."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def render(self):
+        """Строки метрики в текстовом формате."""
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """Увеличивает значение."""
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        """Устанавливает значение."""
+        self.value = value
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        """Увеличивает счётчик без меток."""
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        labels = _format_labels(self.labelnames, values)
+        yield f'{self.name}{labels} {_format_number(child.value)}'
+
+
+class Gauge(_Metric):
+    """Текущее значение; может вычисляться функцией при сборе."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None,
+                 function=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.function = function
+
+    def _child(self):
+        return _Value()
+
+    def set(self, value):
+        """Устанавливает значение без меток."""
+        self.labels().set(value)
+
+    def set_function(self, function):
+        """Значение будет браться из function() при каждом сборе."""
+        self.function = function
+
+    def render(self):
+        """Строки метрики в текстовом формате."""
+        if self.function is not None:
+            self.labels().set(self.function())
+        return super().render()
+
+    def _render_child(self, values, child):
+        labels = _format_labels(self.labelnames, values)
+        yield f'{self.name}{labels} {_format_number(child.value)}'
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Учитывает одно наблюдение."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        """Контекстный менеджер, измеряющий длительность блока."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('_histogram', '_started')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class Histogram(_Metric):
+    """Распределение величины по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None,
+                 buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        """Наблюдение для гистограммы без меток."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Замер длительности блока для гистограммы без меток."""
+        return self.labels().time()
+
+    def _render_child(self, values, child):
+        cumulative = 0
+        bounds = self.buckets + (float('inf'),)
+        for bound, count in zip(bounds, child.counts):
+            cumulative += count
+            labels = _format_labels(
+                self.labelnames, values, f'le="{_format_number(bound)}"'
+            )
+            yield f'{self.name}_bucket{labels} {cumulative}'
+        labels = _format_labels(self.labelnames, values)
+        yield f'{self.name}_sum{labels} {_format_number(child.sum)}'
+        yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    """Набор метрик, отдаваемых одним эндпоинтом."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Добавляет метрику; имя должно быть уникальным."""
+        if metric.name in self._metrics:
+            raise ValueError(f'метрика {metric.name} уже зарегистрирована')
+        self._metrics[metric.name] = metric
+
+    def get(self, name):
+        """Метрика по имени."""
+        return self._metrics[name]
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+API_REQUESTS = Counter(
+    'practicum_requests_total',
+    'Запросы к API Практикума по статусу ответа', ('status',)
+)
+API_LATENCY = Histogram(
+    'practicum_request_seconds',
+    'Время запроса к API Практикума', ('status',)
+)
+API_JOINED = Counter(
+    'practicum_requests_joined_total',
+    'Запросы к API, получившие ответ уже идущего запроса с тем же токеном'
+)
+RESPONSE_INVALID = Counter(
+    'check_response_failures_total',
+    'Ответы API, не прошедшие проверку check_response'
+)
+PARSED = Counter(
+    'parse_status_total',
+    'Результаты parse_status по статусу работы', ('status',)
+)
+SEND_LATENCY = Histogram(
+    'telegram_send_seconds', 'Время отправки сообщения в телеграм'
+)
+SEND_FAILURES = Counter(
+    'telegram_send_failures_total',
+    'Ошибки отправки в телеграм по типу', ('reason',)
+)
+POLL_LAG = Histogram(
+    'poll_lag_seconds', 'Отставание запуска опроса от расписания'
+)
+SEND_QUEUE_DEPTH = Gauge(
+    'send_queue_depth', 'Сообщения в очереди отправки'
+)
+SCHEDULED_POLLS = Gauge(
+    'scheduled_polls', 'Опросы, ожидающие своего срока'
+)
+POLLS_IN_FLIGHT = Gauge(
+    'polls_in_flight', 'Опросы, выполняющиеся прямо сейчас'
+)
+BREAKER_STATE = Gauge(
+    'api_breaker_state',
+    'Состояние выключателя API: 0 — closed, 1 — open, 2 — half_open'
+)
+BREAKER_TRANSITIONS = Counter(
+    'api_breaker_transitions_total',
+    'Переходы выключателя API по новому состоянию', ('state',)
+)
+SUSPENDED_SUBSCRIBERS = Gauge(
+    'suspended_subscribers', 'Подписчики, опрос которых остановлен'
+)
+WEBHOOK_EVENTS = Counter(
+    'webhook_events_total', 'Запросы к приёмнику вебхуков по результату',
+    ('result',)
+)
+
+
+def observe_api_request(status, started):
+    """Учитывает запрос к API: статус ответа и время с момента started."""
+    API_REQUESTS.labels(status).inc()
+    API_LATENCY.labels(status).observe(time.perf_counter() - started)
+
+
+def _add_label(series, name, value):
+    label = f'{name}="{_escape(value)}"'
+    if series.endswith('}'):
+        return f'{series[:-1]},{label}}}'
+    return f'{series}{{{label}}}'
+
+
+def merge(snapshots):
+    """Сводит метрики нескольких процессов в один текст.
+
+    snapshots — словарь «имя процесса → текст render()». Значения
+    счётчиков и гистограмм с одинаковыми метками складываются,
+    датчики выводятся для каждого процесса с меткой worker.
+    """
+    headers = {}
+    kinds = {}
+    samples = {}
+    for worker, text in snapshots.items():
+        name = None
+        for line in text.splitlines():
+            if line.startswith('# '):
+                _, keyword, name, rest = line.split(' ', 3)
+                headers.setdefault(name, {}).setdefault(keyword, line)
+                if keyword == 'TYPE':
+                    kinds[name] = rest
+                continue
+            if not line:
+                continue
+            series, value = line.rsplit(' ', 1)
+            if kinds.get(name) == 'gauge':
+                series = _add_label(series, 'worker', worker)
+            values = samples.setdefault(name, {})
+            values[series] = values.get(series, 0) + float(value)
+    lines = []
+    for name, values in samples.items():
+        lines.extend(headers[name].values())
+        for series, value in values.items():
+            if value.is_integer():
+                value = int(value)
+            lines.append(f'{series} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=METRICS_PORT, host=METRICS_HOST,
+                      registry=REGISTRY):
+    """Отдаёт метрики по адресу http://host:port/metrics.
+
+    Сервер работает в фоновом потоке и не мешает циклу asyncio.
+    """
+    handler = type('Handler', (_Handler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
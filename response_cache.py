@@ -0,0 +1,88 @@
+"""Условные запросы к API и распознавание неизменившихся ответов.
+
+Для каждого токена хранятся валидаторы последнего ответа (ETag и
+Last-Modified) и отпечаток его тела. Валидаторы уходят в следующем
+запросе как If-None-Match и If-Modified-Since; ответ 304 либо ответ
+с тем же отпечатком означают, что разбирать тело не нужно.
+
+Ответ запоминается вместе с from_date запроса. Запрос с более ранним
+from_date (например, после добавления чата с отставшим курсором)
+может вернуть те же работы, но его получатель их ещё не видел, поэтому
+для него валидаторы не отправляются, а тело всегда разбирается.
+"""
+import hashlib
+import re
+
+NOT_MODIFIED = object()
+
+CURRENT_DATE_PATTERN = re.compile(rb'"current_date"\s*:\s*-?\d+')
+
+
+def body_digest(body):
+    """Отпечаток тела ответа без поля current_date.
+
+    current_date меняется при каждом запросе, поэтому без этой
+    замены пустые ответы никогда не совпадали бы побайтно.
+    """
+    body = CURRENT_DATE_PATTERN.sub(b'', body)
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+class _Entry:
+    __slots__ = ('etag', 'last_modified', 'digest', 'from_date')
+
+    def __init__(self, etag, last_modified, digest, from_date):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.from_date = from_date
+
+    def covers(self, from_date):
+        """Годится ли ответ для запроса с from_date."""
+        return from_date >= self.from_date
+
+
+class ResponseCache:
+    """Валидаторы и отпечатки последних ответов по ключу токена."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def conditional_headers(self, key, from_date):
+        """Заголовки условного запроса для ключа и from_date."""
+        entry = self._entries.get(key)
+        headers = {}
+        if entry is None or not entry.covers(from_date):
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def is_unchanged(self, key, headers, body, from_date):
+        """Запоминает ответ; True, если он совпал с предыдущим.
+
+        Ответ на запрос с from_date раньше запомненного не считается
+        совпавшим, даже если тело то же.
+        """
+        digest = body_digest(body)
+        entry = self._entries.get(key)
+        unchanged = (entry is not None and entry.covers(from_date)
+                     and entry.digest == digest)
+        self.remember(key, headers, from_date, digest)
+        return unchanged
+
+    def remember(self, key, headers, from_date, digest=None):
+        """Сохраняет валидаторы ответа, тело которого не хэшировалось."""
+        self._entries[key] = _Entry(
+            headers.get('ETag'), headers.get('Last-Modified'), digest,
+            from_date
+        )
+
+    def forget(self, key):
+        """Удаляет сохранённый ответ, например после ошибки."""
+        self._entries.pop(key, None)
@@ -0,0 +1,386 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+
+from homework import RETRY_PERIOD
+
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', 60))
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', 3600))
+POLL_BACKOFF = float(os.getenv('POLL_BACKOFF', 2))
+REQUEST_BUDGET = float(os.getenv('REQUEST_BUDGET', 0))  # запросов в час
+
+
+class Clock:
+    """Системные часы: монотонное время и ожидание в цикле asyncio."""
+
+    def now(self):
+        """Текущее монотонное время в секундах."""
+        return time.monotonic()
+
+    async def sleep(self, seconds):
+        """Ожидание seconds секунд."""
+        await asyncio.sleep(seconds)
+
+    async def wait(self, event, timeout=None):
+        """Ожидание события не дольше timeout секунд."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class FakeClock(Clock):
+    """Управляемые часы для тестов: ожидание лишь сдвигает время."""
+
+    def __init__(self, start=0.0):
+        self._now = start
+
+    def now(self):
+        """Текущее модельное время."""
+        return self._now
+
+    def advance(self, seconds):
+        """Сдвигает модельное время вперёд."""
+        self._now += seconds
+
+    async def sleep(self, seconds):
+        """Сдвигает время на seconds и отдаёт управление циклу."""
+        self.advance(max(seconds, 0))
+        await asyncio.sleep(0)
+
+    async def wait(self, event, timeout=None):
+        """Даёт отработать готовым задачам, затем сдвигает время."""
+        for _ in range(10):
+            if event.is_set():
+                return
+            await asyncio.sleep(0)
+        if timeout is None:
+            await event.wait()
+        else:
+            self.advance(timeout)
+
+
+class Scheduler:
+    """Очередь опросов с равномерным разнесением по окну.
+
+    Каждый элемент опрашивается раз в period секунд, при этом
+    первые опросы сдвинуты друг относительно друга на period / N,
+    чтобы все подписчики не обращались к API в один момент.
+    """
+
+    def __init__(self, period=RETRY_PERIOD, clock=None):
+        self.period = period
+        self.clock = clock or Clock()
+        self._queue = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def spread(self, items):
+        """Ставит элементы в очередь, распределяя их по окну."""
+        items = list(items)
+        if not items:
+            return
+        now = self.clock.now()
+        step = self.period / len(items)
+        for index, item in enumerate(items):
+            self.push(item, now + index * step)
+
+    def push(self, item, due):
+        """Ставит элемент в очередь на момент due."""
+        heapq.heappush(self._queue, (due, next(self._counter), item))
+
+    def cancel(self, item):
+        """Убирает элемент из очереди за O(n)."""
+        size = len(self._queue)
+        self._queue = [entry for entry in self._queue if entry[2] is not item]
+        heapq.heapify(self._queue)
+        return len(self._queue) < size
+
+    def delay(self):
+        """Сколько секунд осталось до ближайшего опроса."""
+        return max(self._queue[0][0] - self.clock.now(), 0)
+
+    def pop(self):
+        """Извлекает ближайший элемент: пара (элемент, срок)."""
+        due, _, item = heapq.heappop(self._queue)
+        return item, due
+
+    def reschedule(self, item, due, interval=None):
+        """Ставит элемент на следующий опрос через interval от due.
+
+        По умолчанию интервал равен period.
+        """
+        self.push(item, due + (interval or self.period))
+
+
+class _Timer:
+    __slots__ = ('item', 'due', 'tick', 'level', 'slot', 'cancelled')
+
+    def __init__(self, item, due, tick):
+        self.item = item
+        self.due = due
+        self.tick = tick
+        self.level = None
+        self.slot = None
+        self.cancelled = False
+
+
+class TimingWheel(Scheduler):
+    """Очередь опросов на иерархическом колесе таймеров.
+
+    Время делится на такты по resolution секунд. Нижний уровень
+    колеса — SLOTS ячеек по такту, каждый следующий — SLOTS ячеек
+    по целому обороту предыдущего; таймер кладётся в ячейку уровня,
+    покрывающего его срок, и по мере хода времени спускается вниз.
+    Вставка, отмена и перенос занимают O(1), а ход времени на такт —
+    O(1) плюс перенос таймеров, спускающихся с верхних уровней.
+
+    Элемент срабатывает не раньше своего срока и не позже конца
+    такта, в который срок попал: опоздание меньше resolution, если
+    цикл опроса ждёт ровно delay(). Каждый элемент стоит в очереди
+    не больше одного раза: повторный push переносит его.
+    """
+
+    BITS = 6
+    SLOTS = 1 << BITS
+    LEVELS = 4
+
+    def __init__(self, period=RETRY_PERIOD, clock=None, resolution=1.0):
+        super().__init__(period, clock)
+        self.resolution = resolution
+        self._current = math.floor(self.clock.now() / resolution)
+        self._levels = [[{} for _ in range(self.SLOTS)]
+                        for _ in range(self.LEVELS)]
+        self._sizes = [0] * (self.LEVELS + 1)
+        self._overflow = {}
+        self._timers = {}
+        self._ready = deque()
+
+    def __len__(self):
+        return len(self._timers)
+
+    def push(self, item, due):
+        """Ставит элемент на момент due, снимая прежний таймер."""
+        self.cancel(item)
+        timer = _Timer(item, due, math.ceil(due / self.resolution))
+        self._timers[item] = timer
+        self._place(timer)
+
+    def cancel(self, item):
+        """Снимает таймер элемента; возвращает False, если его не было."""
+        timer = self._timers.pop(item, None)
+        if timer is None:
+            return False
+        if timer.slot is None:
+            timer.cancelled = True
+        else:
+            del timer.slot[item]
+            self._sizes[timer.level] -= 1
+        return True
+
+    def _place(self, timer):
+        distance = timer.tick - self._current
+        if distance <= 0:
+            timer.slot = None
+            self._ready.append(timer)
+            return
+        level = (distance.bit_length() - 1) // self.BITS
+        if level < self.LEVELS:
+            index = (timer.tick >> (self.BITS * level)) & (self.SLOTS - 1)
+            timer.slot = self._levels[level][index]
+        else:
+            level = self.LEVELS
+            timer.slot = self._overflow
+        timer.level = level
+        timer.slot[timer.item] = timer
+        self._sizes[level] += 1
+
+    def _cascade(self, level, slot):
+        timers = list(slot.values())
+        slot.clear()
+        self._sizes[level] -= len(timers)
+        for timer in timers:
+            self._place(timer)
+
+    def _empty_levels(self):
+        levels = 0
+        while levels < self.LEVELS and not self._sizes[levels]:
+            levels += 1
+        return levels
+
+    def _advance(self):
+        """Проводит колесо по тактам до текущего времени."""
+        target = math.floor(self.clock.now() / self.resolution)
+        mask = self.SLOTS - 1
+        while self._current < target:
+            empty = self._empty_levels()
+            if empty:
+                # На нижних уровнях пусто: до конца их оборота
+                # срабатывать и спускаться нечему.
+                block = (1 << (self.BITS * empty)) - 1
+                skip = min(target, self._current | block)
+                if skip > self._current:
+                    self._current = skip
+                    continue
+            self._current += 1
+            if not self._current & ((1 << (self.BITS * self.LEVELS)) - 1):
+                self._cascade(self.LEVELS, self._overflow)
+            for level in range(self.LEVELS - 1, 0, -1):
+                shift = self.BITS * level
+                if not self._current & ((1 << shift) - 1):
+                    self._cascade(level, self._levels[level][
+                        (self._current >> shift) & mask
+                    ])
+            self._cascade(0, self._levels[0][self._current & mask])
+
+    def _next_tick(self):
+        """Ближайший такт, на который назначен таймер, или None."""
+        best = None
+        for level, slots in enumerate(self._levels):
+            if not self._sizes[level]:
+                continue
+            shift = self.BITS * level
+            position = self._current >> shift
+            for step in range(1, self.SLOTS + 1):
+                if best is not None and (position + step) << shift >= best:
+                    break
+                slot = slots[(position + step) & (self.SLOTS - 1)]
+                if slot:
+                    tick = min(timer.tick for timer in slot.values())
+                    if best is None or tick < best:
+                        best = tick
+                    break
+        if self._overflow:
+            tick = min(timer.tick for timer in self._overflow.values())
+            if best is None or tick < best:
+                best = tick
+        return best
+
+    def _drop_cancelled(self):
+        while self._ready and self._ready[0].cancelled:
+            self._ready.popleft()
+
+    def delay(self):
+        """Сколько секунд осталось до ближайшего опроса."""
+        self._advance()
+        self._drop_cancelled()
+        if self._ready:
+            return 0
+        tick = self._next_tick()
+        if tick is None:
+            return None
+        return max(tick * self.resolution - self.clock.now(), 0)
+
+    def pop(self):
+        """Извлекает созревший элемент: пара (элемент, срок).
+
+        Если созревших нет — IndexError.
+        """
+        self._advance()
+        self._drop_cancelled()
+        timer = self._ready.popleft()
+        del self._timers[timer.item]
+        return timer.item, timer.due
+
+
+class AdaptiveInterval:
+    """Интервал опроса, подстраивающийся под активность подписчика.
+
+    После смены статуса следующий опрос будет через min_interval.
+    Пока работа на ревью, интервал растёт не дальше period: вердикт
+    ожидается скоро. Если ничего не происходит, интервал растёт
+    в backoff раз за опрос до max_interval.
+    """
+
+    def __init__(self, period=RETRY_PERIOD, min_interval=POLL_MIN_INTERVAL,
+                 max_interval=POLL_MAX_INTERVAL, backoff=POLL_BACKOFF):
+        self.period = period
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, period)
+        self.backoff = backoff
+        self._intervals = {}
+        self._reviewing = set()
+
+    def current(self, key):
+        """Текущий интервал для ключа."""
+        return self._intervals.get(key, self.period)
+
+    def update(self, key, statuses):
+        """Учитывает статусы из очередного ответа и возвращает интервал.
+
+        statuses — статусы работ из ответа API, None при ошибке опроса:
+        тогда интервал не меняется.
+        """
+        if statuses is None:
+            return self.current(key)
+        if 'reviewing' in statuses:
+            self._reviewing.add(key)
+        elif statuses:
+            self._reviewing.discard(key)
+        if statuses:
+            interval = self.min_interval
+        else:
+            limit = (self.period if key in self._reviewing
+                     else self.max_interval)
+            interval = min(self.current(key) * self.backoff, limit)
+        self._intervals[key] = interval
+        return interval
+
+    def forget(self, key):
+        """Удаляет состояние ключа."""
+        self._intervals.pop(key, None)
+        self._reviewing.discard(key)
+
+
+class TokenBucket:
+    """Ограничитель частоты «ведро с токенами».
+
+    В ведро помещается capacity токенов, пополняется оно со
+    скоростью rate токенов в секунду. При rate = 0 ограничения нет.
+    """
+
+    def __init__(self, rate, capacity=None, clock=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.clock = clock or Clock()
+        self._tokens = self.capacity
+        self._updated = self.clock.now()
+
+    def _refill(self):
+        now = self.clock.now()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def delay(self, tokens=1):
+        """Через сколько секунд наберётся tokens токенов."""
+        if not self.rate:
+            return 0
+        self._refill()
+        return max(tokens - self._tokens, 0) / self.rate
+
+    def try_acquire(self, tokens=1):
+        """Забирает токены, если они есть, без ожидания."""
+        if not self.rate:
+            return True
+        if self.delay(tokens):
+            return False
+        self._tokens -= tokens
+        return True
+
+    async def acquire(self, tokens=1):
+        """Дожидается и забирает tokens токенов."""
+        while not self.try_acquire(tokens):
+            await self.clock.sleep(self.delay(tokens))
+
+
+def request_budget(clock=None):
+    """Общий лимит запросов к API из REQUEST_BUDGET (запросов в час)."""
+    return TokenBucket(REQUEST_BUDGET / 3600, clock=clock)
@@ -0,0 +1,190 @@
+"""Схема ответа API и компактные записи для его данных.
+
+Схема описывается списком Field и один раз компилируется в функцию
+decode: она проверяет словарь из JSON и переносит значения полей
+в объект со __slots__ за один проход, без промежуточных копий.
+"""
+from exceptions import SchemaError
+
+_MISSING = object()
+
+
+class Field:
+    """Поле схемы.
+
+    types — допустимый тип или кортеж типов значения; необязательное
+    поле может отсутствовать или быть null. Для списков items —
+    функция decode, которой проверяется каждый элемент. С skip_invalid
+    элемент, не прошедший проверку, не делает весь список ошибочным:
+    он пропускается, а его SchemaError с путём попадает в список
+    skipped записи.
+    """
+
+    __slots__ = ('name', 'types', 'required', 'items', 'skip_invalid')
+
+    def __init__(self, name, types, required=True, items=None,
+                 skip_invalid=False):
+        self.name = name
+        self.types = types
+        self.required = required
+        self.items = items
+        self.skip_invalid = skip_invalid
+
+
+class Record:
+    """Запись с доступом к полям и как к атрибутам, и как к словарю.
+
+    Методы get и __contains__ позволяют передавать запись туда,
+    где раньше ожидался словарь из ответа API.
+    """
+
+    __slots__ = ()
+    fields = ()
+
+    def __init__(self, **values):
+        for field in self.fields:
+            setattr(self, field.name, values.get(field.name))
+        if 'skipped' in self.__slots__:
+            self.skipped = list(values.get('skipped', ()))
+
+    def get(self, key, default=None):
+        """Значение поля или default, если его нет или оно null."""
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        values = ', '.join(f'{key}={value!r}'
+                           for key, value in self.as_dict().items())
+        return f'{type(self).__name__}({values})'
+
+    def as_dict(self):
+        """Поля записи, кроме отсутствующих, в виде словаря."""
+        return {field.name: getattr(self, field.name)
+                for field in self.fields
+                if getattr(self, field.name) is not None}
+
+
+def _type_name(types):
+    if isinstance(types, tuple):
+        return ' или '.join(kind.__name__ for kind in types)
+    return types.__name__
+
+
+def _compile(cls):
+    """Исходный код функции decode для записи cls и её окружение."""
+    namespace = {'cls': cls, 'new': object.__new__, 'MISSING': _MISSING,
+                 'SchemaError': SchemaError, 'type_name': _type_name}
+    lines = [
+        'def decode(data):',
+        '    if not isinstance(data, dict):',
+        "        raise SchemaError('ожидался объект, получено '",
+        '                          + type(data).__name__)',
+        '    record = new(cls)',
+    ]
+    if 'skipped' in cls.__slots__:
+        lines.append('    record.skipped = skipped = []')
+    for number, field in enumerate(cls.fields):
+        name = field.name
+        namespace[f'types_{number}'] = field.types
+        lines.append(f'    value = data.get({name!r}, MISSING)')
+        if field.required:
+            lines += [
+                '    if value is MISSING:',
+                f"        raise SchemaError('нет обязательного поля', "
+                f'{name!r})',
+            ]
+            check = f'not isinstance(value, types_{number})'
+        else:
+            lines += [
+                '    if value is MISSING:',
+                '        value = None',
+            ]
+            check = (f'value is not None and '
+                     f'not isinstance(value, types_{number})')
+        lines += [
+            f'    if {check}:',
+            f'        raise SchemaError("ожидался " + '
+            f'type_name(types_{number}) + ", получено " + '
+            f'type(value).__name__, {name!r})',
+        ]
+        if field.items is not None and field.skip_invalid:
+            namespace[f'items_{number}'] = field.items
+            lines += [
+                '    if value is not None:',
+                '        items, value = value, []',
+                '        append = value.append',
+                '        for index, item in enumerate(items):',
+                '            try:',
+                f'                append(items_{number}(item))',
+                '            except SchemaError as error:',
+                f"                skipped.append(error.within("
+                f"f'{name}[{{index}}]'))",
+            ]
+        elif field.items is not None:
+            namespace[f'items_{number}'] = field.items
+            lines += [
+                '    if value is not None:',
+                '        items, value, index = value, [], 0',
+                '        append = value.append',
+                '        try:',
+                '            for index, item in enumerate(items):',
+                f'                append(items_{number}(item))',
+                '        except SchemaError as error:',
+                f"            raise error.within(f'{name}[{{index}}]')",
+            ]
+        lines.append(f'    record.{name} = value')
+    lines.append('    return record')
+    return '\n'.join(lines), namespace
+
+
+def record(name, fields, doc=None):
+    """Класс записи со __slots__ по списку полей и методом decode.
+
+    decode(data) проверяет словарь data по схеме и возвращает запись;
+    при несоответствии — SchemaError с путём к полю. Если у какого-то
+    поля skip_invalid, у записи есть ещё и список skipped.
+    """
+    slots = tuple(field.name for field in fields)
+    if any(field.skip_invalid for field in fields):
+        slots += ('skipped',)
+    cls = type(name, (Record,), {
+        '__slots__': slots,
+        '__doc__': doc,
+        'fields': tuple(fields),
+    })
+    source, namespace = _compile(cls)
+    exec(compile(source, f'<schema {name}>', 'exec'), namespace)
+    cls.decode = staticmethod(namespace['decode'])
+    return cls
+
+
+Homework = record('Homework', (
+    Field('id', int, required=False),
+    Field('status', str),
+    Field('homework_name', str),
+    Field('reviewer_comment', str, required=False),
+    Field('date_updated', str, required=False),
+    Field('lesson_name', str, required=False),
+), doc='Домашняя работа из ответа API.')
+
+Answer = record('Answer', (
+    Field('homeworks', list, items=Homework.decode, skip_invalid=True),
+    Field('current_date', int),
+), doc='''Ответ API homework_statuses/.
+
+Работы, не прошедшие проверку, пропускаются, чтобы одна битая запись
+не останавливала ленту; их ошибки — в списке skipped.
+''')
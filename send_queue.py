@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+
+import telegram
+from telegram.constants import MAX_MESSAGE_LENGTH
+
+from metrics import SEND_FAILURES, SEND_LATENCY
+from scheduler import Clock, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+SEND_WORKERS = int(os.getenv('SEND_WORKERS', 8))
+TELEGRAM_PARSE_MODE = os.getenv('TELEGRAM_PARSE_MODE') or None
+SEND_RETRIES = 5
+MAX_BACKOFF = 60
+SEPARATOR = '\n\n'
+
+
+def split_message(texts, limit=MAX_MESSAGE_LENGTH):
+    """Склеивает тексты в сообщения длиной не больше limit."""
+    messages = []
+    current = ''
+    for text in texts:
+        while len(text) > limit:
+            if current:
+                messages.append(current)
+                current = ''
+            messages.append(text[:limit])
+            text = text[limit:]
+        if not text:
+            continue
+        if not current:
+            current = text
+        elif len(current) + len(SEPARATOR) + len(text) <= limit:
+            current += SEPARATOR + text
+        else:
+            messages.append(current)
+            current = text
+    if current:
+        messages.append(current)
+    return messages
+
+
+class SendQueue:
+    """Очередь исходящих сообщений в телеграм.
+
+    Сообщения раскладываются по чатам; пока чат ждёт своей очереди,
+    новые сообщения для него склеиваются в одно. Отправку ведут
+    workers задач, каждая отправка ограничена ведром чата и общим
+    ведром бота. На RetryAfter все воркеры ждут указанное телеграмом
+    время, на сетевые ошибки — экспоненциально растущую паузу.
+    Если попытки кончились, сообщения возвращаются в очередь.
+    parse_mode — режим разметки, с которым уходят все сообщения;
+    тексты в очереди должны быть уже экранированы под него.
+    """
+
+    def __init__(self, bot, client, workers=SEND_WORKERS,
+                 global_rate=TELEGRAM_GLOBAL_RATE,
+                 chat_rate=TELEGRAM_CHAT_RATE, retries=SEND_RETRIES,
+                 clock=None, parse_mode=TELEGRAM_PARSE_MODE):
+        self.bot = bot
+        self.client = client
+        self.parse_mode = parse_mode
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.retries = retries
+        self.clock = clock or Clock()
+        self.global_bucket = TokenBucket(global_rate, clock=self.clock)
+        self._chat_buckets = {}
+        self._pending = {}
+        self._ready = None
+        self._workers = []
+        self._sending = set()
+        self._paused_until = 0
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._pending.values())
+
+    def chats(self):
+        """Чаты, сообщения которым ждут в очереди или отправляются."""
+        return set(self._pending) | self._sending
+
+    def put(self, chat_id, text, on_sent=None):
+        """Ставит сообщение в очередь.
+
+        on_sent вызывается без аргументов после успешной отправки.
+        """
+        entries = self._pending.get(chat_id)
+        if entries is None:
+            self._pending[chat_id] = [(text, on_sent)]
+            self._ready.put_nowait(chat_id)
+        else:
+            entries.append((text, on_sent))
+
+    async def start(self):
+        """Запускает воркеры отправки в текущем цикле событий."""
+        self._ready = asyncio.Queue()
+        self._workers = [
+            asyncio.ensure_future(self._work()) for _ in range(self.workers)
+        ]
+
+    async def join(self):
+        """Дожидается отправки всех сообщений из очереди."""
+        await self._ready.join()
+
+    async def close(self, timeout=None):
+        """Отправляет оставшиеся сообщения и останавливает воркеры.
+
+        Если за timeout секунд очередь не опустела, отправка
+        прерывается. Возвращает множество чатов, сообщения которым
+        могли не дойти.
+        """
+        if self._ready is None:
+            return set()
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f'Не отправлено сообщений: {len(self)}')
+        unsent = self.chats()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._ready = None
+        return unsent
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, capacity=1, clock=self.clock)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _work(self):
+        while True:
+            chat_id = await self._ready.get()
+            self._sending.add(chat_id)
+            try:
+                await self._send_chat(chat_id)
+            except Exception:
+                logger.error('Сбой в очереди отправки', exc_info=True)
+            finally:
+                self._sending.discard(chat_id)
+                self._ready.task_done()
+
+    async def _send_chat(self, chat_id):
+        await self._bucket(chat_id).acquire()
+        entries = self._pending.pop(chat_id)
+        callbacks = [on_sent for _, on_sent in entries if on_sent]
+        messages = split_message([text for text, _ in entries])
+        for index, message in enumerate(messages):
+            if index:
+                await self._bucket(chat_id).acquire()
+            delivered = await self._deliver(chat_id, message)
+            if delivered is None:
+                self._requeue(chat_id, messages[index:], callbacks)
+                return
+            if not delivered:
+                return
+        for on_sent in callbacks:
+            on_sent()
+
+    def _requeue(self, chat_id, messages, callbacks):
+        logger.error('Попытки отправки исчерпаны, сообщение в очереди')
+
+        def on_sent():
+            for callback in callbacks:
+                callback()
+
+        for message in messages[:-1]:
+            self.put(chat_id, message)
+        self.put(chat_id, messages[-1], on_sent)
+
+    def _send(self, chat_id, message):
+        """Блокирующая отправка; выполняется в пуле потоков клиента."""
+        if self.parse_mode is None:
+            return self.bot.send_message(chat_id, message)
+        return self.bot.send_message(chat_id, message,
+                                     parse_mode=self.parse_mode)
+
+    async def _deliver(self, chat_id, message):
+        """Отправляет одно сообщение.
+
+        Возвращает True при успехе, False при ошибке, после которой
+        повторять бессмысленно, и None, если кончились попытки.
+        """
+        attempt = 0
+        while attempt < self.retries:
+            pause = self._paused_until - self.clock.now()
+            if pause > 0:
+                await self.clock.sleep(pause)
+            await self.global_bucket.acquire()
+            try:
+                with SEND_LATENCY.time():
+                    await self.client.run_sync(self._send, chat_id, message)
+                logger.debug('Бот отправил сообщение.')
+                return True
+            except telegram.error.RetryAfter as error:
+                SEND_FAILURES.labels('RetryAfter').inc()
+                logger.warning(
+                    f'Телеграм просит подождать {error.retry_after} с'
+                )
+                self._paused_until = max(
+                    self._paused_until, self.clock.now() + error.retry_after
+                )
+            except telegram.error.BadRequest as error:
+                SEND_FAILURES.labels('BadRequest').inc()
+                logger.error(f'Не удалось отправить сообщение в ТГ: {error}')
+                return False
+            except telegram.error.NetworkError as error:
+                SEND_FAILURES.labels('NetworkError').inc()
+                attempt += 1
+                logger.warning(f'Сетевая ошибка при отправке в ТГ: {error}')
+                await self.clock.sleep(min(2 ** attempt, MAX_BACKOFF))
+            except telegram.error.TelegramError as error:
+                SEND_FAILURES.labels('TelegramError').inc()
+                logger.error(f'Не удалось отправить сообщение в ТГ: {error}')
+                return False
+        return None
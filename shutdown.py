@@ -0,0 +1,80 @@
+"""Корректная остановка бота по сигналу.
+
+Платформа перед перезапуском шлёт SIGTERM и через некоторое время
+убивает процесс. Получив сигнал, бот дорабатывает текущую итерацию:
+не обрывает отправку сообщения на середине и сохраняет курсор, а
+ожидание следующего опроса прерывается сразу.
+"""
+import logging
+import os
+import signal
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 25))
+SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+class ShutdownRequested(BaseException):
+    """Получен сигнал остановки во время ожидания.
+
+    Наследуется от BaseException, как KeyboardInterrupt, чтобы его
+    не перехватывали обработчики ошибок опроса.
+    """
+
+    pass
+
+
+class GracefulExit:
+    """Флаг остановки, который выставляют обработчики сигналов.
+
+    Сигнал, пришедший во время ожидания внутри sleeping(), прерывает
+    его исключением ShutdownRequested; в остальное время он лишь
+    выставляет requested, и цикл завершается, дойдя до ожидания.
+    """
+
+    def __init__(self):
+        self.requested = False
+        self._sleeping = False
+        self._previous = {}
+
+    def handle(self, signum, frame=None):
+        """Обработчик сигнала."""
+        if not self.requested:
+            logger.info(f'Получен сигнал {signal.Signals(signum).name}, '
+                        'завершаем работу.')
+        self.requested = True
+        if self._sleeping:
+            self._sleeping = False
+            raise ShutdownRequested(signum)
+
+    def install(self, signals=SIGNALS):
+        """Ставит обработчик на сигналы остановки."""
+        for signum in signals:
+            self._previous[signum] = signal.signal(signum, self.handle)
+
+    def restore(self):
+        """Возвращает обработчики, которые стояли до install."""
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+        self._previous.clear()
+
+    @contextmanager
+    def sleeping(self):
+        """Ожидание, которое сигнал остановки прерывает сразу."""
+        if self.requested:
+            raise ShutdownRequested()
+        self._sleeping = True
+        try:
+            yield
+        finally:
+            self._sleeping = False
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.restore()
+        return exc_info[0] is ShutdownRequested
@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+STATE_FILE = os.getenv('STATE_FILE')
+FLUSH_INTERVAL = 1.0
+FLUSH_SIZE = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cursors (
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (token, chat_id)
+);
+CREATE TABLE IF NOT EXISTS delivered (
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    homework_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (token, chat_id, homework_id, status)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    homework_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    text TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (token, chat_id, homework_id, status)
+);
+'''
+
+
+def homework_key(homework):
+    """Идентификатор домашней работы для дедупликации уведомлений."""
+    return str(homework.get('id', homework.get('homework_name')))
+
+
+class StateStore:
+    """Курсоры опроса, исходящие и доставленные статусы в SQLite.
+
+    База работает в режиме WAL с synchronous=NORMAL, а изменения
+    копятся в памяти и записываются одной транзакцией не чаще раза
+    в flush_interval секунд или по накоплении flush_size записей.
+    Ключ подписчика — пара (токен, chat_id).
+
+    Новые статусы сначала попадают в outbox: запись в outbox
+    фиксируется не позже курсора, сохранённого после неё, так что
+    сдвиг курсора не теряет неотправленных уведомлений. Отметка
+    mark_delivered удаляет статус из outbox в той же транзакции,
+    в которой он записывается в доставленные. Ключ идемпотентности —
+    четвёрка (токен, chat_id, работа, статус): один статус не попадёт
+    в outbox дважды и не будет доставлен повторно. Повторные отправки
+    из outbox учитываются в поле attempts: сообщения, исчерпавшие
+    попытки, остаются в таблице, но outbox() их больше не выдаёт.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL,
+                 flush_size=FLUSH_SIZE, clock=time.monotonic):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.clock = clock
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+        self._migrate()
+        self._cursors = {}
+        self._outbox = {}
+        self._delivered = set()
+        self._last_flush = self.clock()
+
+    @property
+    def pending(self):
+        """Количество изменений, ещё не записанных на диск."""
+        return (len(self._cursors) + len(self._outbox)
+                + len(self._delivered))
+
+    def load_cursor(self, key):
+        """Последний сохранённый курсор подписчика или None."""
+        if key in self._cursors:
+            return self._cursors[key]
+        row = self._connection.execute(
+            'SELECT timestamp FROM cursors WHERE token = ? AND chat_id = ?',
+            key
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_cursor(self, key, timestamp):
+        """Запоминает курсор подписчика."""
+        self._cursors[key] = timestamp
+        self.maybe_flush()
+
+    def is_delivered(self, key, homework_id, status):
+        """Отправлялся ли уже подписчику этот статус работы."""
+        record = (*key, str(homework_id), status)
+        if record in self._delivered:
+            return True
+        row = self._connection.execute(
+            'SELECT 1 FROM delivered WHERE token = ? AND chat_id = ? '
+            'AND homework_id = ? AND status = ?',
+            record
+        ).fetchone()
+        return row is not None
+
+    def mark_delivered(self, key, homework_id, status):
+        """Отмечает статус работы как доставленный подписчику."""
+        self._delivered.add((*key, str(homework_id), status))
+        self.maybe_flush()
+
+    def enqueue(self, key, homework_id, status, text):
+        """Кладёт в outbox сообщение о статусе работы.
+
+        Возвращает False, если этот статус уже доставлен подписчику
+        или уже ждёт отправки.
+        """
+        record = (*key, str(homework_id), status)
+        if (record in self._outbox
+                or self.is_delivered(key, homework_id, status)):
+            return False
+        row = self._connection.execute(
+            'SELECT 1 FROM outbox WHERE token = ? AND chat_id = ? '
+            'AND homework_id = ? AND status = ?',
+            record
+        ).fetchone()
+        if row is not None:
+            return False
+        self._outbox[record] = text
+        self.maybe_flush()
+        return True
+
+    def outbox(self, key=None, limit=None, max_attempts=None):
+        """Неотправленные сообщения в порядке постановки.
+
+        Возвращает список (ключ подписчика, работа, статус, текст),
+        только для подписчика key, если он задан, и только с числом
+        повторных отправок меньше max_attempts, если задано оно.
+        """
+        self.flush()
+        query = 'SELECT token, chat_id, homework_id, status, text FROM outbox'
+        conditions = []
+        params = []
+        if key is not None:
+            conditions.append('token = ? AND chat_id = ?')
+            params += key
+        if max_attempts is not None:
+            conditions.append('attempts < ?')
+            params.append(max_attempts)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id LIMIT ?'
+        params.append(-1 if limit is None else limit)
+        return [((token, chat_id), homework_id, status, text)
+                for token, chat_id, homework_id, status, text
+                in self._connection.execute(query, params)]
+
+    def record_attempts(self, messages):
+        """Учитывает повторную отправку сообщений из outbox.
+
+        messages — записи в формате outbox().
+        """
+        if not messages:
+            return
+        with self._transaction() as connection:
+            connection.executemany(
+                'UPDATE outbox SET attempts = attempts + 1 WHERE token = ? '
+                'AND chat_id = ? AND homework_id = ? AND status = ?',
+                [(*key, homework_id, status)
+                 for key, homework_id, status, _ in messages]
+            )
+
+    def dead_letters(self, max_attempts):
+        """Сколько сообщений в outbox исчерпали max_attempts попыток."""
+        self.flush()
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM outbox WHERE attempts >= ?',
+            (max_attempts,)
+        ).fetchone()[0]
+
+    def maybe_flush(self):
+        """Записывает изменения, если накопилось много или пора по времени."""
+        if (self.pending >= self.flush_size
+                or self.clock() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        self._last_flush = self.clock()
+        if not self.pending:
+            return
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT OR IGNORE INTO outbox (token, chat_id, homework_id, '
+                'status, text) VALUES (?, ?, ?, ?, ?)',
+                [(*record, text) for record, text in self._outbox.items()]
+            )
+            connection.executemany(
+                'INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)',
+                [(*key, ts) for key, ts in self._cursors.items()]
+            )
+            connection.executemany(
+                'INSERT OR IGNORE INTO delivered VALUES (?, ?, ?, ?)',
+                self._delivered
+            )
+            connection.executemany(
+                'DELETE FROM outbox WHERE token = ? AND chat_id = ? '
+                'AND homework_id = ? AND status = ?',
+                self._delivered
+            )
+        self._cursors.clear()
+        self._outbox.clear()
+        self._delivered.clear()
+
+    def close(self):
+        """Записывает изменения и закрывает базу."""
+        self.flush()
+        self._connection.close()
+
+    def _migrate(self):
+        """Добавляет столбцы, которых нет в базах прошлых версий."""
+        columns = {row[1] for row in self._connection.execute(
+            'PRAGMA table_info(outbox)'
+        )}
+        if 'attempts' not in columns:
+            self._connection.execute(
+                'ALTER TABLE outbox '
+                'ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0'
+            )
+
+    @contextmanager
+    def _transaction(self):
+        self._connection.execute('BEGIN')
+        try:
+            yield self._connection
+        except Exception:
+            self._connection.execute('ROLLBACK')
+            raise
+        self._connection.execute('COMMIT')
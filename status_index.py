@@ -0,0 +1,104 @@
+import os
+from array import array
+
+STATUS_INDEX_SIZE = int(os.getenv('STATUS_INDEX_SIZE', 1_000_000))
+NO_SLOT = -1
+
+
+class StatusIndex:
+    """Последний известный статус каждой домашней работы.
+
+    Ёмкость ограничена maxsize записей, при переполнении вытесняется
+    работа, которая дольше всех не обновлялась (LRU). Статусы хранятся
+    однобайтовыми кодами, а порядок LRU — двусвязным списком на
+    плоских массивах, без отдельного объекта на каждую запись;
+    массивы не растут больше maxsize элементов.
+    """
+
+    def __init__(self, maxsize=STATUS_INDEX_SIZE):
+        self.maxsize = maxsize
+        self._slots = {}
+        self._keys = []
+        self._codes = array('B')
+        self._prev = array('l')
+        self._next = array('l')
+        self._head = NO_SLOT
+        self._tail = NO_SLOT
+        self._status_codes = {}
+        self._statuses = []
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def get(self, key):
+        """Последний статус работы или None, если работа не встречалась."""
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        self._move_to_front(slot)
+        return self._statuses[self._codes[slot]]
+
+    def is_unchanged(self, key, status):
+        """Совпадает ли статус с последним сохранённым."""
+        return self.get(key) == status
+
+    def set(self, key, status):
+        """Сохраняет статус работы."""
+        code = self._code(status)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate()
+            self._slots[key] = slot
+            self._keys[slot] = key
+            self._link_front(slot)
+        else:
+            self._move_to_front(slot)
+        self._codes[slot] = code
+
+    def _code(self, status):
+        code = self._status_codes.get(status)
+        if code is None:
+            code = len(self._statuses)
+            self._status_codes[status] = code
+            self._statuses.append(status)
+        return code
+
+    def _allocate(self):
+        if len(self._keys) < self.maxsize:
+            self._keys.append(None)
+            self._codes.append(0)
+            self._prev.append(NO_SLOT)
+            self._next.append(NO_SLOT)
+            return len(self._keys) - 1
+        slot = self._tail
+        self._unlink(slot)
+        del self._slots[self._keys[slot]]
+        return slot
+
+    def _link_front(self, slot):
+        self._prev[slot] = NO_SLOT
+        self._next[slot] = self._head
+        if self._head != NO_SLOT:
+            self._prev[self._head] = slot
+        self._head = slot
+        if self._tail == NO_SLOT:
+            self._tail = slot
+
+    def _unlink(self, slot):
+        prev, following = self._prev[slot], self._next[slot]
+        if prev != NO_SLOT:
+            self._next[prev] = following
+        else:
+            self._head = following
+        if following != NO_SLOT:
+            self._prev[following] = prev
+        else:
+            self._tail = prev
+
+    def _move_to_front(self, slot):
+        if slot != self._head:
+            self._unlink(slot)
+            self._link_front(slot)
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import time
+
+INITIAL_INTERVAL = 7 * 24 * 60 * 60  # с какой давности начинать (неделя)
+
+
+class Subscriber:
+    """Подписчик: токен Практикума, чат в телеграме и курсор опроса.
+
+    locale — язык уведомлений; None означает язык по умолчанию.
+    """
+
+    __slots__ = ('token', 'chat_id', 'timestamp', 'locale')
+
+    def __init__(self, token, chat_id, timestamp=None, locale=None):
+        self.token = token
+        self.chat_id = str(chat_id)
+        self.locale = locale
+        if timestamp is None:
+            timestamp = int(time.time()) - INITIAL_INTERVAL
+        self.timestamp = timestamp
+
+    @property
+    def key(self):
+        """Уникальный ключ подписчика."""
+        return (self.token, self.chat_id)
+
+    @property
+    def headers(self):
+        """Заголовки запроса к API от имени подписчика."""
+        return {'Authorization': f'OAuth {self.token}'}
+
+    def __repr__(self):
+        return f'<Subscriber chat_id={self.chat_id}>'
+
+
+def feed_id(token):
+    """Идентификатор ленты токена для адресов вебхуков.
+
+    Это хеш токена: источник вычисляет его сам, а токен в адресе
+    не передаётся.
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class Feed:
+    """Все подписчики одного токена.
+
+    API опрашивается один раз на токен, и ответ рассылается в чаты
+    всех подписчиков. Курсор ленты — самый ранний из их курсоров,
+    чтобы ни один чат не пропустил изменений.
+    """
+
+    __slots__ = ('token', 'id', 'subscribers')
+
+    def __init__(self, token):
+        self.token = token
+        self.id = feed_id(token)
+        self.subscribers = {}
+
+    @property
+    def key(self):
+        """Уникальный ключ ленты."""
+        return self.token
+
+    @property
+    def headers(self):
+        """Заголовки запроса к API для токена ленты."""
+        return {'Authorization': f'OAuth {self.token}'}
+
+    @property
+    def timestamp(self):
+        """Момент, с которого запрашивать изменения."""
+        return min(subscriber.timestamp
+                   for subscriber in self.subscribers.values())
+
+    def __iter__(self):
+        return iter(list(self.subscribers.values()))
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def __repr__(self):
+        return f'<Feed chats={len(self)}>'
+
+
+class SubscriberRegistry:
+    """Реестр подписчиков, которых обслуживает один процесс."""
+
+    def __init__(self, subscribers=()):
+        self._subscribers = {}
+        self._feeds = {}
+        self._feed_ids = {}
+        for subscriber in subscribers:
+            self._insert(subscriber)
+
+    def _insert(self, subscriber):
+        self._subscribers[subscriber.key] = subscriber
+        feed = self._feeds.get(subscriber.token)
+        if feed is None:
+            feed = self._feeds[subscriber.token] = Feed(subscriber.token)
+            self._feed_ids[feed.id] = feed
+        feed.subscribers[subscriber.chat_id] = subscriber
+
+    def add(self, token, chat_id, timestamp=None, locale=None):
+        """Добавляет подписчика, повторное добавление не дублирует его."""
+        subscriber = self._subscribers.get((token, str(chat_id)))
+        if subscriber is None:
+            subscriber = Subscriber(token, chat_id, timestamp, locale)
+            self._insert(subscriber)
+        return subscriber
+
+    def remove(self, token, chat_id):
+        """Удаляет подписчика из реестра."""
+        subscriber = self._subscribers.pop((token, str(chat_id)), None)
+        if subscriber is not None:
+            feed = self._feeds[token]
+            del feed.subscribers[subscriber.chat_id]
+            if not feed.subscribers:
+                del self._feeds[token]
+                del self._feed_ids[feed.id]
+        return subscriber
+
+    def get(self, token, chat_id):
+        """Возвращает подписчика или None."""
+        return self._subscribers.get((token, str(chat_id)))
+
+    def feed(self, token):
+        """Лента подписчиков токена или None."""
+        return self._feeds.get(token)
+
+    def find_feed(self, feed_id):
+        """Лента с данным идентификатором или None."""
+        return self._feed_ids.get(feed_id)
+
+    def feeds(self):
+        """Ленты всех токенов реестра."""
+        return list(self._feeds.values())
+
+    def __iter__(self):
+        return iter(list(self._subscribers.values()))
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    @classmethod
+    def from_file(cls, path):
+        """Загружает реестр из JSON-файла.
+
+        Файл содержит список объектов с ключами "token", "chat_id"
+        и необязательным "locale".
+        """
+        with open(path, encoding='utf-8') as file:
+            records = json.load(file)
+        registry = cls()
+        for record in records:
+            registry.add(record['token'], record['chat_id'],
+                         locale=record.get('locale'))
+        return registry
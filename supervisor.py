@@ -0,0 +1,322 @@
+"""Опрос подписчиков несколькими процессами.
+
+Один процесс упирается в одно ядро: разбор JSON, проверка схемы
+и подготовка сообщений выполняются в нём последовательно. Супервизор
+запускает WORKERS процессов с PollingEngine и делит между ними
+подписчиков по согласованному хешированию токена: все подписчики
+одного токена попадают в один процесс, а при добавлении или выходе
+процесса переезжает лишь его доля подписчиков.
+
+Если процесс упал, его подписчиков сразу забирают соседи по кольцу,
+а через WORKER_RESTART_DELAY секунд запускается замена с тем же
+номером и забирает их обратно. Метрики процессов сводятся в одну
+страницу /metrics супервизора.
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from bisect import bisect, insort
+from multiprocessing.connection import wait
+
+import engine
+import metrics
+from logs import LOG_FILE, setup_logging
+from shutdown import SHUTDOWN_TIMEOUT, SIGNALS
+from state import STATE_FILE
+from subscribers import SubscriberRegistry
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv('WORKERS') or os.cpu_count() or 1)
+RING_REPLICAS = 128
+WORKER_RESTART_DELAY = float(os.getenv('WORKER_RESTART_DELAY', 5))
+WORKER_METRICS_INTERVAL = float(os.getenv('WORKER_METRICS_INTERVAL', 15))
+
+
+def _hash(value):
+    digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HashRing:
+    """Кольцо согласованного хеширования.
+
+    Каждый узел занимает replicas точек на кольце; ключ принадлежит
+    узлу первой точки по часовой стрелке от хеша ключа. Добавление
+    или удаление узла меняет владельца лишь у ключей его точек.
+    """
+
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self._points = []
+        self._owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(set(self._owners.values()))
+
+    def add(self, node):
+        """Добавляет узел на кольцо."""
+        for replica in range(self.replicas):
+            point = _hash(f'{node}#{replica}')
+            if point not in self._owners:
+                insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node):
+        """Убирает узел с кольца."""
+        for replica in range(self.replicas):
+            point = _hash(f'{node}#{replica}')
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                self._points.remove(point)
+
+    def node_for(self, key):
+        """Узел, которому принадлежит ключ."""
+        if not self._points:
+            raise LookupError('на кольце нет узлов')
+        index = bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+
+def _describe(subscriber):
+    """Подписчик в виде, пригодном для передачи в другой процесс."""
+    return (subscriber.token, subscriber.chat_id, subscriber.locale)
+
+
+async def _serve(poller, node, connection):
+    """Цикл процесса: опрос, команды супервизора и отправка метрик."""
+    loop = asyncio.get_running_loop()
+
+    def on_command():
+        try:
+            command, subscribers = connection.recv()
+        except EOFError:
+            loop.remove_reader(connection.fileno())
+            poller.stop()
+            return
+        for token, chat_id, locale in subscribers:
+            if command == 'add':
+                poller.add(token, chat_id, locale)
+            else:
+                poller.remove(token, chat_id)
+        logger.info(f'Процесс {node}: {command} {len(subscribers)}, '
+                    f'подписчиков {len(poller.registry)}')
+
+    async def report_metrics():
+        while True:
+            connection.send(('metrics', metrics.REGISTRY.render()))
+            await asyncio.sleep(WORKER_METRICS_INTERVAL)
+
+    loop.add_reader(connection.fileno(), on_command)
+    reporter = asyncio.ensure_future(report_metrics())
+    try:
+        await poller.run(signals=SIGNALS, wait_idle=True)
+    finally:
+        reporter.cancel()
+        loop.remove_reader(connection.fileno())
+
+
+def run_worker(node, subscribers, connection):
+    """Точка входа рабочего процесса с долей подписчиков."""
+    setup_logging(f'{LOG_FILE}.{node}' if LOG_FILE else None)
+    registry = SubscriberRegistry()
+    for token, chat_id, locale in subscribers:
+        registry.add(token, chat_id, locale=locale)
+    poller = engine.build_poller(registry)
+    poller.export_metrics()
+    asyncio.run(_serve(poller, node, connection))
+
+
+class Worker:
+    """Рабочий процесс и канал команд к нему."""
+
+    __slots__ = ('node', 'process', 'connection')
+
+    def __init__(self, node, process, connection):
+        self.node = node
+        self.process = process
+        self.connection = connection
+
+
+class Supervisor:
+    """Запускает рабочие процессы и делит между ними подписчиков.
+
+    target(node, subscribers, connection) — точка входа процесса:
+    subscribers — список (токен, chat_id, язык), по connection
+    приходят команды ('add' | 'remove', subscribers) и уходят
+    сообщения ('metrics', текст).
+    """
+
+    def __init__(self, registry, workers=WORKERS, target=run_worker,
+                 context=None, restart_delay=WORKER_RESTART_DELAY):
+        self.registry = registry
+        self.nodes = list(range(workers))
+        self.ring = HashRing(self.nodes)
+        self.target = target
+        self.context = context or multiprocessing.get_context('spawn')
+        self.restart_delay = restart_delay
+        self.workers = {}
+        self.snapshots = {}
+        self.restarts = {}
+        self.stopping = False
+
+    def shard(self, node):
+        """Подписчики, которые по кольцу принадлежат узлу."""
+        return [_describe(subscriber) for subscriber in self.registry
+                if self.ring.node_for(subscriber.token) == node]
+
+    def owners(self):
+        """Текущий узел-владелец каждого подписчика."""
+        return {subscriber.key: self.ring.node_for(subscriber.token)
+                for subscriber in self.registry}
+
+    def start(self, node):
+        """Запускает процесс для узла с его долей подписчиков."""
+        parent, child = self.context.Pipe()
+        process = self.context.Process(
+            target=self.target, args=(node, self.shard(node), child),
+            name=f'worker-{node}', daemon=True
+        )
+        process.start()
+        child.close()
+        self.workers[node] = Worker(node, process, parent)
+        logger.info(f'Запущен процесс {node}, pid {process.pid}')
+
+    def send(self, node, command, subscribers):
+        """Передаёт процессу команду для группы подписчиков."""
+        worker = self.workers.get(node)
+        if worker is None or not subscribers:
+            return
+        try:
+            worker.connection.send((command, subscribers))
+        except (BrokenPipeError, EOFError, OSError):
+            logger.warning(f'Процесс {node} недоступен для команды {command}')
+
+    def rebalance(self, before, started=None):
+        """Рассылает процессам подписчиков, сменивших владельца.
+
+        before — владельцы до изменения кольца; процессу started
+        подписчики уже переданы при запуске. Возвращает число
+        переехавших подписчиков.
+        """
+        after = self.owners()
+        removed, added = {}, {}
+        for subscriber in self.registry:
+            old, new = before.get(subscriber.key), after[subscriber.key]
+            if old != new:
+                removed.setdefault(old, []).append(_describe(subscriber))
+                added.setdefault(new, []).append(_describe(subscriber))
+        for node, subscribers in removed.items():
+            self.send(node, 'remove', subscribers)
+        for node, subscribers in added.items():
+            if node != started:
+                self.send(node, 'add', subscribers)
+        return sum(len(subscribers) for subscribers in added.values())
+
+    def on_exit(self, node):
+        """Процесс завершился: отдаёт его подписчиков соседям."""
+        worker = self.workers.pop(node)
+        worker.connection.close()
+        self.snapshots.pop(node, None)
+        if self.stopping:
+            return
+        logger.error(f'Процесс {node} завершился с кодом '
+                     f'{worker.process.exitcode}')
+        before = self.owners()
+        self.ring.remove(node)
+        if len(self.ring):
+            moved = self.rebalance(before)
+            logger.info(f'Подписчиков передано соседям: {moved}')
+        self.restarts[node] = time.monotonic() + self.restart_delay
+
+    def restart_due(self):
+        """Возвращает на кольцо узлы, которым пора перезапуститься."""
+        now = time.monotonic()
+        for node, due in list(self.restarts.items()):
+            if due > now:
+                continue
+            del self.restarts[node]
+            before = self.owners()
+            self.ring.add(node)
+            self.start(node)
+            self.rebalance(before, started=node)
+
+    def render(self):
+        """Сводные метрики всех процессов."""
+        return metrics.merge(dict(self.snapshots))
+
+    def stop(self, signum=None, frame=None):
+        """Останавливает процессы; они дорабатывают начатое."""
+        if not self.stopping:
+            logger.info('Остановка рабочих процессов.')
+        self.stopping = True
+        self.restarts.clear()
+        for worker in self.workers.values():
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def _receive(self, worker):
+        try:
+            message = worker.connection.recv()
+        except (EOFError, OSError):
+            return
+        kind, payload = message
+        if kind == 'metrics':
+            self.snapshots[worker.node] = payload
+
+    def run(self, until=None):
+        """Запускает процессы и следит за ними до остановки."""
+        for node in self.nodes:
+            self.start(node)
+        deadline = None
+        while self.workers or self.restarts:
+            if until is not None and time.monotonic() >= until:
+                self.stop()
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + SHUTDOWN_TIMEOUT + 5
+            if deadline is not None and time.monotonic() >= deadline:
+                for worker in self.workers.values():
+                    worker.process.kill()
+            sources = {}
+            for worker in self.workers.values():
+                sources[worker.process.sentinel] = worker
+                sources[worker.connection] = worker
+            for ready in wait(list(sources), timeout=1):
+                worker = sources[ready]
+                if worker.node not in self.workers:
+                    continue
+                if ready is worker.connection:
+                    self._receive(worker)
+                else:
+                    worker.process.join()
+                    self.on_exit(worker.node)
+            self.restart_due()
+
+
+def main():
+    """Запуск бота в WORKERS процессах."""
+    setup_logging()
+    engine.check_token()
+    registry = engine.load_registry()
+    if not STATE_FILE:
+        logger.warning('STATE_FILE не задан: после переезда подписчика '
+                       'в другой процесс статусы могут прийти повторно')
+    supervisor = Supervisor(registry)
+    logger.info(f'Подписчиков: {len(registry)}, процессов: {WORKERS}')
+    for signum in SIGNALS:
+        signal.signal(signum, supervisor.stop)
+    if metrics.METRICS_PORT:
+        metrics.start_http_server(registry=supervisor)
+        logger.info(f'Метрики доступны на порту {metrics.METRICS_PORT}')
+    supervisor.run()
+    logger.info('Бот остановлен.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Шаблоны уведомлений о смене статуса работы.
+
+Шаблоны всех языков и режимов разметки компилируются один раз:
+текст вокруг названия работы заранее подставляется и экранируется,
+и на каждое сообщение остаётся экранировать название и склеить три
+строки. Экранированные названия работ берутся из кэша.
+"""
+import html
+import os
+import re
+from functools import lru_cache
+
+DEFAULT_LOCALE = os.getenv('BOT_LOCALE', 'ru')
+TEMPLATE_CACHE_SIZE = int(os.getenv('TEMPLATE_CACHE_SIZE', 10_000))
+PARSE_MODES = (None, 'HTML', 'MarkdownV2')
+NAME_FIELD = '{homework_name}'
+
+MARKDOWN_SPECIAL = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+
+
+def escape(text, parse_mode=None):
+    """Экранирует текст для режима разметки телеграма."""
+    if parse_mode == 'HTML':
+        return html.escape(text, quote=False)
+    if parse_mode == 'MarkdownV2':
+        return MARKDOWN_SPECIAL.sub(r'\\\1', text)
+    if parse_mode is not None:
+        raise ValueError(f'неизвестный режим разметки: {parse_mode}')
+    return text
+
+
+class MessageTemplates:
+    """Скомпилированные шаблоны сообщений для всех языков.
+
+    catalogs — словарь «язык → (шаблон, вердикты по статусам)»;
+    шаблон содержит поля {homework_name} и {verdict}. Для языка без
+    перевода используется default_locale, и он должен быть
+    в catalogs.
+    """
+
+    def __init__(self, catalogs, default_locale=DEFAULT_LOCALE,
+                 cache_size=TEMPLATE_CACHE_SIZE):
+        if default_locale not in catalogs:
+            raise ValueError(f'нет шаблонов для языка по умолчанию: '
+                             f'{default_locale}')
+        self.default_locale = default_locale
+        self.locales = frozenset(catalogs)
+        self._compiled = {}
+        for locale, (template, verdicts) in catalogs.items():
+            for status, verdict in verdicts.items():
+                for parse_mode in PARSE_MODES:
+                    parts = self._compile(template, verdict, parse_mode)
+                    self._compiled[(locale, status, parse_mode)] = parts
+                    if locale == default_locale:
+                        self._compiled[(None, status, parse_mode)] = parts
+        self.escape_name = lru_cache(maxsize=cache_size)(escape)
+
+    @staticmethod
+    def _compile(template, verdict, parse_mode):
+        """Текст до и после названия работы с подставленным вердиктом."""
+        prefix, field, suffix = template.partition(NAME_FIELD)
+        if not field:
+            raise ValueError(f'в шаблоне нет поля {NAME_FIELD}: {template}')
+        return (escape(prefix.format(verdict=verdict), parse_mode),
+                escape(suffix.format(verdict=verdict), parse_mode))
+
+    def __contains__(self, status):
+        return (self.default_locale, status, None) in self._compiled
+
+    def render(self, status, homework_name, locale=None, parse_mode=None):
+        """Сообщение о статусе работы.
+
+        Без перевода на locale сообщение строится на языке
+        по умолчанию, неизвестный статус — KeyError.
+        """
+        parts = self._compiled.get((locale, status, parse_mode))
+        if parts is None:
+            parts = self._compiled[(self.default_locale, status, parse_mode)]
+        if parse_mode is not None:
+            homework_name = self.escape_name(homework_name, parse_mode)
+        return parts[0] + homework_name + parts[1]
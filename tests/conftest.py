@@ -19,7 +19,8 @@ if (
     )
 
 pytest_plugins = [
-    'tests.fixtures.fixture_data'
+    'tests.fixtures.fixture_data',
+    'tests.fixtures.fake_api'
 ]
 
 os.environ['PRACTICUM_TOKEN'] = 'sometoken'
@@ -0,0 +1,15 @@
+import pytest
+
+from fake_practicum import FakeConfig, FakePracticum
+
+
+@pytest.fixture
+def fake_practicum(monkeypatch, homework_module):
+    """Локальный API Практикума в отдельном потоке.
+
+    homework.ENDPOINT на время теста указывает на него.
+    """
+    server = FakePracticum(FakeConfig(seed=1))
+    with server.in_thread():
+        monkeypatch.setattr(homework_module, 'ENDPOINT', server.url)
+        yield server
@@ -0,0 +1,57 @@
+from alerts import ErrorThrottle, fingerprint
+from exceptions import APIrequestError
+from scheduler import FakeClock
+
+
+def api_error(status):
+    return APIrequestError(
+        f'Ошибка при запросе к API, статус ответа: {status}'
+    )
+
+
+class TestFingerprint:
+
+    def test_equal_errors_share_fingerprint(self):
+        assert fingerprint(api_error(500)) == fingerprint(api_error(500))
+        assert (fingerprint(TimeoutError('timeout after 5.01 s'))
+                == fingerprint(TimeoutError('timeout after 30.2 s')))
+
+    def test_status_code_and_class_are_kept(self):
+        assert fingerprint(api_error(500)) != fingerprint(api_error(401))
+        assert fingerprint(ValueError('x')) != fingerprint(TypeError('x'))
+
+
+class TestErrorThrottle:
+
+    def test_repeats_are_suppressed_and_summarized(self):
+        clock = FakeClock()
+        alerts = ErrorThrottle(window=3600, clock=clock.now)
+        assert alerts.report(api_error(500))
+        for _ in range(36):
+            clock.advance(60)
+            assert not alerts.report(api_error(500))
+        messages = alerts.pop_messages()
+        assert len(messages) == 1
+        assert 'статус ответа: 500' in messages[0][1]
+        assert alerts.pop_messages() == []
+
+        clock.advance(3600 - clock.now())
+        summary = alerts.pop_messages()
+        assert len(summary) == 1
+        assert '37 раз' in summary[0][1]
+        assert '60 мин' in summary[0][1]
+
+    def test_single_error_has_no_summary(self):
+        clock = FakeClock()
+        alerts = ErrorThrottle(window=60, clock=clock.now)
+        alerts.report(api_error(500))
+        alerts.pop_messages()
+        clock.advance(61)
+        assert alerts.pop_messages() == []
+        assert alerts.report(api_error(500)), 'окно закрылось'
+
+    def test_scopes_are_independent(self):
+        alerts = ErrorThrottle(clock=FakeClock().now)
+        assert alerts.report(api_error(500), scope='1')
+        assert alerts.report(api_error(500), scope='2')
+        assert [scope for scope, _ in alerts.pop_messages()] == ['1', '2']
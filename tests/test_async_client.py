@@ -0,0 +1,295 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+import async_client
+import homework
+from async_client import AsyncClient
+from response_cache import NOT_MODIFIED
+
+
+async def serve(handler):
+    app = web.Application()
+    app.router.add_get('/api/user_api/homework_statuses/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, (f'http://127.0.0.1:{port}'
+                    '/api/user_api/homework_statuses/')
+
+
+def run_against(monkeypatch, handler, timestamp=100):
+    async def scenario():
+        runner, endpoint = await serve(handler)
+        monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+        try:
+            async with AsyncClient(api_concurrency=2) as client:
+                return await client.get_api_answer(timestamp)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(scenario())
+
+
+class TestAsyncClient:
+
+    def test_get_api_answer(self, monkeypatch):
+        async def handler(request):
+            assert request.query['from_date'] == '100'
+            assert request.headers['Authorization'].startswith('OAuth ')
+            return web.json_response({'homeworks': [], 'current_date': 5})
+
+        answer = run_against(monkeypatch, handler)
+        assert answer == {'homeworks': [], 'current_date': 5}
+
+    def test_not_200_status(self, monkeypatch):
+        async def handler(request):
+            return web.json_response({}, status=500)
+
+        with pytest.raises(homework.APIrequestError):
+            run_against(monkeypatch, handler)
+
+    def test_not_json(self, monkeypatch):
+        async def handler(request):
+            return web.Response(text='<html>')
+
+        with pytest.raises(homework.APIrequestError):
+            run_against(monkeypatch, handler)
+
+    def test_connections_are_reused(self, monkeypatch):
+        async def handler(request):
+            return web.json_response({'homeworks': [], 'current_date': 5})
+
+        async def scenario():
+            runner, endpoint = await serve(handler)
+            monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+            try:
+                async with AsyncClient() as client:
+                    for _ in range(3):
+                        await client.get_api_answer(100)
+                    return client.stats
+            finally:
+                await runner.cleanup()
+
+        stats = asyncio.run(scenario())
+        assert stats.requests == 3
+        assert stats.new_connections == 1
+        assert stats.reused_connections == 2
+        assert stats.last_time is not None
+
+    def test_repeated_answer_is_not_parsed(self, monkeypatch):
+        current_date = iter(range(10))
+
+        async def handler(request):
+            return web.json_response(
+                {'homeworks': [], 'current_date': next(current_date)}
+            )
+
+        async def scenario():
+            runner, endpoint = await serve(handler)
+            monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+            try:
+                async with AsyncClient() as client:
+                    first = await client.get_api_answer(100)
+                    second = await client.get_api_answer(100)
+                    client.invalidate()
+                    third = await client.get_api_answer(100)
+                    return first, second, third
+            finally:
+                await runner.cleanup()
+
+        first, second, third = asyncio.run(scenario())
+        assert first == {'homeworks': [], 'current_date': 0}
+        assert second is NOT_MODIFIED
+        assert third == {'homeworks': [], 'current_date': 2}
+
+    def test_etag_is_revalidated(self, fake_practicum):
+        fake_practicum.config.etag = True
+        headers = {'Authorization': 'OAuth etag'}
+
+        async def scenario():
+            async with AsyncClient() as client:
+                first = await client.get_api_answer(0, headers)
+                second = await client.get_api_answer(0, headers)
+                return first, second
+
+        first, second = asyncio.run(scenario())
+        assert first['homeworks'] == []
+        assert second is NOT_MODIFIED
+        assert fake_practicum.requests == 2
+
+    def test_large_answer_is_streamed(self, monkeypatch):
+        homeworks = [{'id': number, 'homework_name': f'hw{number}',
+                      'status': 'approved'} for number in range(100)]
+
+        async def handler(request):
+            return web.json_response(
+                {'homeworks': homeworks, 'current_date': 5}
+            )
+
+        async def scenario():
+            runner, endpoint = await serve(handler)
+            monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+            monkeypatch.setattr(async_client, 'STREAM_THRESHOLD', 100)
+            monkeypatch.setattr(async_client, 'STREAM_CHUNK_SIZE', 64)
+            streamed = []
+            try:
+                async with AsyncClient() as client:
+                    answer = await client.get_api_answer(
+                        100, on_homework=streamed.append
+                    )
+                    return answer, streamed
+            finally:
+                await runner.cleanup()
+
+        answer, streamed = asyncio.run(scenario())
+        assert answer.as_dict() == {'homeworks': [], 'current_date': 5}
+        assert [hw.as_dict() for hw in streamed] == homeworks
+
+    def test_concurrent_requests_are_joined(self, monkeypatch):
+        homeworks = [{'id': number, 'homework_name': f'hw{number}',
+                      'status': 'approved'} for number in range(20)]
+        requests = []
+
+        async def handler(request):
+            requests.append(request.query['from_date'])
+            await asyncio.sleep(0.05)
+            return web.json_response(
+                {'homeworks': homeworks, 'current_date': 5}
+            )
+
+        async def scenario():
+            runner, endpoint = await serve(handler)
+            monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+            monkeypatch.setattr(async_client, 'STREAM_THRESHOLD', 100)
+            streamed = [], []
+            try:
+                async with AsyncClient() as client:
+                    return await asyncio.gather(
+                        client.get_api_answer(
+                            100, on_homework=streamed[0].append),
+                        client.get_api_answer(
+                            100, on_homework=streamed[1].append),
+                        client.get_api_answer(100),
+                        client.get_api_answer(200),
+                    ), streamed
+            finally:
+                await runner.cleanup()
+
+        answers, streamed = asyncio.run(scenario())
+        assert sorted(requests) == ['100', '200']
+        assert answers[0] == answers[1]
+        assert answers[0].as_dict() == {'homeworks': [], 'current_date': 5}
+        assert [hw.as_dict() for hw in answers[2]['homeworks']] == homeworks
+        for chat in streamed:
+            assert [hw.as_dict() for hw in chat] == homeworks
+
+    def test_late_join_to_stream_makes_own_request(self, monkeypatch):
+        homeworks = [{'id': number, 'homework_name': f'hw{number}',
+                      'status': 'approved'} for number in range(20)]
+        body = json.dumps({'homeworks': homeworks, 'current_date': 5})
+        middle = len(body) // 2
+        requests = []
+
+        async def handler(request):
+            requests.append(request.query['from_date'])
+            response = web.StreamResponse()
+            await response.prepare(request)
+            await response.write(body[:middle].encode())
+            await asyncio.sleep(0.1)
+            await response.write(body[middle:].encode())
+            await response.write_eof()
+            return response
+
+        async def scenario():
+            runner, endpoint = await serve(handler)
+            monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+            monkeypatch.setattr(async_client, 'STREAM_THRESHOLD', 100)
+            monkeypatch.setattr(async_client, 'STREAM_CHUNK_SIZE', 64)
+            streamed = [], []
+            started = asyncio.Event()
+
+            def first(hw):
+                streamed[0].append(hw)
+                started.set()
+
+            try:
+                async with AsyncClient() as client:
+                    leader = asyncio.ensure_future(
+                        client.get_api_answer(100, on_homework=first)
+                    )
+                    await started.wait()
+                    flight = next(iter(client._flights.values()))
+                    assert flight.buffer is None, (
+                        'без присоединившихся работы не копятся'
+                    )
+                    late = await client.get_api_answer(
+                        100, on_homework=streamed[1].append
+                    )
+                    return [await leader, late], streamed
+            finally:
+                await runner.cleanup()
+
+        answers, streamed = asyncio.run(scenario())
+        assert requests == ['100', '100']
+        assert answers[0] == answers[1]
+        assert answers[0].as_dict() == {'homeworks': [], 'current_date': 5}
+        for chat in streamed:
+            assert [hw.as_dict() for hw in chat] == homeworks
+
+    def test_joined_request_gets_the_error(self, monkeypatch):
+        async def handler(request):
+            await asyncio.sleep(0.05)
+            return web.json_response({}, status=500)
+
+        async def scenario():
+            runner, endpoint = await serve(handler)
+            monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+            try:
+                async with AsyncClient() as client:
+                    results = await asyncio.gather(
+                        client.get_api_answer(100),
+                        client.get_api_answer(100),
+                        return_exceptions=True
+                    )
+                    return results, client.stats.requests
+            finally:
+                await runner.cleanup()
+
+        results, requests = asyncio.run(scenario())
+        assert requests == 1
+        assert all(isinstance(result, homework.APIrequestError)
+                   for result in results)
+
+    def test_sync_request_has_timeouts(self, monkeypatch):
+        calls = []
+
+        def get(url, **kwargs):
+            calls.append(kwargs)
+            raise homework.requests.Timeout()
+
+        monkeypatch.setattr(homework.requests, 'get', get)
+        with pytest.raises(homework.APIrequestError):
+            homework.get_api_answer(100)
+        assert calls[0]['timeout'] == (async_client.HTTP_CONNECT_TIMEOUT,
+                                       async_client.HTTP_READ_TIMEOUT)
+
+    def test_send_message_runs_in_executor(self):
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                sent.append((chat_id, text))
+
+        async def scenario():
+            async with AsyncClient(send_concurrency=2) as client:
+                await asyncio.gather(*(
+                    client.send_message(Bot(), chat_id, 'hi')
+                    for chat_id in range(5)
+                ))
+
+        asyncio.run(scenario())
+        assert sorted(sent) == [(i, 'hi') for i in range(5)]
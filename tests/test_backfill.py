@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+import engine
+import homework
+from async_client import AsyncClient
+from backfill import Backfill, merge, parse_date, windows
+from fake_practicum import FakeConfig, FakePracticum, isoformat
+from response_cache import NOT_MODIFIED
+from scheduler import FakeClock
+from schema import Answer
+from subscribers import SubscriberRegistry
+from test_engine import FakeBot, FakeClient
+
+DAY = 24 * 60 * 60
+START = 1_000_000
+
+
+def answer(*homeworks, current_date=0):
+    return Answer.decode({
+        'homeworks': [
+            {'id': hw_id, 'homework_name': f'hw{hw_id}', 'status': status,
+             'date_updated': isoformat(updated)}
+            for hw_id, status, updated in homeworks
+        ],
+        'current_date': current_date,
+    })
+
+
+class WindowClient(FakeClient):
+    """Клиент, отвечающий на окна и считающий параллельные запросы."""
+
+    def __init__(self, error_window=None):
+        super().__init__()
+        self.error_window = error_window
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_api_answer(self, timestamp, headers=None,
+                             on_homework=None, to_date=None):
+        self.requested.append((timestamp, to_date))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if timestamp == self.error_window:
+            raise homework.APIrequestError('boom', 500)
+        return {
+            'homeworks': [{'id': timestamp, 'homework_name': 'hw',
+                           'status': 'approved',
+                           'date_updated': isoformat(timestamp + 1)}],
+            'current_date': timestamp,
+        }
+
+
+class TestWindows:
+
+    def test_gap_is_split(self):
+        assert windows(0, 250, 100) == [(0, 100), (100, 200), (200, None)]
+        assert windows(0, 50, 100) == [(0, None)]
+
+    def test_parse_date(self):
+        assert parse_date(isoformat(START)) == START
+        assert parse_date(None) is None
+        assert parse_date('вчера') is None
+
+
+class TestMerge:
+
+    def test_duplicates_are_dropped_and_order_is_chronological(self):
+        merged = merge([
+            answer((1, 'reviewing', 300), (2, 'approved', 100),
+                   current_date=400),
+            answer((1, 'reviewing', 300), (1, 'approved', 500),
+                   current_date=600),
+        ])
+        assert [(hw['id'], hw['status']) for hw in merged['homeworks']] == [
+            (2, 'approved'), (1, 'reviewing'), (1, 'approved')
+        ]
+        assert merged['current_date'] == 600
+
+    def test_not_modified_windows_are_skipped(self):
+        merged = merge([answer((1, 'approved', 100)), NOT_MODIFIED])
+        assert len(merged['homeworks']) == 1
+        assert merge([NOT_MODIFIED]) is NOT_MODIFIED
+
+
+class TestBackfill:
+
+    def test_windows_are_fetched_under_the_cap(self):
+        client = WindowClient()
+        backfill = Backfill(after=DAY, window=DAY, concurrency=2,
+                            clock=FakeClock(START + 7 * DAY).now)
+        merged = asyncio.run(backfill.fetch(client, START))
+        assert len(client.requested) == 7
+        assert client.max_in_flight == 2
+        ids = [hw['id'] for hw in merged['homeworks']]
+        assert ids == [START + day * DAY for day in range(7)]
+
+    def test_zero_window_disables_backfill(self):
+        backfill = Backfill(after=DAY, window=0,
+                            clock=FakeClock(START + 7 * DAY).now)
+        assert not backfill.needed(START)
+
+    def test_failed_window_fails_backfill(self):
+        client = WindowClient(error_window=START + DAY)
+        backfill = Backfill(after=DAY, window=DAY,
+                            clock=FakeClock(START + 3 * DAY).now)
+        with pytest.raises(homework.APIrequestError):
+            asyncio.run(backfill.fetch(client, START))
+
+    def test_matches_single_request(self, monkeypatch):
+        clock = FakeClock(START)
+        server = FakePracticum(
+            FakeConfig(homeworks=30, review_delay=DAY, verdict_delay=DAY,
+                       seed=1),
+            clock=clock.now
+        )
+        server.timeline('token')
+        clock.advance(7 * DAY)
+        headers = {'Authorization': 'OAuth token'}
+        backfill = Backfill(after=DAY, window=DAY, clock=clock.now)
+
+        async def scenario():
+            async with server:
+                monkeypatch.setattr(homework, 'ENDPOINT', server.url)
+                async with AsyncClient(use_cache=False) as client:
+                    single = await client.get_api_answer(START, headers)
+                    merged = await backfill.fetch(client, START, headers)
+            return single, merged
+
+        single, merged = asyncio.run(scenario())
+        assert server.requests == 1 + 7
+        latest = {hw['id']: hw['status'] for hw in merged['homeworks']}
+        assert latest == {hw['id']: hw['status']
+                          for hw in single['homeworks']}
+        dates = [parse_date(hw['date_updated'])
+                 for hw in merged['homeworks']]
+        assert dates == sorted(dates)
+        assert len(merged['homeworks']) > len(single['homeworks']), (
+            'промежуточные статусы из ранних окон тоже доставляются'
+        )
+
+
+def test_engine_backfills_stale_cursor():
+    registry = SubscriberRegistry()
+    subscriber = registry.add('token', 42, timestamp=START)
+    bot = FakeBot()
+    client = WindowClient()
+    poller = engine.PollingEngine(
+        registry, bot, client=client,
+        backfill=Backfill(after=DAY, window=DAY,
+                          clock=FakeClock(START + 2 * DAY + 1).now)
+    )
+
+    async def scenario():
+        async with poller.sender:
+            return await poller.poll(registry.feed('token'))
+
+    assert asyncio.run(scenario()) == ['approved'] * 3
+    assert [to_date for _, to_date in client.requested] == [
+        START + DAY, START + 2 * DAY, None
+    ]
+    assert subscriber.timestamp == START + 2 * DAY
+    assert len(bot.sent) == 1, 'изменения для чата склеиваются в сообщение'
@@ -0,0 +1,33 @@
+import json
+
+from benchmarks.common import Results, percentile, summarize
+
+
+class TestBenchmarkResults:
+
+    def test_summarize(self):
+        summary = summarize([0.001] * 98 + [0.01, 0.1])
+        assert summary['repeats'] == 100
+        assert summary['p50_ms'] == 1.0
+        assert summary['max_ms'] == 100.0
+        assert round(summary['throughput']) == round(100 / 0.208)
+
+    def test_percentile_of_empty_sample(self):
+        assert percentile([], 0.99) == 0.0
+
+    def test_compare_with_baseline(self, tmp_path):
+        path = str(tmp_path / 'baseline.json')
+        baseline = Results()
+        baseline.benchmarks['fast'] = {'throughput': 100, 'p99_ms': 10}
+        baseline.benchmarks['slow'] = {'throughput': 100, 'p99_ms': 10}
+        baseline.save(path)
+
+        results = Results()
+        results.benchmarks['fast'] = {'throughput': 90, 'p99_ms': 11}
+        results.benchmarks['slow'] = {'throughput': 50, 'p99_ms': 30}
+        results.benchmarks['new'] = {'throughput': 1, 'p99_ms': 1}
+        regressions = results.compare(path, tolerance=0.25)
+        assert len(regressions) == 2
+        assert all(line.startswith('slow') for line in regressions)
+        with open(path) as file:
+            assert 'python' in json.load(file)
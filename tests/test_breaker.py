@@ -0,0 +1,104 @@
+import asyncio
+
+import engine
+from breaker import (
+    BACKOFF, CLOSED, FAIL, HALF_OPEN, OPEN, STOP, CircuitBreaker,
+    full_jitter, policy
+)
+from exceptions import APIrequestError, SchemaError
+from scheduler import FakeClock
+from subscribers import SubscriberRegistry
+from test_engine import FakeBot, FakeClient
+
+
+def make_breaker(clock, threshold=3):
+    return CircuitBreaker(threshold=threshold, base=10, cap=100,
+                          clock=clock, random=lambda: 1.0)
+
+
+class TestPolicy:
+
+    def test_statuses(self):
+        assert policy(APIrequestError('x', 401)) == STOP
+        assert policy(APIrequestError('x', 403)) == STOP
+        assert policy(APIrequestError('x', 429)) == BACKOFF
+        assert policy(APIrequestError('x', 503)) == BACKOFF
+        assert policy(APIrequestError('нет ответа')) == BACKOFF
+        assert policy(APIrequestError('x', 404)) == FAIL
+        assert policy(SchemaError('нет поля', 'status')) == FAIL
+
+    def test_full_jitter_is_capped(self):
+        assert full_jitter(0, 10, 100, lambda: 0.5) == 5
+        assert full_jitter(3, 10, 100, lambda: 1.0) == 80
+        assert full_jitter(10, 10, 100, lambda: 1.0) == 100
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(2):
+            breaker.record_failure()
+            assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_half_open_lets_single_probe(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock, threshold=1)
+        breaker.record_failure()
+        clock.advance(10)
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow(), 'пробный запрос только один'
+
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.opened_until == 10 + 20, 'предел паузы удваивается'
+
+        clock.advance(20)
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow() and breaker.allow()
+
+    def test_retry_after_extends_pause(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock, threshold=1)
+        breaker.record_failure(retry_after=60)
+        assert breaker.opened_until == 60
+
+
+class TestEngineBreaker:
+
+    def test_failing_api_is_not_hammered(self):
+        registry = SubscriberRegistry()
+        for chat_id in range(50):
+            registry.add(f'token{chat_id}', chat_id, timestamp=0)
+        clock = FakeClock()
+        client = FakeClient(error=APIrequestError('Ошибка', 500))
+        breaker = CircuitBreaker(threshold=5, base=60, cap=1800,
+                                 clock=clock)
+        poller = engine.PollingEngine(registry, FakeBot(), client,
+                                      clock=clock, breaker=breaker)
+        asyncio.run(poller.run(until=6 * 3600))
+        assert breaker.state != CLOSED
+        assert len(client.requested) < 100, (
+            'при неработающем API запросы должны почти прекратиться'
+        )
+
+    def test_rejected_token_stops_polling(self):
+        registry = SubscriberRegistry()
+        registry.add('bad', 42, timestamp=0)
+        clock = FakeClock()
+        bot = FakeBot()
+        client = FakeClient(error=APIrequestError('Ошибка', 401))
+        poller = engine.PollingEngine(registry, bot, client, clock=clock)
+        asyncio.run(poller.run(until=24 * 3600))
+        assert len(client.requested) == 1
+        assert poller.suspended == {('bad', '42')}
+        assert poller.breaker.state == CLOSED
+        assert len(bot.sent) == 1
+        assert 'Токен' in bot.sent[0][1]
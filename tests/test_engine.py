@@ -0,0 +1,500 @@
+import asyncio
+import json
+import random
+import time
+
+import engine
+import homework
+from async_client import AsyncClient
+from response_cache import NOT_MODIFIED
+from scheduler import (
+    AdaptiveInterval, FakeClock, Scheduler, TimingWheel, TokenBucket
+)
+from subscribers import SubscriberRegistry
+
+
+class FakeClient:
+    def __init__(self, answer=None, error=None):
+        self.answer = answer
+        self.error = error
+        self.requested = []
+        self.invalidated = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def get_api_answer(self, timestamp, headers=None,
+                             on_homework=None):
+        self.requested.append((timestamp, headers))
+        if self.error:
+            raise self.error
+        return self.answer
+
+    async def run_sync(self, func, *args):
+        return func(*args)
+
+    def invalidate(self, headers=None):
+        self.invalidated.append(headers)
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+        self.parse_mode = parse_mode
+
+
+async def poll_once(poller, subscriber):
+    async with poller.sender:
+        return await poller.poll(poller.registry.feed(subscriber.token))
+
+
+class TestSubscriberRegistry:
+
+    def test_add_is_idempotent(self):
+        registry = SubscriberRegistry()
+        first = registry.add('token', 1)
+        second = registry.add('token', '1')
+        assert first is second
+        assert len(registry) == 1
+
+    def test_headers_use_subscriber_token(self):
+        subscriber = SubscriberRegistry().add('abc', 1)
+        assert subscriber.headers == {'Authorization': 'OAuth abc'}
+
+    def test_feed_groups_chats_of_one_token(self):
+        registry = SubscriberRegistry()
+        registry.add('token', 1, timestamp=300)
+        registry.add('token', 2, timestamp=100)
+        registry.add('other', 3)
+        feed = registry.feed('token')
+        assert len(feed) == 2
+        assert feed.timestamp == 100
+        assert len(registry.feeds()) == 2
+        registry.remove('token', 1)
+        registry.remove('token', 2)
+        assert registry.feed('token') is None
+        assert len(registry.feeds()) == 1
+
+    def test_from_file(self, tmp_path):
+        path = tmp_path / 'subscribers.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': 2},
+        ]))
+        registry = SubscriberRegistry.from_file(str(path))
+        assert len(registry) == 2
+        assert registry.get('b', 2) is not None
+
+
+class TestScheduler:
+
+    def test_spread_evenly_over_period(self):
+        clock = FakeClock()
+        scheduler = Scheduler(period=600, clock=clock)
+        scheduler.spread(['a', 'b', 'c', 'd'])
+        order = []
+        delays = []
+        for _ in range(4):
+            delays.append(scheduler.delay())
+            item, due = scheduler.pop()
+            clock.advance(due - clock.now())
+            order.append((item, due))
+            scheduler.reschedule(item, due)
+        assert order == [('a', 0), ('b', 150), ('c', 300), ('d', 450)]
+        assert delays == [0, 150, 150, 150]
+
+    def test_reschedule_keeps_period(self):
+        scheduler = Scheduler(period=600, clock=FakeClock())
+        scheduler.spread(['a'])
+        item, due = scheduler.pop()
+        scheduler.reschedule(item, due)
+        assert scheduler.pop() == ('a', 600)
+
+
+def drain_wheel(wheel, clock):
+    """Проводит часы по всем срокам; список (элемент, срок, время)."""
+    fired = []
+    while len(wheel):
+        delay = wheel.delay()
+        if delay:
+            clock.advance(delay)
+            continue
+        item, due = wheel.pop()
+        fired.append((item, due, clock.now()))
+    return fired
+
+
+class TestTimingWheel:
+
+    def test_spread_matches_heap_scheduler(self):
+        clock = FakeClock()
+        wheel = TimingWheel(period=600, clock=clock)
+        wheel.spread(['a', 'b', 'c', 'd'])
+        order = []
+        for _ in range(8):
+            clock.advance(wheel.delay())
+            item, due = wheel.pop()
+            order.append((item, due))
+            wheel.reschedule(item, due)
+        assert order == [('a', 0), ('b', 150), ('c', 300), ('d', 450),
+                         ('a', 600), ('b', 750), ('c', 900), ('d', 1050)]
+
+    def test_fires_within_one_tick(self):
+        rng = random.Random(7)
+        clock = FakeClock(start=12345.6)
+        wheel = TimingWheel(clock=clock, resolution=0.5)
+        expected = {}
+        for item in range(2000):
+            horizon = rng.choice((60, 3600, 30 * 24 * 3600, 10 ** 7))
+            expected[item] = clock.now() + rng.uniform(0, horizon)
+            wheel.push(item, expected[item])
+        fired = drain_wheel(wheel, clock)
+        assert sorted(item for item, _, _ in fired) == sorted(expected)
+        for item, due, now in fired:
+            assert due == expected[item]
+            assert due <= now < due + wheel.resolution
+
+    def test_cancel_and_push_again(self):
+        clock = FakeClock()
+        wheel = TimingWheel(clock=clock)
+        wheel.push('a', 10)
+        wheel.push('b', 5000)
+        wheel.push('c', 20)
+        assert wheel.cancel('b')
+        assert not wheel.cancel('b')
+        wheel.push('c', 100)
+        assert len(wheel) == 2
+        assert [(item, due) for item, due, _ in drain_wheel(wheel, clock)] == [
+            ('a', 10), ('c', 100)
+        ]
+
+    def test_hundred_thousand_subscribers(self):
+        clock = FakeClock()
+        wheel = TimingWheel(period=600, clock=clock)
+        wheel.spread(range(100_000))
+        polled = 0
+        while polled < 200_000:
+            delay = wheel.delay()
+            if delay:
+                clock.advance(delay)
+                continue
+            item, due = wheel.pop()
+            assert due <= clock.now() < due + wheel.resolution
+            wheel.reschedule(item, due)
+            polled += 1
+        assert clock.now() <= 1200
+        assert len(wheel) == 100_000
+
+
+class TestAdaptiveInterval:
+
+    def test_activity_shortens_and_idle_backs_off(self):
+        intervals = AdaptiveInterval(period=600, min_interval=60,
+                                     max_interval=3600, backoff=2)
+        assert intervals.current('a') == 600
+        assert intervals.update('a', []) == 1200
+        assert intervals.update('a', []) == 2400
+        assert intervals.update('a', []) == 3600
+        assert intervals.update('a', []) == 3600
+        assert intervals.update('a', ['approved']) == 60
+        assert intervals.update('a', None) == 60
+
+    def test_reviewing_caps_backoff_at_period(self):
+        intervals = AdaptiveInterval(period=600, min_interval=60,
+                                     max_interval=3600, backoff=2)
+        assert intervals.update('a', ['reviewing']) == 60
+        for _ in range(10):
+            interval = intervals.update('a', [])
+        assert interval == 600
+        intervals.update('a', ['approved'])
+        for _ in range(10):
+            interval = intervals.update('a', [])
+        assert interval == 3600
+
+
+class TestTokenBucket:
+
+    def test_rate_is_enforced(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+        assert bucket.try_acquire()
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        assert bucket.delay() == 0.5
+        asyncio.run(bucket.acquire())
+        assert clock.now() == 0.5
+
+    def test_zero_rate_is_unlimited(self):
+        bucket = TokenBucket(rate=0, clock=FakeClock())
+        assert all(bucket.try_acquire() for _ in range(1000))
+
+
+class TestPollingEngine:
+
+    def test_run_polls_active_subscriber_more_often(self):
+        registry = SubscriberRegistry()
+        registry.add('active', 1, timestamp=0)
+        registry.add('idle', 2, timestamp=0)
+        changes = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'reviewing'}
+            ],
+            'current_date': 1
+        }
+        empty = {'homeworks': [], 'current_date': 1}
+        client = FakeClient()
+
+        async def get_api_answer(timestamp, headers=None, on_homework=None):
+            client.requested.append(headers['Authorization'])
+            if headers['Authorization'] == 'OAuth active':
+                return changes
+            return empty
+
+        client.get_api_answer = get_api_answer
+        clock = FakeClock()
+        intervals = AdaptiveInterval(period=600, min_interval=60,
+                                     max_interval=3600, backoff=2)
+        poller = engine.PollingEngine(registry, None, client, clock=clock,
+                                      intervals=intervals)
+        asyncio.run(poller.run(until=3600))
+        assert client.requested.count('OAuth active') > 30
+        assert client.requested.count('OAuth idle') == 2
+
+    def test_poll_sends_to_subscriber_chat(self):
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        bot = FakeBot()
+        client = FakeClient(answer={
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 200
+        })
+        poller = engine.PollingEngine(registry, bot, client=client)
+        asyncio.run(poll_once(poller, subscriber))
+        assert client.requested == [(100, {'Authorization': 'OAuth token'})]
+        assert len(bot.sent) == 1
+        chat_id, text = bot.sent[0]
+        assert chat_id == '42'
+        assert text.endswith(homework.HOMEWORK_VERDICTS['approved'])
+        assert subscriber.timestamp == 200
+
+        asyncio.run(poll_once(poller, subscriber))
+        assert len(bot.sent) == 1, 'повторный статус не должен отправляться'
+
+    def test_chats_of_one_token_share_a_poll(self):
+        registry = SubscriberRegistry()
+        first = registry.add('token', 1, timestamp=100)
+        second = registry.add('token', 2, timestamp=50)
+        bot = FakeBot()
+        client = FakeClient(answer={
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 200
+        })
+        poller = engine.PollingEngine(registry, bot, client=client)
+        asyncio.run(poll_once(poller, first))
+        assert client.requested == [(50, {'Authorization': 'OAuth token'})]
+        assert sorted(chat_id for chat_id, _ in bot.sent) == ['1', '2']
+        assert first.timestamp == second.timestamp == 200
+
+    def test_added_chat_joins_scheduled_feed(self):
+        registry = SubscriberRegistry()
+        registry.add('token', 1, timestamp=0)
+        clock = FakeClock()
+        poller = engine.PollingEngine(
+            registry, FakeBot(), FakeClient(), clock=clock
+        )
+        poller.scheduler.spread(registry.feeds())
+        poller.add('token', 2)
+        assert len(poller.scheduler) == 1
+        poller.remove('token', 1)
+        assert len(poller.scheduler) == 1
+        poller.remove('token', 2)
+        assert len(poller.scheduler) == 0
+
+    def test_unknown_status_does_not_stall_feed(self):
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        bot = FakeBot()
+        client = FakeClient(answer={
+            'homeworks': [
+                {'id': 1, 'homework_name': 'bad', 'status': 'lost'},
+                {'id': 2, 'homework_name': 'hw', 'status': 'approved'},
+            ],
+            'current_date': 200
+        })
+        poller = engine.PollingEngine(registry, bot, client=client)
+        assert asyncio.run(poll_once(poller, subscriber)) == ['approved']
+        assert subscriber.timestamp == 200
+        texts = [text for _, text in bot.sent]
+        assert any(homework.HOMEWORK_VERDICTS['approved'] in text
+                   for text in texts)
+        assert any('неожиданный статус' in text for text in texts)
+
+    def test_invalid_homework_does_not_stall_feed(self):
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        bot = FakeBot()
+        client = FakeClient(answer={
+            'homeworks': [
+                {'id': 1, 'status': 'approved'},
+                {'id': 2, 'homework_name': 'ok', 'status': 'approved'},
+            ],
+            'current_date': 200
+        })
+        poller = engine.PollingEngine(registry, bot, client=client)
+        assert asyncio.run(poll_once(poller, subscriber)) == ['approved']
+        assert subscriber.timestamp == 200
+        texts = [text for _, text in bot.sent]
+        assert any('"ok"' in text for text in texts)
+        assert any('homeworks[0].homework_name' in text for text in texts)
+
+    def test_poll_error_is_reported_to_chat(self):
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        bot = FakeBot()
+        client = FakeClient(error=homework.APIrequestError('boom'))
+        poller = engine.PollingEngine(registry, bot, client=client)
+        asyncio.run(poll_once(poller, subscriber))
+        assert 'boom' in bot.sent[0][1]
+        assert subscriber.timestamp == 100
+        assert client.invalidated == [subscriber.headers]
+
+    def test_not_modified_answer_advances_cursor(self, monkeypatch):
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        bot = FakeBot()
+        client = FakeClient(answer=NOT_MODIFIED)
+        monkeypatch.setattr(homework, 'check_response', None)
+        poller = engine.PollingEngine(registry, bot, client=client)
+        started = int(time.time())
+        assert asyncio.run(poll_once(poller, subscriber)) == []
+        assert bot.sent == []
+        assert started <= subscriber.timestamp <= time.time(), (
+            'курсор тихой ленты не должен устаревать'
+        )
+
+    def test_added_chat_gets_statuses_of_cached_answer(
+            self, fake_practicum):
+        fake_practicum.config.homeworks = 1
+        started = int(fake_practicum.clock())
+        fake_practicum.timeline('token')
+        fake_practicum.clock = lambda: started + 10 ** 6
+        registry = SubscriberRegistry()
+        first = registry.add('token', 1, timestamp=started)
+        bot = FakeBot()
+
+        async def scenario():
+            async with AsyncClient() as client:
+                poller = engine.PollingEngine(registry, bot, client=client)
+                await poll_once(poller, first)
+                second = poller.add('token', 2)
+                second.timestamp = started - 7 * 24 * 60 * 60
+                await poll_once(poller, first)
+                return second
+
+        second = asyncio.run(scenario())
+        assert [chat_id for chat_id, _ in bot.sent] == ['1', '2'], (
+            'чат с более ранним курсором не должен получать NOT_MODIFIED'
+        )
+        assert second.timestamp == started + 10 ** 6
+
+    def test_delivered_statuses_are_not_resent(self, tmp_path):
+        from state import StateStore
+
+        path = str(tmp_path / 'state.sqlite3')
+        answer = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'}
+            ],
+            'current_date': 200
+        }
+        store = StateStore(path)
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        bot = FakeBot()
+        client = FakeClient(answer=answer)
+        poller = engine.PollingEngine(registry, bot, client, store=store)
+        asyncio.run(poll_once(poller, subscriber))
+        store.close()
+        assert len(bot.sent) == 1
+
+        store = StateStore(path)
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42)
+        poller = engine.PollingEngine(registry, bot, client, store=store)
+        poller.restore()
+        assert subscriber.timestamp == 200
+        asyncio.run(poll_once(poller, subscriber))
+        store.close()
+        assert len(bot.sent) == 1, 'статус уже был доставлен до рестарта'
+
+    def test_rejected_outbox_is_retried_until_attempts_run_out(
+            self, tmp_path, monkeypatch):
+        import telegram
+
+        from state import StateStore
+
+        class RejectingBot:
+            def __init__(self):
+                self.tries = 0
+
+            def send_message(self, chat_id, text, parse_mode=None):
+                self.tries += 1
+                raise telegram.error.BadRequest('chat not found')
+
+        monkeypatch.setattr(engine, 'OUTBOX_MAX_ATTEMPTS', 2)
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        bot = RejectingBot()
+        client = FakeClient(answer={
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'}
+            ],
+            'current_date': 200
+        })
+        clock = FakeClock()
+        poller = engine.PollingEngine(registry, bot, client, clock=clock,
+                                      store=store)
+
+        async def scenario():
+            async with poller.sender:
+                await poller.poll(registry.feed(subscriber.token))
+                await poller.sender.join()
+                for _ in range(3):
+                    poller.maybe_resend()
+                    await poller.sender.join()
+                    clock.advance(engine.OUTBOX_RETRY_INTERVAL)
+
+        asyncio.run(scenario())
+        assert bot.tries == 3, 'первая отправка и две повторные'
+        assert store.outbox(max_attempts=2) == []
+        assert len(store.outbox()) == 1, 'сообщение остаётся в outbox'
+        assert store.dead_letters(2) == 1
+        store.close()
+
+    def test_resend_skips_chats_still_in_queue(self, tmp_path):
+        from state import StateStore
+
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        store.enqueue(subscriber.key, 1, 'approved', 'text')
+        poller = engine.PollingEngine(registry, FakeBot(), FakeClient(),
+                                      store=store)
+
+        async def scenario():
+            async with poller.sender:
+                poller.sender.put(subscriber.chat_id, 'text')
+                poller.resend()
+                return len(poller.sender)
+
+        assert asyncio.run(scenario()) == 1, (
+            'сообщение из очереди отправки не ставится второй раз'
+        )
+        store.close()
@@ -0,0 +1,47 @@
+import pytest
+
+from fake_practicum import FakeConfig, FakePracticum
+from scheduler import FakeClock
+
+
+class TestFakePracticum:
+
+    def test_sync_client_against_server(self, fake_practicum,
+                                        homework_module):
+        answer = homework_module.get_api_answer(0)
+        homework_module.check_response(answer)
+        assert fake_practicum.requests == 1
+
+    def test_statuses_change_over_time(self):
+        clock = FakeClock(1_000_000)
+        server = FakePracticum(
+            FakeConfig(homeworks=3, review_delay=10, verdict_delay=10,
+                       seed=1),
+            clock=clock.now
+        )
+        start = clock.now()
+        assert server.homeworks('token', start, start) == []
+        clock.advance(10_000)
+        homeworks = server.homeworks('token', start, clock.now())
+        assert len(homeworks) == 3
+        assert {hw['status'] for hw in homeworks} <= {'approved', 'rejected'}
+        assert server.homeworks('token', clock.now(), clock.now()) == []
+        assert {'id', 'status', 'homework_name', 'reviewer_comment',
+                'date_updated', 'lesson_name'} <= set(homeworks[0])
+
+    def test_bad_token_gets_401(self, fake_practicum, homework_module):
+        fake_practicum.config.bad_tokens.add('bad')
+        with pytest.raises(homework_module.APIrequestError, match='401'):
+            homework_module.request_homeworks(
+                0, {'Authorization': 'OAuth bad'}
+            )
+
+    def test_error_injection(self, fake_practicum, homework_module):
+        fake_practicum.config.error_rate = 1
+        with pytest.raises(homework_module.APIrequestError, match='500'):
+            homework_module.get_api_answer(0)
+
+    def test_malformed_json(self, fake_practicum, homework_module):
+        fake_practicum.config.malformed_rate = 1
+        with pytest.raises(homework_module.APIrequestError, match='JSON'):
+            homework_module.get_api_answer(0)
@@ -0,0 +1,22 @@
+import pytest
+import telegram
+
+from fake_telegram import FakeTelegram
+
+
+class TestFakeTelegram:
+
+    def test_bot_sends_to_fake_server(self):
+        server = FakeTelegram()
+        with server.in_thread():
+            bot = telegram.Bot(token='1234:abcdefg', base_url=server.base_url)
+            bot.send_message(42, 'привет')
+        assert server.messages == [('42', 'привет')]
+
+    def test_flood_control_maps_to_retry_after(self):
+        server = FakeTelegram(flood_rate=1, retry_after=3)
+        with server.in_thread():
+            bot = telegram.Bot(token='1234:abcdefg', base_url=server.base_url)
+            with pytest.raises(telegram.error.RetryAfter) as error:
+                bot.send_message(42, 'привет')
+        assert error.value.retry_after == 3
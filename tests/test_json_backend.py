@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import homework
+import json_backend
+from async_client import AsyncClient
+from test_async_client import serve
+
+BODY = '{"homeworks": [{"status": "approved"}], "current_date": 5}'
+
+
+class TestJsonBackend:
+
+    def test_stdlib_is_always_available(self):
+        assert json_backend.available()[-1] == 'json'
+
+    @pytest.mark.parametrize('name', json_backend.available())
+    def test_backends_agree_with_stdlib(self, name):
+        _, loads, errors = json_backend.load_backend(name)
+        assert loads(BODY.encode('utf-8')) == {
+            'homeworks': [{'status': 'approved'}], 'current_date': 5
+        }
+        with pytest.raises(errors):
+            loads(b'{"homeworks": [')
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            json_backend.load_backend('yaml')
+
+    @pytest.mark.parametrize('name', json_backend.available())
+    def test_malformed_body_is_api_error(self, monkeypatch, name):
+        _, loads, errors = json_backend.load_backend(name)
+        monkeypatch.setattr(json_backend, 'loads', loads)
+        monkeypatch.setattr(json_backend, 'DECODE_ERRORS', errors)
+
+        async def handler(request):
+            return web.Response(text='{"homeworks": [')
+
+        async def scenario():
+            runner, endpoint = await serve(handler)
+            monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+            try:
+                async with AsyncClient() as client:
+                    await client.get_api_answer(100)
+            finally:
+                await runner.cleanup()
+
+        with pytest.raises(homework.APIrequestError, match='JSON'):
+            asyncio.run(scenario())
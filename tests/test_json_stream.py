@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from exceptions import SchemaError
+from json_stream import AnswerParser
+
+ANSWER = {
+    'homeworks': [
+        {'id': number, 'homework_name': f'hw{number}.zip',
+         'status': 'approved', 'reviewer_comment': 'Всё «ок», } ] ,'}
+        for number in range(30)
+    ],
+    'current_date': 1_700_000_000,
+}
+
+
+def parse(body, chunk_size):
+    parser = AnswerParser()
+    homeworks = []
+    for start in range(0, len(body), chunk_size):
+        homeworks.extend(parser.feed(body[start:start + chunk_size]))
+    return homeworks, parser.close()
+
+
+class TestAnswerParser:
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 100, 100_000])
+    def test_chunked_body_matches_json_loads(self, chunk_size):
+        body = json.dumps(ANSWER, ensure_ascii=False, indent=1)
+        homeworks, answer = parse(body.encode('utf-8'), chunk_size)
+        assert [hw.as_dict() for hw in homeworks] == ANSWER['homeworks']
+        assert answer.as_dict() == {'homeworks': [],
+                                    'current_date': 1_700_000_000}
+        assert answer.skipped == []
+
+    def test_number_split_at_any_offset(self):
+        body = json.dumps({
+            'rating': 150.05,
+            'homeworks': ANSWER['homeworks'][:2],
+            'current_date': 1_700_000_000,
+            'score': -1.5e3,
+        }).encode('utf-8')
+        for offset in range(1, len(body)):
+            parser = AnswerParser()
+            homeworks = parser.feed(body[:offset])
+            homeworks += parser.feed(body[offset:])
+            answer = parser.close()
+            assert len(homeworks) == 2, offset
+            assert parser.fields['rating'] == 150.05, offset
+            assert parser.fields['score'] == -1500.0, offset
+            assert answer.current_date == 1_700_000_000, offset
+
+    def test_invalid_homework_is_skipped_with_path(self):
+        body = b'{"homeworks": [{"homework_name": "b", "status": 1},'
+        body += b' {"homework_name": "a", "status": "approved"}],'
+        body += b' "current_date": 1}'
+        homeworks, answer = parse(body, 16)
+        assert [hw.homework_name for hw in homeworks] == ['a']
+        assert answer.current_date == 1
+        [error] = answer.skipped
+        assert isinstance(error, SchemaError)
+        assert error.path == 'homeworks[0].status'
+
+    def test_homeworks_are_yielded_before_body_ends(self):
+        body = json.dumps(ANSWER).encode('utf-8')
+        parser = AnswerParser()
+        assert len(parser.feed(body[:len(body) // 2])) > 10
+
+    @pytest.mark.parametrize('body', [
+        b'[]',
+        b'{}',
+        b'{"homeworks": {}, "current_date": 1}',
+        b'{"homeworks": []}',
+        b'{"homeworks": [], "current_date": "1"}',
+    ])
+    def test_invalid_structure_raises_type_error(self, body):
+        with pytest.raises(TypeError):
+            parse(body, 4)
+
+    @pytest.mark.parametrize('body', [
+        b'<html>',
+        b'{"homeworks": [',
+        b'{"homeworks": [{"homework_name": "hw", "status": "approved"} 2]}',
+        b'{"homeworks": [], "current_date": 1,}',
+        b'{"homeworks": [], "current_date": 1} extra',
+    ])
+    def test_malformed_json_raises_value_error(self, body):
+        with pytest.raises(ValueError):
+            parse(body, 4)
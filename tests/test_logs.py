@@ -0,0 +1,91 @@
+import atexit
+import io
+import json
+import logging
+
+from async_client import RequestStats
+from logs import DebugSampler, JsonFormatter, setup_logging
+
+
+def make_record(message, level=logging.DEBUG, **extra):
+    record = logging.LogRecord('homework', level, __file__, 1, message,
+                               None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestDebugSampler:
+
+    def test_repeated_debug_lines_are_sampled(self):
+        sampler = DebugSampler(every=10, clock=lambda: 0)
+        records = [make_record('Список домашек пуст') for _ in range(25)]
+        passed = [record for record in records if sampler.filter(record)]
+        assert passed == [records[0], records[10], records[20]]
+        assert passed[1].suppressed == 9
+
+    def test_other_levels_are_not_sampled(self):
+        sampler = DebugSampler(every=10, clock=lambda: 0)
+        assert all(sampler.filter(make_record('сбой', logging.ERROR))
+                   for _ in range(5))
+
+    def test_window_resets_counter(self):
+        now = [0]
+        sampler = DebugSampler(every=10, window=60, clock=lambda: now[0])
+        assert sampler.filter(make_record('x'))
+        assert not sampler.filter(make_record('x'))
+        now[0] = 60
+        assert sampler.filter(make_record('x'))
+
+
+def test_request_timing_lines_are_sampled():
+    records = []
+    handler = logging.Handler(logging.DEBUG)
+    handler.emit = records.append
+    logger = logging.getLogger('async_client')
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    try:
+        stats = RequestStats()
+        for number in range(20):
+            stats.record(number / 1000, reused=number % 2 == 0)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    sampler = DebugSampler(every=10, clock=lambda: 0)
+    passed = [record for record in records if sampler.filter(record)]
+    assert len(passed) == 2, 'строки с разным временем — один шаблон'
+    assert passed[0].getMessage() == (
+        'Запрос к API за 0.000 с, соединение из пула'
+    )
+
+
+def test_json_record_carries_context():
+    record = make_record('Новый статус', logging.INFO,
+                         chat_id='42', homework_id=7)
+    data = json.loads(JsonFormatter().format(record))
+    assert data['message'] == 'Новый статус'
+    assert data['level'] == 'INFO'
+    assert data['chat_id'] == '42'
+    assert data['homework_id'] == 7
+
+
+def test_setup_logging_writes_through_queue(tmp_path):
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    stream = io.StringIO()
+    path = tmp_path / 'bot.log'
+    listener = setup_logging(str(path), 'INFO', 'json', stream)
+    try:
+        logging.getLogger('engine').info(
+            'опрос', extra={'chat_id': '1'}
+        )
+    finally:
+        atexit.unregister(listener.stop)
+        listener.stop()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['message'] == 'опрос'
+    assert data['chat_id'] == '1'
+    assert json.loads(stream.getvalue()) == data
@@ -0,0 +1,74 @@
+import urllib.request
+
+import pytest
+
+import homework
+import metrics
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+class TestRender:
+
+    def test_counter_with_labels(self):
+        registry = Registry()
+        counter = Counter('requests_total', 'Запросы', ('status',),
+                          registry=registry)
+        counter.labels(200).inc()
+        counter.labels(status='200').inc(2)
+        counter.labels(500).inc()
+        text = registry.render()
+        assert '# TYPE requests_total counter' in text
+        assert 'requests_total{status="200"} 3' in text
+        assert 'requests_total{status="500"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = Histogram('latency_seconds', 'Задержка',
+                              registry=registry, buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value)
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 2' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert 'latency_seconds_count 4' in text
+        assert 'latency_seconds_sum 5.65' in text
+
+    def test_gauge_function_is_read_on_render(self):
+        registry = Registry()
+        queue = [1, 2]
+        gauge = Gauge('depth', 'Глубина', registry=registry)
+        gauge.set_function(lambda: len(queue))
+        assert 'depth 2' in registry.render()
+        queue.append(3)
+        assert 'depth 3' in registry.render()
+
+    def test_duplicate_name_is_rejected(self):
+        registry = Registry()
+        Counter('x_total', 'x', registry=registry)
+        with pytest.raises(ValueError):
+            Counter('x_total', 'x', registry=registry)
+
+
+def test_hot_path_is_instrumented():
+    before = metrics.PARSED.labels('approved').value
+    homework.parse_status({'homework_name': 'hw', 'status': 'approved'})
+    assert metrics.PARSED.labels('approved').value == before + 1
+    before = metrics.RESPONSE_INVALID.labels().value
+    with pytest.raises(TypeError):
+        homework.check_response([])
+    assert metrics.RESPONSE_INVALID.labels().value == before + 1
+
+
+def test_http_endpoint():
+    registry = Registry()
+    Counter('up_total', 'Проверка', registry=registry).inc()
+    server = metrics.start_http_server(port=0, registry=registry)
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+        with urllib.request.urlopen(url) as response:
+            assert response.headers['Content-Type'] == metrics.CONTENT_TYPE
+            assert 'up_total 1' in response.read().decode('utf-8')
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,73 @@
+import pytest
+
+from exceptions import SchemaError
+from schema import Answer, Field, Homework, record
+
+HOMEWORK = {
+    'id': 124,
+    'status': 'rejected',
+    'homework_name': 'username__hw_python_oop.zip',
+    'reviewer_comment': 'Код не по PEP8, нужно исправить',
+    'date_updated': '2020-02-13T16:42:47Z',
+    'lesson_name': 'Итоговый проект',
+}
+
+
+class TestSchema:
+
+    def test_answer_is_decoded_into_records(self):
+        answer = Answer.decode({'homeworks': [HOMEWORK], 'current_date': 5})
+        assert answer.current_date == 5
+        hw = answer.homeworks[0]
+        assert isinstance(hw, Homework)
+        assert hw.status == 'rejected'
+        assert hw.as_dict() == HOMEWORK
+        assert not hasattr(hw, '__dict__')
+
+    def test_record_behaves_like_dict(self):
+        hw = Homework.decode({'homework_name': 'hw', 'status': 'approved'})
+        assert hw.get('status') == 'approved'
+        assert hw.get('id') is None
+        assert hw.get('unknown', 'x') == 'x'
+        assert 'homework_name' in hw
+        assert 'reviewer_comment' not in hw
+        with pytest.raises(KeyError):
+            hw['id']
+
+    def test_optional_fields_may_be_null(self):
+        hw = Homework.decode(dict(HOMEWORK, reviewer_comment=None))
+        assert hw.reviewer_comment is None
+
+    @pytest.mark.parametrize('data, path', [
+        ([], ''),
+        ({'current_date': 1}, 'homeworks'),
+        ({'homeworks': {}, 'current_date': 1}, 'homeworks'),
+        ({'homeworks': [], 'current_date': '1'}, 'current_date'),
+    ])
+    def test_errors_carry_path(self, data, path):
+        with pytest.raises(SchemaError) as error:
+            Answer.decode(data)
+        assert error.value.path == path
+        assert isinstance(error.value, TypeError)
+
+    @pytest.mark.parametrize('item, path', [
+        ('hw', 'homeworks[0]'),
+        (dict(HOMEWORK, id='124'), 'homeworks[0].id'),
+        ({'status': 'approved'}, 'homeworks[0].homework_name'),
+    ])
+    def test_invalid_homework_is_skipped(self, item, path):
+        answer = Answer.decode({'homeworks': [item, HOMEWORK],
+                                'current_date': 1})
+        assert [hw.as_dict() for hw in answer.homeworks] == [HOMEWORK]
+        [error] = answer.skipped
+        assert error.path == path
+        assert isinstance(error, TypeError)
+
+    def test_custom_record(self):
+        Point = record('Point', (Field('x', (int, float)),
+                                 Field('label', str, required=False)))
+        point = Point.decode({'x': 1.5})
+        assert point.x == 1.5
+        assert point == Point(x=1.5)
+        with pytest.raises(SchemaError, match='int или float'):
+            Point.decode({'x': 'a'})
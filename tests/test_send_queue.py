@@ -0,0 +1,90 @@
+import asyncio
+
+import telegram
+
+from scheduler import FakeClock
+from send_queue import SendQueue, split_message
+
+
+class SyncClient:
+    async def run_sync(self, func, *args):
+        return func(*args)
+
+
+class FlakyBot:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def send_message(self, chat_id, text):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+def run_queue(bot, clock, messages, **kwargs):
+    delivered = []
+
+    async def scenario():
+        queue = SendQueue(bot, SyncClient(), clock=clock, **kwargs)
+        async with queue:
+            for chat_id, text in messages:
+                queue.put(chat_id, text,
+                          lambda text=text: delivered.append(text))
+        return queue
+
+    queue = asyncio.run(scenario())
+    return queue, delivered
+
+
+class TestSplitMessage:
+
+    def test_short_texts_are_joined(self):
+        assert split_message(['a', 'b']) == ['a\n\nb']
+
+    def test_limit_is_respected(self):
+        messages = split_message(['a' * 6, 'b' * 6, 'c' * 25], limit=10)
+        assert messages == ['a' * 6, 'b' * 6, 'c' * 10, 'c' * 10, 'c' * 5]
+        assert all(len(message) <= 10 for message in messages)
+
+
+class TestSendQueue:
+
+    def test_messages_for_one_chat_are_coalesced(self):
+        bot = FlakyBot()
+        queue, delivered = run_queue(
+            bot, FakeClock(), [(1, 'first'), (2, 'other'), (1, 'second')]
+        )
+        assert sorted(bot.sent) == [(1, 'first\n\nsecond'), (2, 'other')]
+        assert sorted(delivered) == ['first', 'other', 'second']
+        assert len(queue) == 0
+
+    def test_retry_after_pauses_sending(self):
+        clock = FakeClock()
+        bot = FlakyBot([telegram.error.RetryAfter(7)])
+        _, delivered = run_queue(bot, clock, [(1, 'text')], workers=1)
+        assert bot.sent == [(1, 'text')]
+        assert delivered == ['text']
+        assert clock.now() >= 7
+
+    def test_bad_request_is_dropped(self):
+        bot = FlakyBot([telegram.error.BadRequest('chat not found')])
+        _, delivered = run_queue(bot, FakeClock(), [(1, 'text')])
+        assert bot.sent == []
+        assert delivered == []
+
+    def test_network_errors_do_not_lose_messages(self):
+        errors = [telegram.error.NetworkError('down')] * 3
+        bot = FlakyBot(errors)
+        _, delivered = run_queue(bot, FakeClock(), [(1, 'text')],
+                                 retries=2, workers=1)
+        assert bot.sent == [(1, 'text')]
+        assert delivered == ['text']
+
+    def test_global_rate_is_respected(self):
+        clock = FakeClock()
+        bot = FlakyBot()
+        messages = [(chat_id, 'text') for chat_id in range(10)]
+        run_queue(bot, clock, messages, global_rate=5)
+        assert len(bot.sent) == 10
+        assert clock.now() >= 1
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+
+import engine
+import homework
+from scheduler import FakeClock
+from shutdown import GracefulExit, ShutdownRequested
+from state import StateStore
+from subscribers import SubscriberRegistry
+from test_engine import FakeBot, FakeClient
+
+ANSWER = {
+    'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'approved'}],
+    'current_date': 200
+}
+
+
+class ThreadClient(FakeClient):
+    async def run_sync(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+
+class SlowBot(FakeBot):
+    def send_message(self, chat_id, text, parse_mode=None):
+        time.sleep(0.5)
+        super().send_message(chat_id, text, parse_mode)
+
+
+class TestGracefulExit:
+
+    def test_signal_interrupts_sleep(self):
+        timer = threading.Timer(
+            0.1, os.kill, (os.getpid(), signal.SIGTERM)
+        )
+        started = time.monotonic()
+        with GracefulExit() as shutdown:
+            timer.start()
+            with shutdown.sleeping():
+                time.sleep(5)
+        assert shutdown.requested
+        assert time.monotonic() - started < 2
+        assert signal.getsignal(signal.SIGTERM) is signal.SIG_DFL
+
+    def test_signal_outside_sleep_only_sets_flag(self):
+        shutdown = GracefulExit()
+        shutdown.handle(signal.SIGTERM)
+        assert shutdown.requested
+        try:
+            with shutdown.sleeping():
+                raise AssertionError('ожидание после сигнала не начинается')
+        except ShutdownRequested:
+            pass
+
+    def test_main_finishes_iteration_on_signal(self, monkeypatch, tmp_path):
+        sent = []
+
+        class Bot:
+            def __init__(self, token):
+                pass
+
+            def send_message(self, chat_id, text):
+                os.kill(os.getpid(), signal.SIGTERM)
+                sent.append(text)
+
+        def sleep(seconds):
+            raise AssertionError('после сигнала бот не должен засыпать')
+
+        path = str(tmp_path / 'state.sqlite3')
+        monkeypatch.setattr(homework, 'STATE_FILE', path)
+        monkeypatch.setattr(homework.telegram, 'Bot', Bot)
+        monkeypatch.setattr(homework, 'get_api_answer', lambda ts: ANSWER)
+        monkeypatch.setattr(homework.time, 'sleep', sleep)
+        homework.main()
+        assert len(sent) == 1
+        store = StateStore(path)
+        key = (homework.PRACTICUM_TOKEN, str(homework.TELEGRAM_CHAT_ID))
+        assert store.load_cursor(key) == 200
+        assert store.is_delivered(key, 1, 'approved')
+        store.close()
+
+
+class TestDrain:
+
+    def test_stop_drains_started_polls(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        bot = FakeBot()
+        client = FakeClient()
+        poller = engine.PollingEngine(registry, bot, client,
+                                      clock=FakeClock(), store=store)
+
+        async def get_api_answer(timestamp, headers=None, on_homework=None):
+            poller.stop()
+            return ANSWER
+
+        client.get_api_answer = get_api_answer
+        asyncio.run(poller.run())
+        assert len(bot.sent) == 1
+        store = StateStore(store.path)
+        assert store.load_cursor(subscriber.key) == 200
+        assert store.is_delivered(subscriber.key, 1, 'approved')
+        store.close()
+
+    def test_drain_timeout_keeps_outbox(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        registry = SubscriberRegistry()
+        subscriber = registry.add('token', 42, timestamp=100)
+        poller = engine.PollingEngine(registry, SlowBot(),
+                                      ThreadClient(answer=ANSWER),
+                                      store=store)
+
+        async def scenario():
+            async with poller.sender:
+                await poller.poll(registry.feed(subscriber.token))
+                await poller.drain(timeout=0.05)
+
+        asyncio.run(scenario())
+        store.close()
+        store = StateStore(store.path)
+        assert store.load_cursor(subscriber.key) == 200
+        assert not store.is_delivered(subscriber.key, 1, 'approved')
+        assert len(store.outbox(subscriber.key)) == 1, (
+            'неотправленный статус должен остаться в outbox'
+        )
+
+        bot = FakeBot()
+        poller = engine.PollingEngine(registry, bot, FakeClient(answer={
+            'homeworks': [], 'current_date': 300
+        }), clock=FakeClock(), store=store)
+        asyncio.run(poller.run(until=1))
+        assert len(bot.sent) == 1
+        store = StateStore(store.path)
+        assert store.is_delivered(subscriber.key, 1, 'approved')
+        assert store.outbox() == []
+        store.close()
@@ -0,0 +1,222 @@
+import sqlite3
+
+import telegram
+
+import homework
+from scheduler import FakeClock
+from state import StateStore, homework_key
+
+import utils
+
+
+KEY = ('token', '42')
+
+
+class TestStateStore:
+
+    def test_state_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        store.save_cursor(KEY, 1000)
+        store.mark_delivered(KEY, 7, 'approved')
+        store.close()
+
+        store = StateStore(path)
+        assert store.load_cursor(KEY) == 1000
+        assert store.is_delivered(KEY, 7, 'approved')
+        assert not store.is_delivered(KEY, 7, 'rejected')
+        assert store.load_cursor(('other', '1')) is None
+        store.close()
+
+    def test_writes_are_batched(self, tmp_path):
+        clock = FakeClock()
+        store = StateStore(str(tmp_path / 'state.sqlite3'),
+                           flush_interval=10, flush_size=3, clock=clock.now)
+        store.save_cursor(KEY, 1)
+        store.mark_delivered(KEY, 1, 'reviewing')
+        assert store.pending == 2
+        assert store.is_delivered(KEY, 1, 'reviewing')
+        store.mark_delivered(KEY, 2, 'reviewing')
+        assert store.pending == 0
+
+        store.save_cursor(KEY, 2)
+        assert store.pending == 1
+        clock.advance(10)
+        store.save_cursor(KEY, 3)
+        assert store.pending == 0
+        assert store.load_cursor(KEY) == 3
+        store.close()
+
+    def test_homework_key_falls_back_to_name(self):
+        assert homework_key({'id': 5, 'homework_name': 'hw'}) == '5'
+        assert homework_key({'homework_name': 'hw'}) == 'hw'
+
+
+class TestOutbox:
+
+    def test_outbox_is_idempotent_and_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        assert store.enqueue(KEY, 1, 'reviewing', 'first')
+        assert not store.enqueue(KEY, 1, 'reviewing', 'again')
+        store.save_cursor(KEY, 100)
+        store.close()
+
+        store = StateStore(path)
+        assert store.load_cursor(KEY) == 100
+        assert store.outbox() == [(KEY, '1', 'reviewing', 'first')]
+        assert not store.enqueue(KEY, 1, 'reviewing', 'again')
+        assert store.enqueue(KEY, 1, 'approved', 'second')
+        store.mark_delivered(KEY, 1, 'reviewing')
+        assert store.outbox(KEY) == [(KEY, '1', 'approved', 'second')]
+        assert store.outbox(('other', '1')) == []
+        assert not store.enqueue(KEY, 1, 'reviewing', 'again')
+        store.close()
+
+    def test_exhausted_messages_are_not_returned(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        store.enqueue(KEY, 1, 'approved', 'text')
+        for _ in range(2):
+            store.record_attempts(store.outbox(max_attempts=2))
+        assert store.outbox(max_attempts=2) == []
+        assert store.outbox() == [(KEY, '1', 'approved', 'text')]
+        assert store.dead_letters(2) == 1
+        assert not store.enqueue(KEY, 1, 'approved', 'again')
+        store.close()
+
+    def test_old_outbox_is_migrated(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.executescript('''
+            CREATE TABLE outbox (
+                id INTEGER PRIMARY KEY,
+                token TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                homework_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                text TEXT NOT NULL,
+                UNIQUE (token, chat_id, homework_id, status)
+            );
+            INSERT INTO outbox (token, chat_id, homework_id, status, text)
+            VALUES ('token', '42', '1', 'approved', 'text');
+        ''')
+        connection.close()
+        store = StateStore(path)
+        assert store.outbox(max_attempts=1) == [
+            (KEY, '1', 'approved', 'text')
+        ]
+        store.close()
+
+    def test_cursor_is_not_saved_without_outbox(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path, flush_interval=10, clock=FakeClock().now)
+        store.enqueue(KEY, 1, 'approved', 'text')
+        store.save_cursor(KEY, 100)
+        crashed = StateStore(path)
+        assert crashed.load_cursor(KEY) is None
+        assert crashed.outbox() == []
+        store.flush()
+        assert crashed.load_cursor(KEY) == 100
+        assert len(crashed.outbox()) == 1
+        crashed.close()
+        store.close()
+
+    def test_many_messages_are_batched(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'),
+                           flush_interval=10, clock=FakeClock().now)
+        for number in range(5000):
+            store.enqueue(KEY, number, 'approved', f'hw{number}')
+        pending = store.outbox()
+        assert len(pending) == 5000
+        assert pending[0][1] == '0', 'порядок постановки сохраняется'
+        for key, homework_id, status, _ in pending:
+            store.mark_delivered(key, homework_id, status)
+        assert store.outbox() == []
+        assert store.is_delivered(KEY, 4999, 'approved')
+        store.close()
+
+
+def test_main_skips_invalid_homework(monkeypatch, tmp_path):
+    sent = []
+    answers = [{
+        'homeworks': [
+            {'id': 1, 'status': 'approved'},
+            {'id': 2, 'homework_name': 'ok', 'status': 'approved'},
+        ],
+        'current_date': 200,
+    }]
+
+    class Bot:
+        def __init__(self, token):
+            pass
+
+        def send_message(self, chat_id, text):
+            sent.append(text)
+
+    def sleep(seconds):
+        raise utils.BreakInfiniteLoop
+
+    path = str(tmp_path / 'state.sqlite3')
+    monkeypatch.setattr(homework, 'STATE_FILE', path)
+    monkeypatch.setattr(homework.telegram, 'Bot', Bot)
+    monkeypatch.setattr(homework, 'get_api_answer',
+                        lambda timestamp: answers.pop(0))
+    monkeypatch.setattr(homework.time, 'sleep', sleep)
+    try:
+        homework.main()
+    except utils.BreakInfiniteLoop:
+        pass
+    assert homework.parse_status(
+        {'homework_name': 'ok', 'status': 'approved'}
+    ) in sent
+    assert any('homeworks[0].homework_name' in text for text in sent), (
+        'пропущенная работа попадает в уведомление об ошибке'
+    )
+    store = StateStore(path)
+    key = (homework.PRACTICUM_TOKEN, str(homework.TELEGRAM_CHAT_ID))
+    assert store.load_cursor(key) == 200
+    store.close()
+
+
+def test_main_retries_failed_send(monkeypatch, tmp_path):
+    sent = []
+    iterations = []
+    answers = [
+        {'homeworks': [{'id': 1, 'homework_name': 'hw',
+                        'status': 'approved'}], 'current_date': 200},
+        {'homeworks': [], 'current_date': 300},
+    ]
+
+    class Bot:
+        def __init__(self, token):
+            pass
+
+        def send_message(self, chat_id, text):
+            if not sent:
+                sent.append(None)
+                raise telegram.error.NetworkError('сеть недоступна')
+            sent.append(text)
+
+    def sleep(seconds):
+        iterations.append(seconds)
+        if len(iterations) == 2:
+            raise utils.BreakInfiniteLoop
+
+    path = str(tmp_path / 'state.sqlite3')
+    monkeypatch.setattr(homework, 'STATE_FILE', path)
+    monkeypatch.setattr(homework.telegram, 'Bot', Bot)
+    monkeypatch.setattr(homework, 'get_api_answer',
+                        lambda timestamp: answers.pop(0))
+    monkeypatch.setattr(homework.time, 'sleep', sleep)
+    try:
+        homework.main()
+    except utils.BreakInfiniteLoop:
+        pass
+    assert sent[1:] == [homework.parse_status(
+        {'homework_name': 'hw', 'status': 'approved'}
+    )], 'сообщение, не ушедшее с первой попытки, отправляется повторно'
+    store = StateStore(path)
+    assert store.load_cursor((homework.PRACTICUM_TOKEN, str(homework.TELEGRAM_CHAT_ID))) == 300
+    assert store.is_delivered((homework.PRACTICUM_TOKEN, str(homework.TELEGRAM_CHAT_ID)), 1, 'approved')
+    assert store.outbox() == []
+    store.close()
@@ -0,0 +1,38 @@
+from status_index import StatusIndex
+
+
+class TestStatusIndex:
+
+    def test_set_and_get(self):
+        index = StatusIndex(maxsize=10)
+        assert index.get(1) is None
+        index.set(1, 'reviewing')
+        assert index.get(1) == 'reviewing'
+        assert index.is_unchanged(1, 'reviewing')
+        index.set(1, 'approved')
+        assert not index.is_unchanged(1, 'reviewing')
+        assert len(index) == 1
+
+    def test_least_recently_used_is_evicted(self):
+        index = StatusIndex(maxsize=3)
+        for key in (1, 2, 3):
+            index.set(key, 'reviewing')
+        index.get(1)
+        index.set(4, 'approved')
+        assert 2 not in index
+        assert len(index) == 3
+        index.set(5, 'approved')
+        assert 3 not in index
+        assert [index.get(key) for key in (1, 4, 5)] == [
+            'reviewing', 'approved', 'approved'
+        ]
+
+    def test_capacity_is_bounded(self):
+        index = StatusIndex(maxsize=100)
+        for key in range(10_000):
+            index.set(key, 'approved' if key % 2 else 'rejected')
+        assert len(index) == 100
+        assert len(index._codes) == 100
+        assert index.get(9_999) == 'approved'
+        assert index.get(9_998) == 'rejected'
+        assert index.get(9_899) is None
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import Counter
+
+import engine
+import metrics
+from subscribers import SubscriberRegistry
+from supervisor import HashRing, Supervisor, _serve
+from test_engine import FakeBot, FakeClient
+
+KEYS = [f'token{number}' for number in range(2000)]
+
+
+def echo_worker(node, subscribers, connection):
+    """Процесс-заглушка: хранит свою долю и записывает её при остановке."""
+    directory = os.environ['SUPERVISOR_TEST_DIR']
+    marker = os.path.join(directory, 'crashed')
+    if node == 1 and not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(3)
+    owned = {tuple(subscriber[:2]) for subscriber in subscribers}
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    connection.send(('metrics', '# TYPE owned gauge\nowned 1\n'))
+    while not stopping:
+        if connection.poll(0.05):
+            command, batch = connection.recv()
+            for subscriber in batch:
+                if command == 'add':
+                    owned.add(tuple(subscriber[:2]))
+                else:
+                    owned.discard(tuple(subscriber[:2]))
+    with open(os.path.join(directory, f'{node}.json'), 'w') as file:
+        json.dump(sorted(owned), file)
+
+
+class TestHashRing:
+
+    def test_keys_are_spread_evenly(self):
+        ring = HashRing(range(4))
+        shares = Counter(ring.node_for(key) for key in KEYS)
+        assert set(shares) == {0, 1, 2, 3}
+        for share in shares.values():
+            assert 0.15 < share / len(KEYS) < 0.35
+
+    def test_only_removed_node_keys_move(self):
+        ring = HashRing(range(4))
+        before = {key: ring.node_for(key) for key in KEYS}
+        ring.remove(2)
+        after = {key: ring.node_for(key) for key in KEYS}
+        moved = [key for key in KEYS if before[key] != after[key]]
+        assert moved and all(before[key] == 2 for key in moved)
+        assert 2 not in after.values()
+
+        ring.add(2)
+        assert {key: ring.node_for(key) for key in KEYS} == before
+
+    def test_added_node_takes_its_share(self):
+        ring = HashRing(range(4))
+        before = {key: ring.node_for(key) for key in KEYS}
+        ring.add(4)
+        moved = [key for key in KEYS if ring.node_for(key) != before[key]]
+        assert all(ring.node_for(key) == 4 for key in moved)
+        assert len(moved) < len(KEYS) * 0.35
+
+
+class TestMerge:
+
+    def test_counters_are_summed_and_gauges_labelled(self):
+        first = ('# HELP requests_total Запросы\n'
+                 '# TYPE requests_total counter\n'
+                 'requests_total{status="200"} 3\n'
+                 '# HELP queue Очередь\n'
+                 '# TYPE queue gauge\n'
+                 'queue 2\n')
+        second = ('# HELP requests_total Запросы\n'
+                  '# TYPE requests_total counter\n'
+                  'requests_total{status="200"} 4\n'
+                  'requests_total{status="500"} 1\n'
+                  '# HELP queue Очередь\n'
+                  '# TYPE queue gauge\n'
+                  'queue 5\n')
+        text = metrics.merge({0: first, 1: second})
+        assert text.count('# TYPE requests_total counter') == 1
+        assert 'requests_total{status="200"} 7\n' in text
+        assert 'requests_total{status="500"} 1\n' in text
+        assert 'queue{worker="0"} 2\n' in text
+        assert 'queue{worker="1"} 5\n' in text
+
+
+class TestSupervisor:
+
+    def test_dead_worker_is_replaced(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('SUPERVISOR_TEST_DIR', str(tmp_path))
+        registry = SubscriberRegistry()
+        for number in range(60):
+            registry.add(f'token{number}', number)
+        supervisor = Supervisor(registry, workers=3, target=echo_worker,
+                                restart_delay=0.5)
+        supervisor.run(until=time.monotonic() + 6)
+
+        assert (tmp_path / 'crashed').exists()
+        owned = {}
+        for node in range(3):
+            with open(tmp_path / f'{node}.json') as file:
+                owned[node] = {tuple(pair) for pair in json.load(file)}
+        for node in range(3):
+            expected = {(token, chat_id) for token, chat_id, _
+                        in supervisor.shard(node)}
+            assert owned[node] == expected
+        assert sum(len(keys) for keys in owned.values()) == 60
+        assert supervisor.workers == {}
+
+    def test_worker_follows_commands(self):
+        parent, child = multiprocessing.Pipe()
+        client = FakeClient(answer={'homeworks': [], 'current_date': 1})
+        poller = engine.PollingEngine(SubscriberRegistry(), FakeBot(), client)
+
+        async def scenario():
+            worker = asyncio.ensure_future(_serve(poller, 0, child))
+            parent.send(('add', [('a', '1', None), ('b', '2', 'en')]))
+            for _ in range(100):
+                if len(client.requested) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            parent.send(('remove', [('a', '1', None)]))
+            await asyncio.sleep(0.05)
+            parent.close()
+            await asyncio.wait_for(worker, 5)
+
+        asyncio.run(scenario())
+        assert sorted(headers['Authorization']
+                      for _, headers in client.requested) == [
+            'OAuth a', 'OAuth b'
+        ]
+        assert [subscriber.key for subscriber in poller.registry] == [
+            ('b', '2')
+        ]
+        assert poller.registry.get('b', 2).locale == 'en'
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+import engine
+import homework
+from subscribers import SubscriberRegistry
+from templates import MessageTemplates, escape
+from test_engine import FakeBot, FakeClient, poll_once
+
+CATALOGS = {
+    'ru': ('Работа "{homework_name}": {verdict}', {'approved': 'принята!'}),
+    'en': ('Homework "{homework_name}": {verdict}', {'approved': 'done.'}),
+}
+
+
+class TestMessageTemplates:
+
+    def test_parse_status_text_is_unchanged(self):
+        for status, verdict in homework.HOMEWORK_VERDICTS.items():
+            text = homework.parse_status(
+                {'homework_name': 'hw <1>', 'status': status}
+            )
+            assert text == ('Изменился статус проверки работы '
+                            f'"hw <1>". {verdict}')
+
+    def test_locale_and_fallback(self):
+        templates = MessageTemplates(CATALOGS, default_locale='ru')
+        assert (templates.render('approved', 'hw', 'en')
+                == 'Homework "hw": done.')
+        assert (templates.render('approved', 'hw', 'de')
+                == 'Работа "hw": принята!')
+        assert 'approved' in templates
+        assert 'unknown' not in templates
+        with pytest.raises(KeyError):
+            templates.render('unknown', 'hw')
+
+    def test_html_escapes_name(self):
+        templates = MessageTemplates(CATALOGS)
+        assert (templates.render('approved', 'a<b>&c', 'en', 'HTML')
+                == 'Homework "a&lt;b&gt;&amp;c": done.')
+
+    def test_markdown_escapes_name_and_template(self):
+        templates = MessageTemplates(CATALOGS)
+        assert (templates.render('approved', 'hw_1.zip', 'ru', 'MarkdownV2')
+                == r'Работа "hw\_1\.zip": принята\!')
+        assert escape('a*b', 'MarkdownV2') == r'a\*b'
+
+    def test_escaped_names_are_cached(self):
+        templates = MessageTemplates(CATALOGS)
+        templates.render('approved', 'hw', 'en')
+        assert templates.escape_name.cache_info().currsize == 0, (
+            'без разметки название не экранируется'
+        )
+        first = templates.render('approved', 'a<b>', 'en', 'HTML')
+        assert templates.render('approved', 'a<b>', 'en', 'HTML') == first
+        assert templates.escape_name.cache_info().hits == 1
+
+    def test_unknown_default_locale_is_rejected(self):
+        with pytest.raises(ValueError):
+            MessageTemplates(CATALOGS, default_locale='uk')
+
+    def test_template_without_name_is_rejected(self):
+        with pytest.raises(ValueError):
+            MessageTemplates({'ru': ('{verdict}', {'approved': 'ok'})})
+
+
+def test_engine_uses_subscriber_locale_and_parse_mode():
+    registry = SubscriberRegistry()
+    subscriber = registry.add('token', 42, timestamp=100, locale='en')
+    bot = FakeBot()
+    client = FakeClient(answer={
+        'homeworks': [{'homework_name': 'a<b>', 'status': 'approved'}],
+        'current_date': 200
+    })
+    poller = engine.PollingEngine(registry, bot, client=client)
+    poller.sender.parse_mode = 'HTML'
+    asyncio.run(poll_once(poller, subscriber))
+    assert bot.parse_mode == 'HTML'
+    assert bot.sent == [('42', 'Review status of "a&lt;b&gt;" has changed. '
+                               'The reviewer liked everything. Hooray!')]
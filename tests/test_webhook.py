@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import aiohttp
+
+import engine
+import homework
+from scheduler import AdaptiveInterval, FakeClock
+from subscribers import SubscriberRegistry, feed_id
+from test_engine import FakeBot, FakeClient
+from webhook import SIGNATURE_HEADER, WebhookReceiver, sign, verify
+
+SECRET = 'secret'
+ANSWER = {
+    'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'approved'}],
+    'current_date': 200
+}
+FEED = feed_id('token')
+
+
+def post_all(poller, requests):
+    """Запускает приёмник и отправляет ему запросы (лента, тело, подпись).
+
+    Возвращает коды ответов.
+    """
+    async def scenario():
+        receiver = poller.webhook
+        statuses = []
+        async with poller.sender:
+            await receiver.start(poller.push)
+            try:
+                async with aiohttp.ClientSession() as session:
+                    for feed, body, signature in requests:
+                        headers = {}
+                        if signature is not None:
+                            headers[SIGNATURE_HEADER] = signature
+                        async with session.post(
+                            f'{receiver.url}/{feed}', data=body,
+                            headers=headers
+                        ) as response:
+                            statuses.append(response.status)
+            finally:
+                await receiver.stop()
+        return statuses
+    return asyncio.run(scenario())
+
+
+def make_poller(bot=None, clock=None, intervals=None):
+    registry = SubscriberRegistry()
+    registry.add('token', 42, timestamp=100)
+    receiver = WebhookReceiver(SECRET, port=0)
+    return engine.PollingEngine(
+        registry, bot, FakeClient(), clock=clock, intervals=intervals,
+        webhook=receiver
+    )
+
+
+class TestSignature:
+
+    def test_verify(self):
+        body = b'{"homeworks": []}'
+        signature = sign(FEED, body, SECRET)
+        assert verify(FEED, body, signature, SECRET)
+        assert not verify(FEED, body, sign(FEED, body, 'other'), SECRET)
+        assert not verify(FEED, body + b' ', signature, SECRET)
+        assert not verify(FEED, body, None, SECRET)
+
+    def test_signature_is_bound_to_feed(self):
+        body = b'{"homeworks": []}'
+        other = feed_id('other')
+        assert not verify(other, body, sign(FEED, body, SECRET), SECRET)
+
+    def test_secret_is_required(self):
+        try:
+            WebhookReceiver('')
+        except ValueError:
+            return
+        raise AssertionError('приёмник без секрета не должен создаваться')
+
+
+class TestWebhookReceiver:
+
+    def test_signed_push_is_sent(self):
+        bot = FakeBot()
+        poller = make_poller(bot)
+        body = json.dumps(ANSWER).encode()
+        statuses = post_all(poller, [(FEED, body, sign(FEED, body, SECRET))])
+        assert statuses == [200]
+        assert len(bot.sent) == 1
+        chat_id, text = bot.sent[0]
+        assert chat_id == '42'
+        assert text.endswith(homework.HOMEWORK_VERDICTS['approved'])
+        assert poller.registry.get('token', 42).timestamp == 100, (
+            'вебхук не должен сдвигать курсор опроса'
+        )
+
+    def test_rejected_pushes(self):
+        bot = FakeBot()
+        poller = make_poller(bot)
+        body = json.dumps(ANSWER).encode()
+        invalid = json.dumps({'homeworks': [{'status': 'approved'}],
+                              'current_date': 1}).encode()
+        unknown = json.dumps({
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'},
+                {'id': 2, 'homework_name': 'hw', 'status': 'lost'},
+            ],
+            'current_date': 1
+        }).encode()
+        other = feed_id('other')
+        statuses = post_all(poller, [
+            (FEED, body, None),
+            (FEED, body, sign(FEED, b'{}', SECRET)),
+            (FEED, body, sign(other, body, SECRET)),
+            (FEED, b'not json', sign(FEED, b'not json', SECRET)),
+            (FEED, invalid, sign(FEED, invalid, SECRET)),
+            (FEED, unknown, sign(FEED, unknown, SECRET)),
+            (other, body, sign(other, body, SECRET)),
+        ])
+        assert statuses == [403, 403, 403, 400, 422, 422, 404]
+        assert bot.sent == []
+        assert poller.pushes == {}
+
+    def test_push_reaches_only_its_token(self):
+        bot = FakeBot()
+        poller = make_poller(bot)
+        poller.registry.add('other', 42, timestamp=100)
+        poller.registry.add('other', 7, timestamp=100)
+        other = feed_id('other')
+        body = json.dumps(ANSWER).encode()
+        statuses = post_all(poller, [(other, body, sign(other, body, SECRET))])
+        assert statuses == [200]
+        assert sorted(chat_id for chat_id, _ in bot.sent) == ['42', '7']
+        assert list(poller.pushes) == ['other'], (
+            'реже опрашивается только лента, для которой пришёл вебхук'
+        )
+
+
+class TestPollingFallback:
+
+    def test_polling_is_relaxed_while_pushes_arrive(self):
+        clock = FakeClock()
+        intervals = AdaptiveInterval(period=600, min_interval=60,
+                                     max_interval=600, backoff=1)
+        poller = make_poller(FakeBot(), clock, intervals)
+        feed = poller.registry.feed('token')
+        empty = {'homeworks': [], 'current_date': 1}
+        poller.client.answer = empty
+
+        assert poller.push(FEED, empty)
+        asyncio.run(poller.cycle(feed, clock.now()))
+        due = poller.scheduler.delay()
+        assert due == engine.WEBHOOK_POLL_INTERVAL
+
+        clock.advance(engine.WEBHOOK_QUIET)
+        poller.scheduler.cancel(feed)
+        asyncio.run(poller.cycle(feed, clock.now()))
+        assert poller.scheduler.delay() == 600, (
+            'без вебхуков опрос возвращается к обычному интервалу'
+        )
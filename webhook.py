@@ -0,0 +1,118 @@
+"""Приём изменений статусов, присланных источником по HTTP.
+
+Источник отправляет POST на WEBHOOK_PATH/<feed_id> с телом в формате
+ответа API: {"homeworks": [...], "current_date": ...}. feed_id —
+SHA-256 токена Практикума в hex (subscribers.feed_id), изменения
+уходят во все чаты, подписанные на этот токен. Идентификатор ленты
+и тело подписываются HMAC-SHA256 с общим секретом WEBHOOK_SECRET,
+подпись передаётся в заголовке X-Signature в виде sha256=<hex>.
+"""
+import hashlib
+import hmac
+import logging
+import os
+
+from aiohttp import web
+
+import json_backend
+from exceptions import ParseStatusError, SchemaError
+from metrics import WEBHOOK_EVENTS
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 0))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+SIGNATURE_HEADER = 'X-Signature'
+
+
+def sign(feed_id, body, secret):
+    """Подпись ленты и тела запроса в формате заголовка X-Signature.
+
+    Идентификатор ленты входит в подпись, чтобы подписанное тело
+    нельзя было переслать на адрес другой ленты.
+    """
+    message = feed_id.encode('utf-8') + b'\n' + body
+    digest = hmac.new(secret.encode('utf-8'), message, hashlib.sha256)
+    return f'sha256={digest.hexdigest()}'
+
+
+def verify(feed_id, body, signature, secret):
+    """Проверяет подпись за время, не зависящее от её значения."""
+    if not signature:
+        return False
+    return hmac.compare_digest(sign(feed_id, body, secret), signature)
+
+
+class WebhookReceiver:
+    """HTTP-сервер, принимающий изменения статусов.
+
+    Проверенное тело передаётся в on_push(feed_id, answer); тот
+    возвращает False, если лента неизвестна, и выбрасывает SchemaError
+    или ParseStatusError, если тело не соответствует схеме ответа API
+    или содержит неизвестный статус.
+    """
+
+    def __init__(self, secret=WEBHOOK_SECRET, host=WEBHOOK_HOST,
+                 port=WEBHOOK_PORT, path=WEBHOOK_PATH):
+        if not secret:
+            raise ValueError('для приёма вебхуков нужен WEBHOOK_SECRET')
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.path = path.rstrip('/')
+        self.on_push = None
+        self._runner = None
+
+    @property
+    def url(self):
+        """Адрес, на который источник отправляет изменения."""
+        return f'http://{self.host}:{self.port}{self.path}'
+
+    async def handle(self, request):
+        """Обработчик POST с изменениями для одной ленты."""
+        feed_id = request.match_info['feed_id']
+        body = await request.read()
+        if not verify(feed_id, body, request.headers.get(SIGNATURE_HEADER),
+                      self.secret):
+            return self._reply('forbidden', 403)
+        try:
+            answer = json_backend.loads(body)
+        except json_backend.DECODE_ERRORS:
+            return self._reply('bad_json', 400)
+        try:
+            known = self.on_push(feed_id, answer)
+        except (SchemaError, ParseStatusError) as error:
+            logger.warning(f'Вебхук не прошёл проверку: {error}')
+            return self._reply('invalid', 422)
+        if not known:
+            return self._reply('unknown_feed', 404)
+        return self._reply('accepted', 200)
+
+    @staticmethod
+    def _reply(result, status):
+        WEBHOOK_EVENTS.labels(result).inc()
+        return web.json_response({'result': result}, status=status)
+
+    def application(self):
+        """Приложение aiohttp с маршрутом приёма изменений."""
+        app = web.Application()
+        app.router.add_post(self.path + '/{feed_id}', self.handle)
+        return app
+
+    async def start(self, on_push):
+        """Запускает сервер в текущем цикле событий."""
+        self.on_push = on_push
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f'Вебхуки принимаются на {self.url}')
+
+    async def stop(self):
+        """Останавливает сервер."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None